@@ -0,0 +1,112 @@
+import json
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from sqlalchemy import insert
+from cache import response_cache
+
+DEFAULT_CHUNK_SIZE = 1000
+MAX_CHUNK_SIZE = 10000
+
+
+#Bulk ingest
+#Rows are validated with the resource's schema, inserted with Core multi-row
+#INSERT ... RETURNING id batches and committed one chunk at a time. Only a small
+#summary per chunk is returned, never the inserted objects.
+
+async def iter_request_rows(request : Request):
+    """Yield (line_number, dict) from an NDJSON body as it streams in, or from a JSON array body."""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        buffer = b""
+        line_number = 0
+        async for piece in request.stream():
+            buffer += piece
+            *lines, buffer = buffer.split(b"\n")
+            for line in lines:
+                line_number += 1
+                if line.strip():
+                    yield line_number, _parse_line(line, line_number)
+        if buffer.strip():
+            yield line_number + 1, _parse_line(buffer, line_number + 1)
+    else:
+        try:
+            items = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Body is not valid JSON")
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Expected a JSON array")
+        for index, item in enumerate(items, start=1):
+            yield index, item
+
+def _parse_line(line, line_number):
+    try:
+        return json.loads(line)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Line {line_number} is not valid JSON")
+
+
+def insert_chunk(db, model, rows, after_insert=None):
+    """Insert one chunk and commit it; returns the new ids.
+
+    `after_insert(db, ids, rows)` runs in the chunk's transaction, before the commit,
+    with the rows in the same order as their ids.
+    """
+    table = model.__table__
+    #executemany needs the same keys on every row, so group rows that left different defaults unset
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+    ids = []
+    try:
+        for group in groups.values():
+            #insertmanyvalues batches may come back in any order unless asked to keep the parameters'
+            ids.extend(db.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), group).scalars().all())
+        if after_insert is not None:
+            after_insert(db, ids, [row for group in groups.values() for row in group])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    response_cache.bump(table.name.lower())
+    return ids
+
+
+async def bulk_ingest(request : Request, db, model, schema, chunk_size : int, prepare=None, after_insert=None):
+    """Validate, insert and commit rows from the request body `chunk_size` at a time.
+
+    `prepare` is an optional blocking callable that rewrites a list of validated rows
+    (e.g. hashing passwords) before they are inserted; `after_insert` is passed on to
+    insert_chunk. Returns {"total", "chunks"}.
+    """
+    chunks = []
+    pending = []
+
+    async def flush():
+        rows = pending[:]
+        pending.clear()
+        if prepare is not None:
+            rows = await run_in_threadpool(prepare, rows)
+        ids = await run_in_threadpool(insert_chunk, db, model, rows, after_insert)
+        chunks.append({
+            "chunk": len(chunks),
+            "count": len(ids),
+            "first_id": min(ids) if ids else None,
+            "last_id": max(ids) if ids else None,
+        })
+
+    async for line_number, item in iter_request_rows(request):
+        try:
+            #unset optional fields are left out so the column defaults apply
+            pending.append(schema.model_validate(item).model_dump(exclude_none=True))
+        except ValidationError as e:
+            raise HTTPException(
+                status_code=422,
+                detail={"row": line_number, "errors": e.errors(include_url=False, include_context=False), "committed_chunks": chunks},
+            )
+        if len(pending) >= chunk_size:
+            await flush()
+    if pending:
+        await flush()
+
+    return {"total": sum(c["count"] for c in chunks), "chunks": chunks}
@@ -0,0 +1,140 @@
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, delete, func, and_
+from Models.Posts import PostsModel
+from Models.Solutions import SolutionsModel
+from Models.Comments import CommentsModel
+from Models.Votes import VotesModel, POST, SOLUTION, COMMENT
+from Database import feed, reputation, facets, ratings
+import events
+
+
+#Set-based deletes and updates
+#Each delete is one DELETE ... WHERE ... RETURNING on the target table; the database's
+#ON DELETE CASCADE foreign keys take the children with it (a post's solutions and
+#comments, a solution's comments). What the cascade cannot see is fixed up in the same
+#transaction: feed counters, facet counts and reputation are moved by the deleted rows
+#(children are aggregated per post/user before the DELETE) and votes on the deleted
+#rows are dropped. Deleting a user takes back the votes they cast.
+#The caller commits. The ORM is told not to sync its identity map, so no statement
+#is preceded by a SELECT of the rows it touches.
+
+NO_SYNC = {"synchronize_session": False}
+
+VOTE_TARGETS = {
+    POST: (PostsModel, PostsModel.post_rating.key),
+    SOLUTION: (SolutionsModel, SolutionsModel.solution_rating.key),
+    COMMENT: (CommentsModel, CommentsModel.comment_rating.key),
+}
+
+
+def where_clause(model, criteria : dict):
+    """AND of `criteria`: "ids" matches the primary key, every other key a column; None is ignored."""
+    clauses = []
+    for key, value in criteria.items():
+        if value is None:
+            continue
+        clauses.append(model.id.in_(value) if key == "ids" else getattr(model, key) == value)
+    if not clauses:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Give ids or at least one filter")
+    return and_(*clauses)
+
+
+def _drop_votes(db, target_type : str, target_ids):
+    db.execute(delete(VotesModel).where(VotesModel.target_type == target_type, VotesModel.target_id.in_(target_ids))
+               .execution_options(**NO_SYNC))
+
+
+def _uncount_comments(db, condition):
+    """Take the comments matching `condition` (about to be cascaded) out of the feed and reputation."""
+    per_post = db.execute(
+        select(CommentsModel.post_id, func.count(), func.coalesce(func.sum(CommentsModel.comment_rating), 0))
+        .where(condition).group_by(CommentsModel.post_id)
+    ).all()
+    feed.apply_activity(db, {post_id: (0, -count, -rating) for post_id, count, rating in per_post if post_id is not None})
+    _uncount_authors(db, CommentsModel, condition)
+    _drop_votes(db, COMMENT, select(CommentsModel.id).where(condition))
+
+
+def _uncount_authors(db, model, condition):
+    rating = reputation.AUTHORED[model]
+    per_user = db.execute(
+        select(model.user_id, func.coalesce(func.sum(rating), 0)).where(condition).group_by(model.user_id)
+    ).all()
+    reputation.apply_reputation(db, {user_id: -total for user_id, total in per_user})
+
+
+def delete_comments(db, where):
+    rows = db.execute(
+        delete(CommentsModel).where(where).execution_options(**NO_SYNC)
+        .returning(CommentsModel.id, CommentsModel.post_id, CommentsModel.solution_id,
+                   CommentsModel.user_id, CommentsModel.comment_rating)
+    ).all()
+    if rows:
+        _drop_votes(db, COMMENT, [row.id for row in rows])
+        feed.record_comments(db, rows, sign=-1)
+        reputation.record_authored(db, CommentsModel, rows, sign=-1)
+        for row in rows:
+            events.comment_deleted(db, row)
+    return rows
+
+
+def delete_solutions(db, where):
+    targets = select(SolutionsModel.id).where(where)
+    _uncount_comments(db, CommentsModel.solution_id.in_(targets))
+    rows = db.execute(
+        delete(SolutionsModel).where(where).execution_options(**NO_SYNC)
+        .returning(SolutionsModel.id, SolutionsModel.post_id, SolutionsModel.user_id, SolutionsModel.solution_rating)
+    ).all()
+    if rows:
+        _drop_votes(db, SOLUTION, [row.id for row in rows])
+        feed.record_solutions(db, rows, sign=-1)
+        reputation.record_authored(db, SolutionsModel, rows, sign=-1)
+        for row in rows:
+            events.solution_deleted(db, row)
+    return rows
+
+
+def delete_posts(db, where):
+    #the posts' POST_SCORES rows cascade too, so only reputation and votes need fixing
+    targets = select(PostsModel.id).where(where)
+    for model, target_type in ((SolutionsModel, SOLUTION), (CommentsModel, COMMENT)):
+        condition = model.post_id.in_(targets)
+        _uncount_authors(db, model, condition)
+        _drop_votes(db, target_type, select(model.id).where(condition))
+    rows = db.execute(
+        delete(PostsModel).where(where).execution_options(**NO_SYNC)
+        .returning(PostsModel.id, PostsModel.post_category, PostsModel.post_difficulty)
+    ).all()
+    if rows:
+        _drop_votes(db, POST, [row.id for row in rows])
+        facets.record_posts(db, rows, sign=-1)
+        for row in rows:
+            events.post_deleted(db, row.id)
+    return rows
+
+
+def delete_votes_by(db, user_id : int):
+    """Drop every vote `user_id` cast and move the scores back by it; returns the resources hit.
+
+    The scores are floored at 0 as usual, so a vote the floor had cut short is not undone
+    past it.
+    """
+    rows = db.execute(
+        delete(VotesModel).where(VotesModel.user_id == user_id).execution_options(**NO_SYNC)
+        .returning(VotesModel.target_type, VotesModel.target_id, VotesModel.value)
+    ).all()
+    per_type = {}
+    for row in rows:
+        per_type.setdefault(row.target_type, {})[row.target_id] = -row.value
+    resources = set()
+    for target_type, deltas in per_type.items():
+        model, key = VOTE_TARGETS[target_type]
+        ratings.shift_ratings(db, model, key, deltas)
+        resources.add(model.__tablename__.lower())
+    return resources
+
+
+def update_rows(db, model, where, values : dict):
+    """One UPDATE ... RETURNING id for every row matching `where`; returns the ids."""
+    stmt = update(model).where(where).values(values).execution_options(**NO_SYNC).returning(model.id)
+    return db.execute(stmt).scalars().all()
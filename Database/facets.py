@@ -0,0 +1,125 @@
+import argparse
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from Models.Posts import PostsModel
+from Models.PostFacets import PostFacetCountsModel
+
+
+#Facet counts
+#POST_FACET_COUNTS holds the number of posts per (post_category, post_difficulty) pair.
+#Creating, editing and deleting posts move the counters in the write's own transaction,
+#so /api/posts/browse reads the counts for any combination of filters from this table
+#(one row per pair in use) instead of grouping the posts table. A missing category or
+#difficulty (NULL or "") is stored under "" so totals include those posts, but "" is not
+#reported as a value and cannot be selected: an empty filter value means no filter.
+
+FACETS = ("post_category", "post_difficulty")
+
+counts = PostFacetCountsModel.__table__
+
+
+def _field(row, key):
+    return row.get(key) if isinstance(row, dict) else getattr(row, key, None)
+
+
+def _pair(row):
+    return (_field(row, "post_category") or "", _field(row, "post_difficulty") or "")
+
+
+def apply_counts(db, deltas : dict):
+    """Move the counter of each {(category, difficulty): delta} pair; empty pairs are dropped."""
+    rows = [{"post_category": category, "post_difficulty": difficulty, "post_count": delta}
+            for (category, difficulty), delta in sorted(deltas.items()) if delta]  # sorted: one lock order for every writer
+    if not rows:
+        return
+    dialect_insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = dialect_insert(counts)
+    stmt = stmt.on_conflict_do_update(index_elements=[counts.c.post_category, counts.c.post_difficulty],
+                                      set_={"post_count": counts.c.post_count + stmt.excluded.post_count})
+    db.execute(stmt, rows)
+    if any(row["post_count"] < 0 for row in rows):
+        db.execute(delete(counts).where(counts.c.post_count <= 0))
+
+
+def record_posts(db, rows, sign : int = 1):
+    """Count new (sign=1) or deleted (sign=-1) posts; rows are ORM objects, dicts or result rows."""
+    deltas = {}
+    for row in rows:
+        pair = _pair(row)
+        deltas[pair] = deltas.get(pair, 0) + sign
+    apply_counts(db, deltas)
+
+
+def lock_pairs(db, where, values : dict):
+    """The pairs of the posts an UPDATE with `values` is about to move, locked until commit;
+    None when `values` changes no facet."""
+    if not any(facet in values for facet in FACETS):
+        return None
+    return db.execute(select(PostsModel.post_category, PostsModel.post_difficulty).where(where).with_for_update()).all()
+
+
+def move_posts(db, before, values : dict):
+    """Move the posts counted under the `before` pairs to their pairs after `values` applied."""
+    deltas = {}
+    for row in before or ():
+        old = _pair(row)
+        new = _pair({facet: values.get(facet, _field(row, facet)) for facet in FACETS})
+        if old != new:
+            deltas[old] = deltas.get(old, 0) - 1
+            deltas[new] = deltas.get(new, 0) + 1
+    apply_counts(db, deltas)
+
+
+def facet_counts(db, categories=None, difficulties=None):
+    """(total, {facet: {value: count}}) for posts matching the filters.
+
+    Each facet's counts apply the filters on the other facet only, so every value shows
+    how many posts selecting it (too) would give. Posts without a value count towards the
+    total but not towards any value.
+    """
+    pairs = db.execute(select(counts.c.post_category, counts.c.post_difficulty, counts.c.post_count)
+                       .where(counts.c.post_count > 0)).all()
+    total, by_category, by_difficulty = 0, {}, {}
+    for category, difficulty, count in pairs:
+        category_selected = not categories or category in categories
+        difficulty_selected = not difficulties or difficulty in difficulties
+        if difficulty_selected and category:
+            by_category[category] = by_category.get(category, 0) + count
+        if category_selected and difficulty:
+            by_difficulty[difficulty] = by_difficulty.get(difficulty, 0) + count
+        if category_selected and difficulty_selected:
+            total += count
+    return total, {"post_category": dict(sorted(by_category.items())), "post_difficulty": dict(sorted(by_difficulty.items()))}
+
+
+def selected(values):
+    """The filter values of one facet with the empty ones dropped; None when nothing is left."""
+    return [value for value in values or () if value] or None
+
+
+def rebuild_counts(connection):
+    """Recount every pair from POSTS (backfills and repairs); works on a Session or a Connection, the caller commits."""
+    category = func.coalesce(PostsModel.post_category, "")
+    difficulty = func.coalesce(PostsModel.post_difficulty, "")
+    rows = connection.execute(select(category, difficulty, func.count()).group_by(category, difficulty)).all()
+    connection.execute(delete(counts))
+    if rows:
+        connection.execute(insert(counts), [{"post_category": c, "post_difficulty": d, "post_count": n} for c, d, n in rows])
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the post facet counts")
+    sub = parser.add_subparsers(dest="action", required=True)
+    sub.add_parser("rebuild", help="recount POST_FACET_COUNTS from posts")
+    parser.parse_args()
+
+    from Database.db import engine
+    import Models.Solutions, Models.Comments  # PostsModel's relationships resolve them by name
+    with engine.begin() as connection:
+        print("counted %d category/difficulty pairs" % rebuild_counts(connection))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import os
+import math
+import json
+import base64
+import argparse
+from datetime import datetime, timezone
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, delete, insert, func, tuple_, literal, case, bindparam, Float
+from sqlalchemy.sql.functions import GenericFunction
+from sqlalchemy.ext.compiler import compiles
+from Models.Posts import PostsModel
+from Models.Solutions import SolutionsModel
+from Models.Comments import CommentsModel
+from Models.PostScores import PostScoresModel
+from Database.ratings import rating_listeners
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+#Trending feed
+#Every post has a POST_SCORES row holding its solution count, comment count and the sum
+#of its own, its solutions' and its comments' ratings. The score is
+#    sign(a) * log10(max(|a|, 1)) + (post_created_at - FEED_EPOCH) / FEED_DECAY_SECONDS
+#with a = SOLUTION_WEIGHT*solutions + COMMENT_WEIGHT*comments + rating_sum: every
+#FEED_DECAY_SECONDS of age costs a post a factor of 10 in activity. The time term is
+#fixed per post, so scores only change when activity does and the rows are updated in
+#the write's own transaction; a feed page is an index scan on (score, post_id).
+
+FEED_EPOCH = datetime(2024, 1, 1, tzinfo=timezone.utc).timestamp()
+FEED_DECAY_SECONDS = float(os.getenv("FEED_DECAY_SECONDS", "45000"))
+SOLUTION_WEIGHT = 3
+COMMENT_WEIGHT = 1
+
+scores = PostScoresModel.__table__
+
+
+#compute_score in SQL, so apply_activity can rescore in the UPDATE that moves the counters
+class log10(GenericFunction):
+    type = Float()
+    inherit_cache = True
+
+@compiles(log10, "postgresql")
+def _postgresql_log10(element, compiler, **kw):
+    return "log(%s)" % compiler.process(element.clauses, **kw)
+
+
+class epoch_seconds(GenericFunction):
+    type = Float()
+    inherit_cache = True
+
+@compiles(epoch_seconds)
+def _epoch_seconds(element, compiler, **kw):
+    return "EXTRACT(EPOCH FROM %s)" % compiler.process(element.clauses, **kw)
+
+@compiles(epoch_seconds, "sqlite")
+def _sqlite_epoch_seconds(element, compiler, **kw):
+    #SQLite keeps naive UTC text; julianday() of the Unix epoch is 2440587.5
+    return "((julianday(%s) - 2440587.5) * 86400.0)" % compiler.process(element.clauses, **kw)
+
+
+def score_expression(activity, post_created_at):
+    order = case((activity > 0, func.log10(activity)), (activity < 0, -func.log10(-activity)), else_=0.0)
+    return order + (func.epoch_seconds(post_created_at) - FEED_EPOCH) / FEED_DECAY_SECONDS
+
+
+def _timestamp(value) -> float:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)  # SQLite hands back naive UTC
+    return value.timestamp()
+
+
+def compute_score(solution_count : int, comment_count : int, rating_sum : int, post_created_at) -> float:
+    activity = SOLUTION_WEIGHT * solution_count + COMMENT_WEIGHT * comment_count + rating_sum
+    order = math.log10(max(abs(activity), 1))
+    sign = 1 if activity > 0 else -1 if activity < 0 else 0
+    return sign * order + (_timestamp(post_created_at) - FEED_EPOCH) / FEED_DECAY_SECONDS
+
+
+def add_posts(db, post_ids):
+    """Create the score rows of new posts (no activity yet)."""
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    posts = db.execute(select(PostsModel.id, PostsModel.post_rating, PostsModel.post_created_at)
+                       .where(PostsModel.id.in_(post_ids))).all()
+    db.execute(insert(scores), [
+        {"post_id": id, "solution_count": 0, "comment_count": 0, "rating_sum": rating or 0,
+         "post_created_at": created_at, "score": compute_score(0, 0, rating or 0, created_at)}
+        for id, rating, created_at in posts
+    ])
+
+
+def apply_activity(db, deltas : dict):
+    """Move the counters of each post by {post_id: (solutions, comments, rating)} and rescore it.
+
+    One executemany; SET expressions see the old values, so the new activity is the old
+    one plus the weighted delta.
+    """
+    params = [
+        {"b_post_id": post_id, "b_solutions": solutions, "b_comments": comments, "b_rating": rating,
+         "b_activity": SOLUTION_WEIGHT * solutions + COMMENT_WEIGHT * comments + rating}
+        for post_id, (solutions, comments, rating) in sorted(deltas.items(), key=lambda item: item[0] or 0)
+        if post_id is not None and (solutions or comments or rating)
+    ]
+    if not params:
+        return
+    activity = (SOLUTION_WEIGHT * scores.c.solution_count + COMMENT_WEIGHT * scores.c.comment_count
+                + scores.c.rating_sum + bindparam("b_activity"))
+    db.execute(
+        update(scores)
+        .where(scores.c.post_id == bindparam("b_post_id"))
+        .values(solution_count=scores.c.solution_count + bindparam("b_solutions"),
+                comment_count=scores.c.comment_count + bindparam("b_comments"),
+                rating_sum=scores.c.rating_sum + bindparam("b_rating"),
+                score=score_expression(activity, scores.c.post_created_at)),
+        params,
+    )
+
+
+def _merge(deltas, post_id, solutions=0, comments=0, rating=0):
+    current = deltas.get(post_id, (0, 0, 0))
+    deltas[post_id] = (current[0] + solutions, current[1] + comments, current[2] + rating)
+
+
+def _field(row, key):
+    return row.get(key) if isinstance(row, dict) else getattr(row, key, None)
+
+
+def record_solutions(db, rows, sign : int = 1):
+    """Count new (sign=1) or deleted (sign=-1) solutions; rows are ORM objects or dicts."""
+    deltas = {}
+    for row in rows:
+        _merge(deltas, _field(row, "post_id"), solutions=sign, rating=sign * (_field(row, "solution_rating") or 0))
+    apply_activity(db, deltas)
+
+
+def record_comments(db, rows, sign : int = 1):
+    """Count new (sign=1) or deleted (sign=-1) comments; rows are ORM objects or dicts."""
+    deltas = {}
+    for row in rows:
+        _merge(deltas, _field(row, "post_id"), comments=sign, rating=sign * (_field(row, "comment_rating") or 0))
+    apply_activity(db, deltas)
+
+
+def _on_rating_changed(db, model, deltas : dict, parents : dict):
+    if model not in (PostsModel, SolutionsModel, CommentsModel):
+        return
+    activity = {}
+    for id, delta in deltas.items():
+        post_id = id if model is PostsModel else parents.get(id, {}).get("post_id")
+        if post_id is not None:
+            _merge(activity, post_id, rating=delta)
+    apply_activity(db, activity)
+
+rating_listeners.append(_on_rating_changed)
+
+
+def rebuild_scores(connection):
+    """Recompute every score row from the source tables (backfills and repairs).
+
+    Works on a Session or a Connection; the caller commits.
+    """
+    solution_counts = (select(SolutionsModel.post_id, func.count().label("n"),
+                              func.coalesce(func.sum(SolutionsModel.solution_rating), 0).label("rating"))
+                       .group_by(SolutionsModel.post_id).subquery())
+    comment_counts = (select(CommentsModel.post_id, func.count().label("n"),
+                             func.coalesce(func.sum(CommentsModel.comment_rating), 0).label("rating"))
+                      .group_by(CommentsModel.post_id).subquery())
+    rows = connection.execute(
+        select(PostsModel.id, PostsModel.post_rating, PostsModel.post_created_at,
+               func.coalesce(solution_counts.c.n, 0), func.coalesce(solution_counts.c.rating, 0),
+               func.coalesce(comment_counts.c.n, 0), func.coalesce(comment_counts.c.rating, 0))
+        .outerjoin(solution_counts, solution_counts.c.post_id == PostsModel.id)
+        .outerjoin(comment_counts, comment_counts.c.post_id == PostsModel.id)
+    ).all()
+    connection.execute(delete(scores))
+    values = []
+    for id, post_rating, created_at, solutions, solution_rating, comments, comment_rating in rows:
+        rating_sum = (post_rating or 0) + solution_rating + comment_rating
+        values.append({"post_id": id, "solution_count": solutions, "comment_count": comments, "rating_sum": rating_sum,
+                       "post_created_at": created_at, "score": compute_score(solutions, comments, rating_sum, created_at)})
+    for start in range(0, len(values), 1000):
+        connection.execute(insert(scores), values[start:start + 1000])
+    return len(values)
+
+
+def encode_feed_cursor(score : float, post_id : int):
+    return base64.urlsafe_b64encode(json.dumps([score, post_id]).encode()).decode()
+
+def decode_feed_cursor(cursor : str):
+    try:
+        score, post_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(post_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def feed_page(db, limit : int, after : str = None):
+    """One page of posts, hottest first, and the cursor for the next page."""
+    stmt = (
+        select(PostsModel, scores.c.score, scores.c.solution_count, scores.c.comment_count)
+        .join(scores, scores.c.post_id == PostsModel.id)
+        .order_by(scores.c.score.desc(), scores.c.post_id.desc())
+    )
+    if after:
+        stmt = stmt.where(tuple_(scores.c.score, scores.c.post_id) < tuple_(*map(literal, decode_feed_cursor(after))))
+    rows = db.execute(stmt.limit(limit + 1)).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_feed_cursor(rows[-1][1], rows[-1][0].id)
+    return rows, next_cursor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the trending feed scores")
+    sub = parser.add_subparsers(dest="action", required=True)
+    sub.add_parser("rebuild", help="recompute POST_SCORES from posts, solutions and comments")
+    parser.parse_args()
+
+    from Database.db import engine
+    with engine.begin() as connection:
+        print("rescored %d posts" % rebuild_scores(connection))
+
+
+if __name__ == "__main__":
+    main()
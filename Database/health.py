@@ -0,0 +1,92 @@
+import os
+import time
+import logging
+import threading
+from sqlalchemy import text
+from dotenv import load_dotenv
+from Database.db import DB_POOL_SIZE
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+#Liveness and readiness
+#A worker starts without touching the database: the lifespan hook starts a background
+#warm-up that opens DB_POOL_WARM connections and retries with backoff while the
+#database is unreachable. /healthz only says the process is up; /readyz turns 200
+#once the pool is warm and a SELECT 1 still goes through, so a load balancer sends
+#traffic only to workers that can serve it.
+
+DB_POOL_WARM = int(os.getenv("DB_POOL_WARM", str(DB_POOL_SIZE)))
+READY_RETRY_MAX = float(os.getenv("READY_RETRY_MAX", "10"))
+
+
+def warm_pool(engine, connections : int = DB_POOL_WARM):
+    """Open `connections` pooled connections at once (each runs SELECT 1) and return them to the pool."""
+    opened = []
+    try:
+        for _ in range(max(connections, 1)):
+            connection = engine.connect()
+            opened.append(connection)
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in opened:
+            connection.close()
+    return len(opened)
+
+
+def ping(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+class Readiness:
+    def __init__(self, connections : int = DB_POOL_WARM, retry_max : float = READY_RETRY_MAX):
+        self.connections = connections
+        self.retry_max = retry_max
+        self.warmed = False
+        self.error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, engine):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._warm, args=(engine,), name="pool-warmup", daemon=True)
+            self._thread.start()
+
+    def _warm(self, engine):
+        delay = 0.5
+        while not self._stop.is_set():
+            started = time.perf_counter()
+            try:
+                count = warm_pool(engine, self.connections)
+            except Exception as e:
+                self.error = str(e)
+                logger.warning("Database not reachable yet, retrying in %.1fs: %s", delay, e)
+                self._stop.wait(delay)
+                delay = min(delay * 2, self.retry_max)
+                continue
+            self.warmed, self.error = True, None
+            logger.info("Warmed %d database connections in %.0fms", count, (time.perf_counter() - started) * 1000)
+            return
+
+    def check(self, engine) -> dict:
+        """Readiness report; "ready" is False until warmed and whenever the database stops answering."""
+        if not self.warmed:
+            return {"ready": False, "status": "warming", "error": self.error}
+        try:
+            ping(engine)
+        except Exception as e:
+            return {"ready": False, "status": "database unavailable", "error": str(e)}
+        return {"ready": True, "status": "ready"}
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+readiness = Readiness()
@@ -0,0 +1,68 @@
+import os
+import argparse
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect
+from Database.db import SQLALCHEMY_DATABASE_URL, engine_options
+
+#Schema migrations
+#The schema is managed by the Alembic revisions in migrations/ and applied as its own
+#step before the app starts (start_backend.sh runs `python -m Database.migrate upgrade`),
+#never on import. A database created by the old create_all call has tables but no
+#alembic_version row; upgrade stamps it at the baseline revision first.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = "0001_baseline"
+
+
+def alembic_config(database_url : str = None) -> Config:
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "migrations"))
+    config.set_main_option("sqlalchemy.url", (database_url or SQLALCHEMY_DATABASE_URL).replace("%", "%%"))
+    return config
+
+
+def _needs_baseline_stamp(database_url : str) -> bool:
+    engine = create_engine(database_url, **engine_options(database_url))
+    try:
+        inspector = inspect(engine)
+        return inspector.has_table("USERS") and not inspector.has_table("alembic_version")
+    finally:
+        engine.dispose()
+
+
+def upgrade(revision : str = "head", database_url : str = None):
+    database_url = database_url or SQLALCHEMY_DATABASE_URL
+    config = alembic_config(database_url)
+    if _needs_baseline_stamp(database_url):
+        command.stamp(config, BASELINE)
+    command.upgrade(config, revision)
+
+
+def downgrade(revision : str, database_url : str = None):
+    command.downgrade(alembic_config(database_url), revision)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    sub = parser.add_subparsers(dest="action", required=True)
+    up = sub.add_parser("upgrade")
+    up.add_argument("revision", nargs="?", default="head")
+    down = sub.add_parser("downgrade")
+    down.add_argument("revision")
+    sub.add_parser("current")
+    sub.add_parser("history")
+    args = parser.parse_args()
+
+    if args.action == "upgrade":
+        upgrade(args.revision)
+    elif args.action == "downgrade":
+        downgrade(args.revision)
+    elif args.action == "current":
+        command.current(alembic_config(), verbose=True)
+    else:
+        command.history(alembic_config())
+
+
+if __name__ == "__main__":
+    main()
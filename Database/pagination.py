@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import datetime
+from fastapi import HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from Database.db import SessionLocal
+from serialization import render_json
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 500
+
+
+#Cursor helpers
+#A cursor is the (created_at, id) of the last row of a page, so the next page
+#starts right after it without an OFFSET scan.
+def encode_cursor(created_at : datetime, id : int):
+    raw = json.dumps([created_at.isoformat(), id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor : str):
+    try:
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+
+def keyset_page(query, created_col, id_col, limit : int, after : str = None):
+    """Return one page of `query` ordered by (created_col, id_col) and the cursor for the next page."""
+    if after:
+        query = query.filter(tuple_(created_col, id_col) > decode_cursor(after))
+    rows = query.order_by(created_col, id_col).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    return rows, next_cursor
+
+
+def stream_ndjson(model, created_col, id_col, schema, after : str = None, session_factory=SessionLocal, options=()):
+    """Stream every row after `after` as newline-delimited JSON, reading through a server-side cursor.
+
+    `options` are loader options for the query, e.g. load_only for a sparse fieldset.
+    """
+    cursor = decode_cursor(after) if after else None
+    return StreamingResponse(_ndjson_rows(model, created_col, id_col, schema, cursor, session_factory, options),
+                             media_type="application/x-ndjson")
+
+def _ndjson_rows(model, created_col, id_col, schema, cursor, session_factory, options):
+    #The generator opens its own session because it outlives the request's get_db session
+    database = session_factory()
+    try:
+        query = database.query(model).options(*options)
+        if cursor:
+            query = query.filter(tuple_(created_col, id_col) > cursor)
+        query = query.order_by(created_col, id_col).yield_per(STREAM_BATCH_SIZE)
+        for row in query:
+            yield render_json(row, schema) + b"\n"
+            #drop the row from the identity map so memory stays flat across the export
+            database.expunge(row)
+    finally:
+        database.close()
@@ -0,0 +1,85 @@
+import time
+import threading
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+#Connection pool instrumentation
+#The engines use these pool classes so every checkout records how long the caller
+#waited for a connection. Together with checked-out/overflow counts that shows
+#whether the pool (rather than the database) is what requests are queueing on.
+
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.saturated = 0  # checkouts that found every pooled connection in use
+
+    def record(self, waited : float, saturated : bool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            if saturated:
+                self.saturated += 1
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self, pool):
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "max_overflow": pool._max_overflow,
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "saturated_checkouts": self.saturated,
+                "wait_avg_ms": round(self.wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+            }
+
+
+class _TimedPoolMixin:
+    def __init__(self, *args, stats : PoolStats = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = stats or PoolStats()
+
+    def _do_get(self):
+        saturated = self.checkedin() == 0 and self.checkedout() >= self.size()
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.stats.record_timeout()
+            raise
+        self.stats.record(time.perf_counter() - start, saturated)
+        return connection
+
+    def recreate(self):
+        #dispose() swaps in a fresh pool; keep counting into the same stats
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if not isinstance(pool, _TimedPoolMixin):
+        return {"pool": type(pool).__name__}
+    return pool.stats.snapshot(pool)
@@ -0,0 +1,64 @@
+from fastapi import HTTPException, status
+from pydantic import ConfigDict, create_model
+from sqlalchemy.orm import load_only
+from Models.Users import UsersModel
+from Models.Posts import PostsModel
+from Models.Solutions import SolutionsModel
+from Models.Comments import CommentsModel
+
+
+#Sparse fieldsets
+#`?fields=id,post_title` on a read endpoint loads only those columns (load_only) and
+#renders them with a schema cut down to the same fields. Only the columns allow-listed
+#here can be asked for, so a password hash can never be projected; id is always included.
+
+ALLOWED_FIELDS = {
+    UsersModel: ("id", "username", "email", "user_rating", "created_at"),
+    PostsModel: ("id", "post_title", "post_description", "post_category", "post_difficulty", "user_id",
+                 "post_rating", "post_created_at", "post_updated_at"),
+    SolutionsModel: ("id", "solution_text", "post_id", "user_id", "solution_rating", "created_at"),
+    CommentsModel: ("id", "comment_text", "post_id", "user_id", "solution_id", "comment_rating",
+                    "created_at", "updated_at"),
+}
+
+
+class Projection:
+    def __init__(self, schema, options=()):
+        self.schema = schema
+        self.options = list(options)
+
+
+#one slim schema per (schema, fields); the allow-lists bound how many there can be
+_schemas = {}
+
+def _slim_schema(schema, names):
+    key = (schema, names)
+    slim = _schemas.get(key)
+    if slim is None:
+        fields = {name: (schema.model_fields[name].annotation, schema.model_fields[name].default) for name in names}
+        slim = _schemas[key] = create_model("%s_%s" % (schema.__name__, "_".join(names)),
+                                            __config__=ConfigDict(from_attributes=True), **fields)
+    return slim
+
+
+def project(fields : str, model, schema, extra_columns=()):
+    """Projection for a `fields=` value: the columns to load and the schema to render.
+
+    `extra_columns` are loaded but not rendered (e.g. the keyset pagination column).
+    Without `fields` the full schema is used and every column loads.
+    """
+    if not fields:
+        return Projection(schema)
+    allowed = ALLOWED_FIELDS[model]
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - set(allowed))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown or unavailable fields: %s (allowed: %s)" % (", ".join(unknown), ", ".join(allowed)),
+        )
+    requested.add("id")
+    names = tuple(name for name in allowed if name in requested)  # canonical order
+    columns = [getattr(model, name) for name in names]
+    columns += [column for column in extra_columns if column.key not in requested]
+    return Projection(_slim_schema(schema, names), [load_only(*columns)])
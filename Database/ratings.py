@@ -0,0 +1,257 @@
+import os
+import threading
+import logging
+from collections.abc import Mapping
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from Database.db import SessionLocal
+from Models.Votes import VotesModel
+from cache import response_cache
+
+logger = logging.getLogger(__name__)
+
+
+#Rating listeners
+#Anything derived from ratings (feed scores, reputation) registers a callable here. It is
+#called as listener(db, model, {id: delta}, {id: parents}) inside the transaction that
+#moves the ratings, just before the commit, so the derived value never drifts from the
+#counter. `parents` holds the row's PARENT_COLUMNS (author, post, solution) that it has.
+rating_listeners = []
+
+PARENT_COLUMNS = ("user_id", "post_id", "solution_id")
+
+def parent_columns(model):
+    return [getattr(model, key) for key in PARENT_COLUMNS if hasattr(model, key)]
+
+
+def rating_changed(db, model, deltas : dict, rows : dict = None):
+    """Run the listeners; `rows` maps ids to rows the caller already holds (ORM objects, Rows
+    or dicts with the parent columns). Only ids missing from it cost a SELECT, shared by all."""
+    deltas = {id: delta for id, delta in deltas.items() if delta}
+    if not deltas or not rating_listeners:
+        return
+    columns = parent_columns(model)
+    rows = rows or {}
+    parents = {id: {column.key: _field(rows[id], column.key) for column in columns} for id in deltas if id in rows}
+    missing = [id for id in deltas if id not in parents]
+    if missing:
+        for row in db.execute(select(model.id, *columns).where(model.id.in_(missing))).mappings():
+            parents[row["id"]] = {column.key: row[column.key] for column in columns}
+    for listener in rating_listeners:
+        listener(db, model, deltas, parents)
+
+
+def _field(row, key):
+    return row[key] if isinstance(row, Mapping) else getattr(row, key)
+
+
+def move_rating(db, model, column, id : int, delta : int):
+    """Add `delta` to `column`, floored at 0; returns (new rating, delta actually applied, row) or None.
+
+    `row` carries the parent columns for rating_changed. The common case is one UPDATE ...
+    RETURNING guarded by `column + delta >= 0`; only a vote that would cross the floor
+    reads the locked row to learn how much it can take.
+    """
+    parents = parent_columns(model)
+    row = db.execute(
+        update(model).where(model.id == id, column + delta >= 0).values({column.key: column + delta})
+        .returning(column, *parents)
+    ).first()
+    if row is not None:
+        return row[0], delta, row
+    row = db.execute(select(column, *parents).where(model.id == id).with_for_update()).first()
+    if row is None:
+        return None
+    current = row[0]
+    rating = max(current + delta, 0)
+    if rating != current:
+        db.execute(update(model).where(model.id == id).values({column.key: rating}))
+    return rating, rating - current, row
+
+
+def _floored(db, model, key, deltas : dict):
+    """{id: delta} cut down to what the floor at 0 lets through, read from the locked rows,
+    and those rows ({id: row} with the parent columns) for the listeners."""
+    column = getattr(model, key)
+    rows = {row.id: row for row in db.execute(
+        select(model.id, column.label("rating"), *parent_columns(model)).where(model.id.in_(list(deltas))).with_for_update())}
+    applied = {}
+    for id, delta in deltas.items():
+        if id in rows:
+            applied[id] = max(rows[id].rating + delta, 0) - rows[id].rating
+    return {id: delta for id, delta in applied.items() if delta}, rows
+
+
+def shift_ratings(db, model, key : str, deltas : dict):
+    """Add {id: delta} to the `key` ratings of many rows, floored at 0, and run the listeners.
+
+    One locked SELECT and one executemany; the caller commits. Returns the applied deltas.
+    """
+    applied, rows = _floored(db, model, key, deltas)
+    if applied:
+        table = model.__table__
+        db.execute(
+            update(table).where(table.c.id == bindparam("b_id")).values({key: table.c[key] + bindparam("b_delta")}),
+            [{"b_id": id, "b_delta": delta} for id, delta in applied.items()],
+        )
+    rating_changed(db, model, applied, rows)
+    return applied
+
+
+class VoteBuffer:
+    """Write-behind buffer that folds rating deltas per row and flushes them in batches.
+
+    A burst of likes on one row becomes a single UPDATE. The floor at 0 is applied
+    to the net delta of a batch, not to each vote inside it.
+    """
+
+    def __init__(self, enabled=False, flush_interval=1.0, max_pending=500):
+        self.enabled = enabled
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, model, column, id : int, delta : int):
+        with self._lock:
+            key = (model, column.key, id)
+            self._pending[key] = self._pending.get(key, 0) + delta
+            full = len(self._pending) >= self.max_pending
+            if self._thread is None:
+                self._start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Write every pending delta; returns the number of rows touched."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        #one executemany per (model, column) instead of one UPDATE per vote
+        groups = {}
+        for (model, key, id), delta in pending.items():
+            if delta:
+                groups.setdefault((model, key), []).append({"b_id": id, "b_delta": delta})
+
+        with self._flush_lock:
+            database = SessionLocal()
+            try:
+                for (model, key), params in groups.items():
+                    shift_ratings(database, model, key, {p["b_id"]: p["b_delta"] for p in params})
+                database.commit()
+                response_cache.bump(*{model.__tablename__.lower() for model, key in groups})
+            except Exception:
+                database.rollback()
+                self._restore(pending)
+                logger.exception("Failed to flush %d buffered votes", len(pending))
+                raise
+            finally:
+                database.close()
+        return len(pending)
+
+    def _restore(self, pending):
+        #put the deltas back so the next flush retries them
+        with self._lock:
+            for key, delta in pending.items():
+                self._pending[key] = self._pending.get(key, 0) + delta
+
+    def _start(self):
+        self._thread = threading.Thread(target=self._run, name="vote-buffer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                #already logged; the deltas stay pending for the next tick
+                pass
+
+    def close(self):
+        self._stop.set()
+        self.flush()
+
+
+vote_buffer = VoteBuffer(
+    enabled=os.getenv("VOTE_BUFFER_ENABLED", "false").lower() in ("1", "true", "yes"),
+    flush_interval=float(os.getenv("VOTE_BUFFER_FLUSH_INTERVAL", "1.0")),
+    max_pending=int(os.getenv("VOTE_BUFFER_MAX_PENDING", "500")),
+)
+
+
+class DuplicateVote(Exception):
+    pass
+
+
+def _insert_ignoring_conflicts(db, table):
+    #Postgres and SQLite both support INSERT ... ON CONFLICT DO NOTHING
+    dialect_insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def _record_ballot(db, target_type : str, target_id : int, user_id : int, value : int) -> int:
+    """Insert or flip `user_id`'s row in VOTES; returns how far the score has to move.
+
+    A repeat of the same vote rolls back and raises DuplicateVote; flipping a like into
+    a dislike (or back) moves the score by two.
+    """
+    votes = VotesModel.__table__
+    #the unique index on (user_id, target_type, target_id) does the duplicate check
+    inserted = db.execute(
+        _insert_ignoring_conflicts(db, votes)
+        .values(user_id=user_id, target_type=target_type, target_id=target_id, value=value)
+        .returning(votes.c.id)
+    ).first()
+    if inserted is not None:
+        return value
+    flipped = db.execute(
+        update(votes)
+        .where(votes.c.user_id == user_id, votes.c.target_type == target_type,
+               votes.c.target_id == target_id, votes.c.value == -value)
+        .values(value=value)
+        .returning(votes.c.id)
+    ).first()
+    if flipped is None:
+        db.rollback()
+        raise DuplicateVote()
+    return 2 * value
+
+
+def record_vote(db, target_type : str, model, column, target_id : int, user_id : int, value : int):
+    """Record `user_id`'s vote on a target and move its score counter in the same transaction.
+
+    The counter is floored at 0 like every other rating write. Returns the new score,
+    or None if the target does not exist.
+    """
+    delta = _record_ballot(db, target_type, target_id, user_id, value)
+    moved = move_rating(db, model, column, target_id, delta)
+    if moved is None:
+        db.rollback()
+        return None
+    score, applied, row = moved
+    rating_changed(db, model, {target_id: applied}, {target_id: row})
+    db.commit()
+    return score
+
+
+def vote(db, target_type : str, model, column, target_id : int, value : int, user_id : int):
+    """Entry point for the like/dislike routes; returns (found, new_score).
+
+    Every vote is recorded in VOTES under the authenticated `user_id`. With the vote
+    buffer enabled only the counter write is deferred, so new_score is None.
+    """
+    if vote_buffer.enabled:
+        if db.query(model.id).filter(model.id == target_id).first() is None:
+            return False, None
+        delta = _record_ballot(db, target_type, target_id, user_id, value)
+        db.commit()
+        vote_buffer.add(model, column, target_id, delta)
+        return True, None
+    score = record_vote(db, target_type, model, column, target_id, user_id, value)
+    return score is not None, score
@@ -0,0 +1,124 @@
+import argparse
+from sqlalchemy import select, update, func, bindparam, event
+from sqlalchemy.orm import Session
+from Models.Users import UsersModel
+from Models.Solutions import SolutionsModel
+from Models.Comments import CommentsModel
+from Database.ratings import rating_listeners
+import oauth
+
+
+#User reputation
+#USERS.user_rating is the sum of the ratings of everything the user authored (solutions
+#and comments). It is moved by deltas in the transaction that moves those ratings - votes,
+#rating edits, creates and deletes - so it is never aggregated on read. The leaderboard
+#reads it through ix_users_user_rating_id; rebuild_reputation recomputes it from scratch.
+#Reputation itself is not floored: votes keep each rating at 0 or above and pass on only
+#the delta the floor let through, so the sum stays >= 0 unless a rating edit stores a
+#negative value, and then it is negative too. Clamping the sum instead would make later
+#deltas overshoot, and rebuild_reputation would no longer agree with it.
+#oauth caches the current user (with user_rating) for /api/auth/me, so the users whose
+#reputation moved are dropped from that cache once the transaction ends.
+
+AUTHORED = {
+    SolutionsModel: SolutionsModel.solution_rating,
+    CommentsModel: CommentsModel.comment_rating,
+}
+
+users = UsersModel.__table__
+
+
+def apply_reputation(db, deltas : dict):
+    """Add {user_id: delta} to the users' reputation in one executemany."""
+    params = [{"b_id": user_id, "b_delta": delta} for user_id, delta in deltas.items() if user_id is not None and delta]
+    if params:
+        db.info.setdefault("stale_users", set()).update(p["b_id"] for p in params)
+        db.execute(
+            update(users)
+            .where(users.c.id == bindparam("b_id"))
+            .values(user_rating=func.coalesce(users.c.user_rating, 0) + bindparam("b_delta")),
+            params,
+        )
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _invalidate_users(session, transaction):
+    #after commit or rollback alike: a rolled back change only costs a cache miss
+    if transaction.nested or transaction.parent is not None:
+        return
+    for user_id in session.info.pop("stale_users", ()):
+        oauth.invalidate_user(user_id)
+
+
+def record_authored(db, model, rows, sign : int = 1):
+    """Credit (sign=1) or take back (sign=-1) the ratings of created/deleted rows; ORM objects or dicts."""
+    key = AUTHORED[model].key
+    deltas = {}
+    for row in rows:
+        user_id, rating = (row.get("user_id"), row.get(key)) if isinstance(row, dict) else (row.user_id, getattr(row, key))
+        deltas[user_id] = deltas.get(user_id, 0) + sign * (rating or 0)
+    apply_reputation(db, deltas)
+
+
+def _on_rating_changed(db, model, deltas : dict, parents : dict):
+    if model not in AUTHORED:
+        return
+    by_user = {}
+    for id, delta in deltas.items():
+        user_id = parents.get(id, {}).get("user_id")
+        by_user[user_id] = by_user.get(user_id, 0) + delta
+    apply_reputation(db, by_user)
+
+rating_listeners.append(_on_rating_changed)
+
+
+def rebuild_reputation(connection):
+    """Recompute every user's reputation from the authored rows (backfills and repairs).
+
+    One correlated UPDATE; works on a Session or a Connection and the caller commits.
+    """
+    total = 0
+    for model, column in AUTHORED.items():
+        total = total + func.coalesce(select(func.sum(column)).where(model.user_id == users.c.id).scalar_subquery(), 0)
+    return connection.execute(update(users).values(user_rating=total)).rowcount
+
+
+def top_users(db, limit : int):
+    """The `limit` best-rated users with their competition rank (ties share a rank)."""
+    rows = db.execute(
+        select(UsersModel)
+        .order_by(UsersModel.user_rating.desc(), UsersModel.id.desc())
+        .limit(limit)
+    ).scalars().all()
+    ranked = []
+    for position, user in enumerate(rows, start=1):
+        same = ranked and ranked[-1][1].user_rating == user.user_rating
+        ranked.append((ranked[-1][0] if same else position, user))
+    return ranked
+
+
+def rank_of(db, user_id : int):
+    """(rank, user) for one user, or None; the rank is an index range count above its rating."""
+    user = db.get(UsersModel, user_id)
+    if user is None:
+        return None
+    above = db.execute(
+        select(func.count()).select_from(users).where(users.c.user_rating > (user.user_rating or 0))
+    ).scalar_one()
+    return above + 1, user
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain user reputation")
+    sub = parser.add_subparsers(dest="action", required=True)
+    sub.add_parser("rebuild", help="recompute USERS.user_rating from solution and comment ratings")
+    parser.parse_args()
+
+    from Database.db import engine
+    import Models.Posts  # SolutionsModel's relationships resolve it by name
+    with engine.begin() as connection:
+        print("rescored %d users" % rebuild_reputation(connection))
+
+
+if __name__ == "__main__":
+    main()
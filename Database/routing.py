@@ -0,0 +1,253 @@
+import os
+import logging
+import threading
+import itertools
+from contextvars import ContextVar
+from fastapi import Request
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError, InterfaceError
+from sqlalchemy.orm import sessionmaker
+from dotenv import load_dotenv
+from Database.db import SessionLocal, engine_options, async_url, get_async_engine, enable_foreign_keys
+from Database import db
+from cache import response_cache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+#Primary/replica routing
+#Read-only handlers take their session from get_read_db / get_async_read_db, which
+#hand out read replicas round-robin; everything else keeps using the primary through
+#get_db. A client that just wrote carries the READ_PRIMARY_COOKIE for
+#READ_YOUR_WRITES_WINDOW seconds and reads from the primary meanwhile, so it never
+#sees replication lag on its own changes. With no replicas configured every read
+#goes to the primary.
+#Locally two SQLite files can stand in for primary and replica, e.g.
+#    DATABASE_URL=sqlite:///./primary.db DATABASE_REPLICA_URLS=sqlite:///./replica.db
+
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+REPLICA_HEALTH_INTERVAL = float(os.getenv("REPLICA_HEALTH_INTERVAL", "5"))
+READ_YOUR_WRITES_WINDOW = int(os.getenv("READ_YOUR_WRITES_WINDOW", "5"))
+READ_PRIMARY_COOKIE = "read_primary"
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class Replica:
+    def __init__(self, url : str):
+        self.url = url
+        self.engine = enable_foreign_keys(create_engine(url, **engine_options(url)))
+        self.Session = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self.healthy = True
+        self._async_engine = None
+        self._async_session = None
+
+    def async_session(self):
+        if self._async_session is None:
+            from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+            url = async_url(self.url)
+            self._async_engine = create_async_engine(url, **engine_options(url, is_async=True))
+            enable_foreign_keys(self._async_engine.sync_engine)
+            self._async_session = async_sessionmaker(self._async_engine, autoflush=False, expire_on_commit=False)
+        return self._async_session()
+
+    def ping(self):
+        try:
+            with self.engine.connect() as connection:
+                connection.execute(text("SELECT 1"))
+            return True
+        except Exception:
+            return False
+
+
+class ReplicaSet:
+    def __init__(self, urls, health_interval : float = REPLICA_HEALTH_INTERVAL):
+        self.replicas = [Replica(url) for url in urls]
+        self.health_interval = health_interval
+        self._cycle = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def pick(self):
+        """Next healthy replica in round-robin order, or None to fall back to the primary."""
+        if not self.replicas:
+            return None
+        self._start()
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = next(self._cycle)
+                if replica.healthy:
+                    return replica
+        return None
+
+    def mark_down(self, replica):
+        if replica.healthy:
+            logger.warning("Read replica %s is down, routing its reads elsewhere", replica.engine.url)
+        replica.healthy = False
+
+    def check(self):
+        for replica in self.replicas:
+            healthy = replica.ping()
+            if healthy and not replica.healthy:
+                logger.info("Read replica %s is back", replica.engine.url)
+            elif not healthy:
+                self.mark_down(replica)
+            replica.healthy = healthy
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="replica-health", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.health_interval):
+            self.check()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        for replica in self.replicas:
+            replica.engine.dispose()
+
+    async def close_async(self):
+        for replica in self.replicas:
+            if replica._async_engine is not None:
+                await replica._async_engine.dispose()
+
+    def stats(self):
+        return [{"url": r.engine.url.render_as_string(hide_password=True), "healthy": r.healthy} for r in self.replicas]
+
+
+replica_set = ReplicaSet(DATABASE_REPLICA_URLS)
+
+
+def reads_primary(request : Request) -> bool:
+    return request.cookies.get(READ_PRIMARY_COOKIE) is not None
+
+
+def _pick(request : Request):
+    if reads_primary(request):
+        #a cached body may have been filled from a lagging replica, so read through it
+        request.state.bypass_cache = True
+        return None
+    replica = replica_set.pick()
+    if replica is not None:
+        #tells the response cache not to store what this replica returns right after a write
+        request.state.replica_lag_window = READ_YOUR_WRITES_WINDOW
+    return replica
+
+
+def read_session_factory(request : Request):
+    """sessionmaker for a read-only request: a replica's, or the primary's when sticky or none is up."""
+    replica = _pick(request)
+    return (replica.Session if replica else SessionLocal), replica
+
+
+def get_read_db(request : Request):
+    factory, replica = read_session_factory(request)
+    database = factory()
+    try:
+        yield database
+    except (OperationalError, InterfaceError):
+        if replica is not None:
+            replica_set.mark_down(replica)
+        raise
+    finally:
+        database.close()
+
+
+class ThreadedSession:
+    """Stands in for an AsyncSession when no async driver (asyncpg/aiosqlite) is installed.
+
+    Wraps a sync Session and runs its calls in the threadpool, so the async handlers
+    work unchanged; they just hold a worker for the round trip like the sync ones.
+    """
+
+    def __init__(self, session):
+        self.session = session
+
+    async def get(self, *args, **kwargs):
+        return await run_in_threadpool(self.session.get, *args, **kwargs)
+
+    async def execute(self, *args, **kwargs):
+        return await run_in_threadpool(self.session.execute, *args, **kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await run_in_threadpool(self.session.close)
+
+
+_async_driver_missing = False
+
+def _async_session(replica):
+    global _async_driver_missing
+    if not _async_driver_missing:
+        try:
+            if replica is None:
+                get_async_engine()
+                return db.AsyncSessionLocal()
+            return replica.async_session()
+        except ImportError:
+            _async_driver_missing = True
+            logger.warning("No async database driver installed; async reads use sync sessions in the threadpool")
+    return ThreadedSession((replica.Session if replica else SessionLocal)())
+
+
+async def get_async_read_db(request : Request):
+    replica = _pick(request)
+    session = _async_session(replica)
+    async with session as database:
+        try:
+            yield database
+        except (OperationalError, InterfaceError):
+            if replica is not None:
+                replica_set.mark_down(replica)
+            raise
+
+
+#Every write bumps a response cache version, so a bump during a request is what marks
+#it as a write (this also catches the GET like/dislike routes)
+_request_writes = ContextVar("request_writes", default=None)
+
+def _note_write(resources):
+    writes = _request_writes.get()
+    if writes is not None:
+        writes.append(resources)
+
+response_cache.on_bump.append(_note_write)
+
+
+class ReadYourWritesMiddleware:
+    """Marks clients that just made a successful write so their next reads hit the primary."""
+
+    def __init__(self, app, window : int = READ_YOUR_WRITES_WINDOW):
+        self.app = app
+        self.window = window
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not replica_set.replicas:
+            await self.app(scope, receive, send)
+            return
+        writes = []
+        token = _request_writes.set(writes)
+
+        async def send_marked(message):
+            wrote = writes or scope["method"] not in SAFE_METHODS
+            if message["type"] == "http.response.start" and wrote and message["status"] < 400:
+                cookie = "%s=1; Max-Age=%d; Path=/; HttpOnly; SameSite=Lax" % (READ_PRIMARY_COOKIE, self.window)
+                message["headers"] = list(message.get("headers", [])) + [(b"set-cookie", cookie.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_marked)
+        finally:
+            _request_writes.reset(token)
@@ -0,0 +1,99 @@
+import re
+from sqlalchemy import DDL, event, select, func, table, column, literal_column
+from Models.Posts import PostsModel
+
+#Full-text search over post titles and descriptions.
+#Postgres keeps a generated tsvector column with a GIN index; SQLite (local runs)
+#keeps an external-content FTS5 table in sync with triggers. Neither is mapped on
+#PostsModel, so the model stays portable and create_all works on both.
+
+POSTGRES_SEARCH_DDL = [
+    """ALTER TABLE "POSTS" ADD COLUMN IF NOT EXISTS post_search tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(post_title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(post_description, '')), 'B')
+    ) STORED""",
+    """CREATE INDEX IF NOT EXISTS ix_posts_post_search ON "POSTS" USING GIN (post_search)""",
+]
+
+SQLITE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS "POSTS_FTS"
+    USING fts5(post_title, post_description, content='POSTS', content_rowid='id')""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_insert AFTER INSERT ON "POSTS" BEGIN
+        INSERT INTO "POSTS_FTS"(rowid, post_title, post_description)
+        VALUES (new.id, new.post_title, new.post_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_delete AFTER DELETE ON "POSTS" BEGIN
+        INSERT INTO "POSTS_FTS"("POSTS_FTS", rowid, post_title, post_description)
+        VALUES ('delete', old.id, old.post_title, old.post_description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS posts_fts_update AFTER UPDATE OF post_title, post_description ON "POSTS" BEGIN
+        INSERT INTO "POSTS_FTS"("POSTS_FTS", rowid, post_title, post_description)
+        VALUES ('delete', old.id, old.post_title, old.post_description);
+        INSERT INTO "POSTS_FTS"(rowid, post_title, post_description)
+        VALUES (new.id, new.post_title, new.post_description);
+    END""",
+]
+
+for statement in POSTGRES_SEARCH_DDL:
+    event.listen(PostsModel.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
+for statement in SQLITE_SEARCH_DDL:
+    event.listen(PostsModel.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+
+def install_search_index(connection):
+    """Add the search column/index (Postgres) or FTS table (SQLite) to an existing POSTS table."""
+    statements = POSTGRES_SEARCH_DDL if connection.dialect.name == "postgresql" else SQLITE_SEARCH_DDL
+    for statement in statements:
+        connection.exec_driver_sql(statement)
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("""INSERT INTO "POSTS_FTS"("POSTS_FTS") VALUES ('rebuild')""")
+
+
+def _apply_filters(stmt, category, difficulty):
+    if category:
+        stmt = stmt.where(PostsModel.post_category == category)
+    if difficulty:
+        stmt = stmt.where(PostsModel.post_difficulty == difficulty)
+    return stmt
+
+
+def _search_postgres(db, q, category, difficulty, limit):
+    tsquery = func.websearch_to_tsquery("english", q)
+    vector = literal_column('"POSTS".post_search')
+    rank = func.ts_rank_cd(vector, tsquery).label("rank")
+    stmt = select(PostsModel, rank).where(vector.op("@@")(tsquery))
+    stmt = _apply_filters(stmt, category, difficulty)
+    return db.execute(stmt.order_by(rank.desc(), PostsModel.id).limit(limit)).all()
+
+
+def _fts5_query(q):
+    #quote every word so user punctuation can never be parsed as FTS5 syntax
+    words = re.findall(r"\w+", q)
+    return " ".join('"%s"' % w for w in words)
+
+
+def _search_sqlite(db, q, category, difficulty, limit):
+    match = _fts5_query(q)
+    if not match:
+        return []
+    fts = table("POSTS_FTS", column("rowid"))
+    #bm25 is lower-is-better; titles weigh twice as much as descriptions
+    bm25 = func.bm25(literal_column('"POSTS_FTS"'), 2.0, 1.0)
+    stmt = (
+        select(PostsModel, (-bm25).label("rank"))
+        .join(fts, fts.c.rowid == PostsModel.id)
+        .where(literal_column('"POSTS_FTS"').op("MATCH")(match))
+    )
+    stmt = _apply_filters(stmt, category, difficulty)
+    return db.execute(stmt.order_by(bm25, PostsModel.id).limit(limit)).all()
+
+
+def search_posts(db, q : str, category : str = None, difficulty : str = None, limit : int = 20):
+    """Return [(post, rank)] best match first."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return _search_postgres(db, q, category, difficulty, limit)
+    if dialect == "sqlite":
+        return _search_sqlite(db, q, category, difficulty, limit)
+    raise NotImplementedError(f"Full-text search is not available on {dialect}")
@@ -0,0 +1,472 @@
+import os
+import re
+import json
+import math
+import time
+import zlib
+import bisect
+import logging
+import argparse
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select, or_
+from dotenv import load_dotenv
+from Models.Posts import PostsModel
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+#Similar posts
+#Every post is a hashed TF-IDF vector over the words and word pairs of its title and
+#description (the title counts double), L2-normalized, so cosine similarity is a
+#sparse dot product. Vectors live in SciPy CSR blocks: the base block is memory-mapped
+#from SIMILAR_INDEX_PATH, newer and re-indexed posts are appended as small in-memory
+#blocks. Workers catch up with the database incrementally: posts with an id above the
+#last one seen or a post_updated_at past the watermark are (re)indexed on the next
+#query, deleted posts are dropped. The file is rewritten atomically on shutdown and by
+#`python -m Database.similar rebuild`.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SIMILAR_INDEX_PATH = os.getenv("SIMILAR_INDEX_PATH", os.path.join(ROOT, "similar_posts.idx"))
+SIMILAR_FEATURES = int(os.getenv("SIMILAR_FEATURES", str(2 ** 18)))
+SIMILAR_DUPLICATE_THRESHOLD = float(os.getenv("SIMILAR_DUPLICATE_THRESHOLD", "0.8"))
+SIMILAR_SYNC_INTERVAL = float(os.getenv("SIMILAR_SYNC_INTERVAL", "5"))
+SYNC_SLACK = timedelta(seconds=60)  # re-read recent updates, in case a slow transaction committed late
+TITLE_WEIGHT = 2
+BUILD_CHUNK = 5000
+MAX_DELTA_BLOCKS = 64
+
+MAGIC = b"PRODEA-SIMILAR-1\n"
+ALIGN = 64
+
+_WORD = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how i if in into is it its my no not of on or "
+    "our so than that the their then there these this to up us was we what when where which who why will "
+    "with would you your".split()
+)
+
+
+def _tokens(text):
+    words = [w for w in _WORD.findall((text or "").lower()) if len(w) > 1 and w not in STOPWORDS]
+    return words + ["%s %s" % pair for pair in zip(words, words[1:])]
+
+
+def term_frequencies(posts, n_features : int = SIMILAR_FEATURES):
+    """CSR matrix of sublinear term frequencies, one row per (title, description)."""
+    rows, columns, values = [], [], []
+    for row, (title, description) in enumerate(posts):
+        counts = {}
+        for weight, text in ((TITLE_WEIGHT, title), (1, description)):
+            for token in _tokens(text):
+                bucket = zlib.crc32(token.encode()) % n_features  # stable across processes, unlike hash()
+                counts[bucket] = counts.get(bucket, 0) + weight
+        for bucket, count in counts.items():
+            rows.append(row)
+            columns.append(bucket)
+            values.append(1.0 + math.log(count))
+    return sparse.csr_matrix((np.array(values, dtype=np.float32), (rows, columns)),
+                             shape=(len(posts), n_features), dtype=np.float32)
+
+
+def weigh(tf, idf):
+    """TF-IDF rows scaled to unit length."""
+    weighted = (tf @ sparse.diags(idf)).tocsr()
+    norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return (sparse.diags((1.0 / norms).astype(np.float32)) @ weighted).tocsr().astype(np.float32)
+
+
+def _digest(title, description):
+    return zlib.crc32(("%s\0%s" % (title or "", description or "")).encode())
+
+
+class SimilarIndex:
+    def __init__(self, n_features : int = SIMILAR_FEATURES):
+        self.n_features = n_features
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.blocks = [sparse.csr_matrix((0, self.n_features), dtype=np.float32)]
+        self.block_ids = [np.zeros(0, dtype=np.int64)]
+        self.block_starts = [0]
+        self.rows = 0
+        self.row_of = {}     # post id -> global row
+        self.digests = {}    # post id -> crc of its text, to skip unchanged re-syncs
+        self.dead = set()    # rows of deleted or re-indexed posts
+        self.df = np.zeros(self.n_features, dtype=np.int64)
+        self.watermark = None
+        self.max_id = 0
+        self.loaded = False
+        self.stale = True
+        self.dirty = False
+        self.synced_at = 0.0
+        self._lookup = None
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def idf(self):
+        return (np.log((1.0 + len(self.row_of)) / (1.0 + self.df)) + 1.0).astype(np.float32)
+
+    #Mutations
+
+    def upsert(self, posts):
+        """(Re)index [(id, title, description)]; posts whose text did not change are skipped."""
+        with self._lock:
+            posts = [p for p in posts if self.digests.get(p[0]) != _digest(p[1], p[2])]
+            if not posts:
+                return 0
+            self._remove([p[0] for p in posts])
+            tf = term_frequencies([(title, description) for _, title, description in posts], self.n_features)
+            self.df += np.bincount(tf.indices, minlength=self.n_features)
+            for offset, (id, title, description) in enumerate(posts):
+                self.row_of[id] = self.rows + offset
+                self.digests[id] = _digest(title, description)
+            self._append(np.array([p[0] for p in posts], dtype=np.int64), weigh(tf, self.idf()))
+            self.max_id = max(self.max_id, max(p[0] for p in posts))
+            self.dirty = True
+            return len(posts)
+
+    def remove(self, ids):
+        with self._lock:
+            if self._remove(ids):
+                self.dirty = True
+
+    def _remove(self, ids):
+        removed = 0
+        for id in ids:
+            row = self.row_of.pop(id, None)
+            if row is None:
+                continue
+            self.digests.pop(id, None)
+            self.dead.add(row)
+            self.df[self._row(row).indices] -= 1
+            removed += 1
+        if removed:
+            self._lookup = None
+        return removed
+
+    def _row(self, row : int):
+        block = bisect.bisect_right(self.block_starts, row) - 1
+        return self.blocks[block][row - self.block_starts[block]]
+
+    def _append(self, ids, matrix):
+        self.blocks.append(matrix)
+        self.block_ids.append(ids)
+        self.block_starts.append(self.rows)
+        self.rows += len(ids)
+        self._lookup = None
+        if len(self.blocks) > MAX_DELTA_BLOCKS or len(self.dead) > max(1000, self.rows // 4):
+            self._compact()
+
+    def _compact(self):
+        """Fold every block into one in-memory base block without the dead rows."""
+        matrix, ids = self._live()
+        self.blocks, self.block_ids, self.block_starts = [matrix], [ids], [0]
+        self.rows = len(ids)
+        self.row_of = {int(id): row for row, id in enumerate(ids)}
+        self.dead = set()
+        self._lookup = None
+
+    def _live(self):
+        matrix = sparse.vstack(self.blocks, format="csr", dtype=np.float32)
+        ids = np.concatenate(self.block_ids)
+        alive = self._alive()
+        return matrix[alive], ids[alive]
+
+    def _alive(self):
+        alive = np.ones(self.rows, dtype=bool)
+        if self.dead:
+            alive[np.fromiter(self.dead, dtype=np.int64)] = False
+        return alive
+
+    #Queries
+
+    def vectorize(self, posts):
+        return weigh(term_frequencies(posts, self.n_features), self.idf())
+
+    def vector_of(self, id : int):
+        with self._lock:
+            row = self.row_of.get(id)
+            return None if row is None else self._row(row)
+
+    def top_k(self, queries, k : int, exclude=()):
+        """Cosine top-k for each row of `queries`: a list of [(post_id, similarity)], best first."""
+        with self._lock:
+            if self._lookup is None:
+                self._lookup = (np.concatenate(self.block_ids), self._alive())
+            blocks, starts = list(self.blocks), list(self.block_starts)
+            ids, alive = self._lookup
+        exclude = set(exclude)
+        candidates = [([], []) for _ in range(queries.shape[0])]
+        for block, start in zip(blocks, starts):
+            if block.shape[0] == 0:
+                continue
+            scores = (queries @ block.T).tocsr()  # only posts sharing a term with the query are stored
+            for i in range(scores.shape[0]):
+                lo, hi = scores.indptr[i], scores.indptr[i + 1]
+                candidates[i][0].append(scores.indices[lo:hi] + start)
+                candidates[i][1].append(scores.data[lo:hi])
+        results = []
+        for rows, values in candidates:
+            rows = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+            values = np.concatenate(values) if values else np.zeros(0, dtype=np.float32)
+            keep = alive[rows]
+            if exclude:
+                keep &= ~np.isin(ids[rows], list(exclude))
+            rows, values = rows[keep], values[keep]
+            if len(rows) > k:
+                best = np.argpartition(-values, k)[:k]
+                rows, values = rows[best], values[best]
+            order = np.argsort(-values, kind="stable")
+            results.append([(int(ids[rows[j]]), round(float(values[j]), 4)) for j in order])
+        return results
+
+    #Database catch-up
+
+    def sync(self, db, force : bool = False):
+        """Index the posts created or updated since the last sync (at most every SIMILAR_SYNC_INTERVAL)."""
+        if not force and not self.stale and time.monotonic() - self.synced_at < SIMILAR_SYNC_INTERVAL:
+            return 0
+        with self._lock:
+            self.stale = False
+            self.synced_at = time.monotonic()
+            condition = PostsModel.id > self.max_id
+            if self.watermark is not None:
+                condition = or_(condition, PostsModel.post_updated_at >= self.watermark - SYNC_SLACK)
+            rows = db.execute(
+                select(PostsModel.id, PostsModel.post_title, PostsModel.post_description, PostsModel.post_updated_at)
+                .where(condition)
+            ).all()
+            if rows:
+                self._advance(rows)
+            return self.upsert([(id, title, description) for id, title, description, _ in rows])
+
+    def _advance(self, rows):
+        newest = max((updated for *_, updated in rows if updated is not None), default=None)
+        if newest is not None:
+            newest = newest.replace(tzinfo=None)
+            if self.watermark is None or newest > self.watermark:
+                self.watermark = newest
+
+    def build(self, db):
+        """Index every post from scratch; IDF is computed once over the whole collection."""
+        with self._lock:
+            self._reset()
+            stmt = (select(PostsModel.id, PostsModel.post_title, PostsModel.post_description, PostsModel.post_updated_at)
+                    .order_by(PostsModel.id).execution_options(yield_per=BUILD_CHUNK))
+            tfs, ids = [], []
+            for chunk in db.execute(stmt).partitions():
+                self._advance(chunk)
+                tf = term_frequencies([(title, description) for _, title, description, _ in chunk], self.n_features)
+                self.df += np.bincount(tf.indices, minlength=self.n_features)
+                tfs.append(tf)
+                for id, title, description, _ in chunk:
+                    self.row_of[id] = len(ids)
+                    self.digests[id] = _digest(title, description)
+                    ids.append(id)
+            if ids:
+                matrix = weigh(sparse.vstack(tfs, format="csr"), self.idf())
+                self.blocks, self.block_ids, self.block_starts = [matrix], [np.array(ids, dtype=np.int64)], [0]
+                self.rows, self.max_id = len(ids), ids[-1]
+            self.loaded, self.stale, self.dirty = True, False, True
+            self.synced_at = time.monotonic()
+            return len(ids)
+
+    #Persistence: one file, a JSON header and page-aligned raw arrays that load with np.memmap
+
+    def save(self, path : str = SIMILAR_INDEX_PATH):
+        with self._lock:
+            matrix, ids = self._live()
+            arrays = {
+                "data": matrix.data.astype(np.float32),
+                "indices": matrix.indices.astype(np.int32),
+                "indptr": matrix.indptr.astype(np.int32),
+                "ids": ids.astype(np.int64),
+                "digests": np.array([self.digests[int(id)] for id in ids], dtype=np.int64),
+                "df": self.df,
+            }
+            header = {
+                "n_features": self.n_features,
+                "max_id": self.max_id,
+                "watermark": self.watermark.isoformat() if self.watermark else None,
+                "arrays": {},
+            }
+            self.dirty = False
+        offset = 0
+        for name, array in arrays.items():
+            header["arrays"][name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+            offset += -(-array.nbytes // ALIGN) * ALIGN
+        encoded = json.dumps(header).encode()
+        start = -(-(len(MAGIC) + 8 + len(encoded)) // ALIGN) * ALIGN
+        tmp = "%s.%d.tmp" % (path, os.getpid())
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + len(encoded).to_bytes(8, "little") + encoded)
+            for name, array in arrays.items():
+                f.seek(start + header["arrays"][name]["offset"])
+                f.write(np.ascontiguousarray(array).tobytes())
+            f.truncate(start + offset)
+        os.replace(tmp, path)  # readers keep their mapping of the old file
+        return len(ids)
+
+    def load(self, path : str = SIMILAR_INDEX_PATH):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError("%s is not a similar-posts index" % path)
+            length = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(length))
+        if header["n_features"] != self.n_features:
+            raise ValueError("%s was built with %d features, not %d" % (path, header["n_features"], self.n_features))
+        start = -(-(len(MAGIC) + 8 + length) // ALIGN) * ALIGN
+
+        def array(name):
+            spec = header["arrays"][name]
+            if not math.prod(spec["shape"]):
+                return np.zeros(spec["shape"], dtype=spec["dtype"])
+            return np.memmap(path, dtype=spec["dtype"], mode="r", offset=start + spec["offset"], shape=tuple(spec["shape"]))
+
+        with self._lock:
+            self._reset()
+            ids = np.asarray(array("ids"))
+            matrix = sparse.csr_matrix((array("data"), array("indices"), array("indptr")),
+                                       shape=(len(ids), self.n_features), copy=False)
+            self.blocks, self.block_ids, self.block_starts = [matrix], [ids], [0]
+            self.rows = len(ids)
+            self.row_of = {int(id): row for row, id in enumerate(ids)}
+            self.digests = dict(zip(self.row_of, array("digests").tolist()))
+            self.df = np.array(array("df"), dtype=np.int64)
+            self.max_id = header["max_id"]
+            self.watermark = datetime.fromisoformat(header["watermark"]) if header["watermark"] else None
+            self.loaded, self.stale, self.dirty = True, True, False
+        return len(ids)
+
+    def ensure_loaded(self, session_factory, path : str = SIMILAR_INDEX_PATH):
+        """Map the saved index (or build it from the database) once per process."""
+        if self.loaded:
+            return
+        with self._lock:
+            if self.loaded:
+                return
+            started = time.perf_counter()
+            if os.path.exists(path):
+                try:
+                    count, how = self.load(path), "loaded"
+                except (OSError, ValueError) as e:
+                    logger.warning("Rebuilding the similar-posts index: %s", e)
+                    count, how = None, None
+            else:
+                count, how = None, None
+            if how is None:
+                database = session_factory()
+                try:
+                    count, how = self.build(database), "built"
+                finally:
+                    database.close()
+                try:
+                    self.save(path)  # the next worker maps it instead of rebuilding
+                except OSError as e:
+                    logger.warning("Could not save the similar-posts index: %s", e)
+            logger.info("Similar-posts index %s: %d posts in %.0fms", how, count, (time.perf_counter() - started) * 1000)
+
+
+index = SimilarIndex()
+
+
+def preload(session_factory):
+    """Load the index ahead of the first similar/duplicate query (the app runs this in a thread)."""
+    try:
+        index.ensure_loaded(session_factory)
+    except Exception as e:
+        logger.warning("Similar-posts index not loaded yet (the first query retries): %s", e)
+
+
+def close():
+    if index.loaded and index.dirty:
+        try:
+            index.save()
+        except OSError:
+            logger.exception("Failed to save the similar-posts index")
+
+
+def posts_changed():
+    """Posts were created or edited in this process; the next query syncs at once."""
+    index.stale = True
+
+
+def posts_deleted(ids):
+    index.remove(ids)
+
+
+def _ready(db):
+    from Database.db import SessionLocal
+    index.ensure_loaded(SessionLocal)
+    index.sync(db)
+
+
+def similar_posts(db, post, limit : int):
+    """[(PostsModel, similarity)] most similar to `post` first; posts deleted elsewhere are dropped."""
+    _ready(db)
+    vector = index.vector_of(post.id)
+    if vector is None:
+        vector = index.vectorize([(post.post_title, post.post_description)])
+    matches = index.top_k(vector, limit, exclude=(post.id,))[0]
+    return _with_rows(db, matches)
+
+
+def find_duplicates(db, posts, threshold : float = SIMILAR_DUPLICATE_THRESHOLD, limit : int = 3):
+    """For each new post (title, description): the existing posts at least `threshold` similar
+    as [(PostsModel, similarity)], and the earlier posts of the same list that are as
+    [(index, similarity)] - those are not in the index yet."""
+    _ready(db)
+    vectors = index.vectorize(posts)
+    matches = index.top_k(vectors, limit)
+    existing = [[(row, score) for row, score in _with_rows(db, found) if score >= threshold] for found in matches]
+    return existing, _repeats(vectors, threshold, limit)
+
+
+def _repeats(vectors, threshold : float, limit : int):
+    repeats = [[] for _ in range(vectors.shape[0])]
+    #rows are unit length, so the lower triangle of V V^T holds each post's cosine to the ones before it
+    pairs = sparse.tril(vectors @ vectors.T, k=-1).tocoo()
+    for i, j, score in zip(pairs.row, pairs.col, pairs.data):
+        if score >= threshold:
+            repeats[i].append((int(j), float(score)))
+    return [sorted(found, key=lambda match: -match[1])[:limit] for found in repeats]
+
+
+def _with_rows(db, matches):
+    if not matches:
+        return []
+    rows = {post.id: post for post in db.execute(
+        select(PostsModel).where(PostsModel.id.in_([id for id, _ in matches]))).scalars()}
+    missing = [id for id, _ in matches if id not in rows]
+    if missing:
+        index.remove(missing)
+    return [(rows[id], score) for id, score in matches if id in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the similar-posts index")
+    sub = parser.add_subparsers(dest="action", required=True)
+    sub.add_parser("rebuild", help="index every post and write SIMILAR_INDEX_PATH")
+    parser.parse_args()
+
+    from Database.db import SessionLocal
+    import Models.Users, Models.Solutions, Models.Comments  # relationships resolve them by name
+    database = SessionLocal()
+    try:
+        index.build(database)
+    finally:
+        database.close()
+    print("indexed %d posts into %s" % (index.save(), SIMILAR_INDEX_PATH))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,25 @@
 from sqlalchemy import Column , Integer , String , ForeignKey
 from Database.db import Base
-from sqlalchemy.sql import text
-from sqlalchemy import TIMESTAMP
+from sqlalchemy.sql import func
+from sqlalchemy import TIMESTAMP, Index
+from sqlalchemy.orm import relationship
 
 class CommentsModel(Base):
     __tablename__ = "COMMENTS"
-    id = Column(Integer , primary_key= True , index = True)
-    comment_text = Column(String , index = True)
+    #keyset pagination walks (created_at, id); a solution's thread loads its comments by (solution_id, created_at)
+    __table_args__ = (
+        Index("ix_comments_created_at_id", "created_at", "id"),
+        Index("ix_comments_solution_id_created_at", "solution_id", "created_at"),
+        Index("ix_comments_post_id", "post_id"),
+        Index("ix_comments_user_id", "user_id"),
+    )
+    id = Column(Integer , primary_key= True)
+    comment_text = Column(String)
     comment_rating = Column(Integer , default = 0)
-    post_id = Column(Integer , ForeignKey("POSTS.id"))
+    post_id = Column(Integer , ForeignKey("POSTS.id", ondelete="CASCADE"))
     user_id = Column(Integer , ForeignKey("USERS.id"))
-    solution_id = Column(Integer , ForeignKey("SOLUTIONS.id"))
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=text('now()'))
-    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, default=text('now()'))
\ No newline at end of file
+    solution_id = Column(Integer , ForeignKey("SOLUTIONS.id", ondelete="CASCADE"))
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+
+    solution = relationship("SolutionsModel", back_populates="comments")
@@ -0,0 +1,9 @@
+from sqlalchemy import Column , Integer , String
+from Database.db import Base
+
+#Posts per (category, difficulty) pair, kept up to date by Database/facets.py
+class PostFacetCountsModel(Base):
+    __tablename__ = "POST_FACET_COUNTS"
+    post_category = Column(String , primary_key= True)
+    post_difficulty = Column(String , primary_key= True)
+    post_count = Column(Integer , nullable=False , default = 0)
@@ -0,0 +1,15 @@
+from sqlalchemy import Column , Integer , Float , ForeignKey
+from Database.db import Base
+from sqlalchemy import TIMESTAMP, Index
+
+#Precomputed feed scores, one row per post, kept up to date by Database/feed.py
+class PostScoresModel(Base):
+    __tablename__ = "POST_SCORES"
+    #the feed is a descending walk of (score, post_id)
+    __table_args__ = (Index("ix_post_scores_score_post_id", "score", "post_id"),)
+    post_id = Column(Integer , ForeignKey("POSTS.id", ondelete="CASCADE") , primary_key= True)
+    solution_count = Column(Integer , nullable=False , default = 0)
+    comment_count = Column(Integer , nullable=False , default = 0)
+    rating_sum = Column(Integer , nullable=False , default = 0)
+    post_created_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    score = Column(Float , nullable=False , default = 0)
@@ -1,16 +1,26 @@
 from sqlalchemy import Column , Integer , String , ForeignKey
 from Database.db import Base
 from datetime import datetime
-from sqlalchemy.sql import text
-from sqlalchemy import TIMESTAMP
+from sqlalchemy.sql import text, func
+from sqlalchemy import TIMESTAMP, Index
+from sqlalchemy.orm import relationship
 
 class PostsModel(Base):
     __tablename__ = "POSTS"
-    id = Column(Integer , primary_key= True , index = True)
-    post_title = Column(String , index = True)
-    post_description = Column(String , index = True)
+    #keyset pagination walks (post_created_at, id)
+    __table_args__ = (
+        Index("ix_posts_post_created_at_id", "post_created_at", "id"),
+        Index("ix_posts_user_id", "user_id"),
+        Index("ix_posts_post_updated_at", "post_updated_at"),  # similar-posts index catch-up
+    )
+    id = Column(Integer , primary_key= True)
+    post_title = Column(String)
+    post_description = Column(String)
     post_category = Column(String , index = True)
     post_difficulty = Column(String , index = True)
-    post_created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=text('now()'))
-    post_updated_at = Column(TIMESTAMP(timezone=True), nullable=False, default=text('now()'))
-    user_id = Column(Integer , ForeignKey("USERS.id"))
\ No newline at end of file
+    post_rating = Column(Integer , default = 0 , server_default = text('0') , nullable = False)
+    post_created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+    post_updated_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+    user_id = Column(Integer , ForeignKey("USERS.id"))
+
+    solutions = relationship("SolutionsModel", back_populates="post", order_by="SolutionsModel.created_at", passive_deletes=True)
@@ -1,14 +1,24 @@
 from sqlalchemy import Column , Integer , String , ForeignKey
 from Database.db import Base
 from datetime import datetime
-from sqlalchemy.sql import text
-from sqlalchemy import TIMESTAMP
+from sqlalchemy.sql import func
+from sqlalchemy import TIMESTAMP, Index
+from sqlalchemy.orm import relationship
 
 class SolutionsModel(Base):
     __tablename__ = "SOLUTIONS"
-    id = Column(Integer , primary_key= True , index = True)
-    solution_text = Column(String , index = True)
+    #keyset pagination walks (created_at, id); a post's thread loads its solutions by (post_id, created_at)
+    __table_args__ = (
+        Index("ix_solutions_created_at_id", "created_at", "id"),
+        Index("ix_solutions_post_id_created_at", "post_id", "created_at"),
+        Index("ix_solutions_user_id", "user_id"),
+    )
+    id = Column(Integer , primary_key= True)
+    solution_text = Column(String)
     solution_rating = Column(Integer , default = 0)
-    post_id = Column(Integer , ForeignKey("POSTS.id"))
+    post_id = Column(Integer , ForeignKey("POSTS.id", ondelete="CASCADE"))
     user_id = Column(Integer , ForeignKey("USERS.id"))
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=text('now()'))
\ No newline at end of file
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
+
+    post = relationship("PostsModel", back_populates="solutions")
+    comments = relationship("CommentsModel", back_populates="solution", order_by="CommentsModel.created_at", passive_deletes=True)
@@ -1,14 +1,19 @@
 from sqlalchemy import Column , Integer , String
 from Database.db import Base
 from datetime import  datetime
-from sqlalchemy.sql import text
-from sqlalchemy import TIMESTAMP
+from sqlalchemy.sql import func
+from sqlalchemy import TIMESTAMP, Index
 
 class UsersModel(Base):
     __tablename__ = "USERS"
-    id = Column(Integer , primary_key= True , index = True)
+    #keyset pagination walks (created_at, id); the leaderboard walks (user_rating, id) backwards
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+        Index("ix_users_user_rating_id", "user_rating", "id"),
+    )
+    id = Column(Integer , primary_key= True)
     username = Column(String , index = True)
     email = Column(String , unique = True , index = True)
-    password = Column(String , index = True)
+    password = Column(String)
     user_rating = Column(Integer , default = 0)
-    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=text('now()'))
\ No newline at end of file
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
\ No newline at end of file
@@ -0,0 +1,20 @@
+from sqlalchemy import Column , Integer , String , SmallInteger , ForeignKey , UniqueConstraint
+from Database.db import Base
+from sqlalchemy.sql import func
+from sqlalchemy import TIMESTAMP
+
+#Vote targets
+POST = "post"
+SOLUTION = "solution"
+COMMENT = "comment"
+
+class VotesModel(Base):
+    __tablename__ = "VOTES"
+    #one vote per user per target; duplicates are rejected by this index, not by a lookup
+    __table_args__ = (UniqueConstraint("user_id", "target_type", "target_id", name="uq_votes_user_target"),)
+    id = Column(Integer , primary_key= True)
+    user_id = Column(Integer , ForeignKey("USERS.id", ondelete="CASCADE") , nullable=False)
+    target_type = Column(String(16) , nullable=False)
+    target_id = Column(Integer , nullable=False)
+    value = Column(SmallInteger , nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), nullable=False, default=func.now())
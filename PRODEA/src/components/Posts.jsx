@@ -1,12 +1,57 @@
 import React, { useState, useEffect } from 'react';
-import { postsAPI, solutionsAPI, commentsAPI } from '../services/api';
+import { postsAPI, solutionsAPI, commentsAPI, eventsAPI } from '../services/api';
 import { testBackendConnection } from '../utils/testConnection';
 import '../index.css';
 
+// Applies one change event from eventsAPI to the loaded threads (post_id -> thread).
+// Post ratings are left alone: the like/dislike response already carries the new score.
+const mapSolutions = (threads, fn) => Object.fromEntries(
+  Object.entries(threads).map(([postId, thread]) => [postId, { ...thread, solutions: fn(thread.solutions || [], Number(postId)) }])
+);
+
+const applyEvent = (threads, event) => {
+  switch (event.type) {
+    case 'solution.created':
+      return mapSolutions(threads, (solutions, postId) => (
+        postId === event.solution.post_id && !solutions.some(s => s.id === event.solution.id)
+          ? [...solutions, { ...event.solution, comments: [] }]
+          : solutions
+      ));
+    case 'solution.deleted':
+      return mapSolutions(threads, (solutions) => solutions.filter(s => s.id !== event.id));
+    case 'comment.created':
+      return mapSolutions(threads, (solutions) => solutions.map(s => (
+        s.id === event.comment.solution_id && !(s.comments || []).some(c => c.id === event.comment.id)
+          ? { ...s, comments: [...(s.comments || []), event.comment] }
+          : s
+      )));
+    case 'comment.deleted':
+      return mapSolutions(threads, (solutions) => solutions.map(s => (
+        s.id === event.solution_id ? { ...s, comments: (s.comments || []).filter(c => c.id !== event.id) } : s
+      )));
+    case 'rating':
+      if (event.kind === 'solution') {
+        return mapSolutions(threads, (solutions) => solutions.map(s => (
+          s.id === event.id ? { ...s, solution_rating: Math.max((s.solution_rating || 0) + event.delta, 0) } : s
+        )));
+      }
+      if (event.kind === 'comment') {
+        return mapSolutions(threads, (solutions) => solutions.map(s => ({
+          ...s,
+          comments: (s.comments || []).map(c => (
+            c.id === event.id ? { ...c, comment_rating: Math.max((c.comment_rating || 0) + event.delta, 0) } : c
+          )),
+        })));
+      }
+      return threads;
+    default:
+      return threads;
+  }
+};
+
 function Posts() {
   const [posts, setPosts] = useState([]);
-  const [solutions, setSolutions] = useState([]);
-  const [comments, setComments] = useState([]);
+  const [threads, setThreads] = useState({}); // post_id -> post with nested solutions and comments
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [showPostModal, setShowPostModal] = useState(false);
@@ -14,7 +59,8 @@ function Posts() {
   const [showCommentModal, setShowCommentModal] = useState(null); // solution_id
   const [expandedPosts, setExpandedPosts] = useState(new Set());
   const [expandedSolutions, setExpandedSolutions] = useState(new Set());
-  const [postRatings, setPostRatings] = useState({}); // Client-side ratings for posts
+  const [filters, setFilters] = useState({ post_category: '', post_difficulty: '' });
+  const [facetCounts, setFacetCounts] = useState({ post_category: {}, post_difficulty: {} });
   
   const [postFormData, setPostFormData] = useState({
     post_title: '',
@@ -54,48 +100,37 @@ function Posts() {
         setError(result.error || 'Cannot connect to backend. Make sure it\'s running on http://localhost:8000');
       }
     });
-    
-    fetchAllData();
   }, []);
 
-  const fetchAllData = async () => {
+  useEffect(() => {
+    fetchPosts();
+  }, [filters]);
+
+  // Expanded threads are kept current by change events instead of being refetched
+  useEffect(() => {
+    const postIds = [...expandedPosts];
+    if (postIds.length === 0) return undefined;
+    return eventsAPI.subscribe({ postIds }, (event) => setThreads(prev => applyEvent(prev, event)));
+  }, [expandedPosts]);
+
+  const fetchPosts = async () => {
     try {
       setLoading(true);
       setError(null);
       
-      console.log('Fetching all data...');
+      console.log('Fetching posts...');
       
-      const [postsRes, solutionsRes, commentsRes] = await Promise.all([
-        postsAPI.getAll().catch(err => {
-          console.error('Error fetching posts:', err);
-          throw new Error(`Posts: ${err.response?.data?.detail || err.message || 'Network error'}`);
-        }),
-        solutionsAPI.getAll().catch(err => {
-          console.error('Error fetching solutions:', err);
-          throw new Error(`Solutions: ${err.response?.data?.detail || err.message || 'Network error'}`);
-        }),
-        commentsAPI.getAll().catch(err => {
-          console.error('Error fetching comments:', err);
-          throw new Error(`Comments: ${err.response?.data?.detail || err.message || 'Network error'}`);
-        }),
-      ]);
-      
-      console.log('Data fetched successfully:', {
-        posts: postsRes.data?.length || 0,
-        solutions: solutionsRes.data?.length || 0,
-        comments: commentsRes.data?.length || 0,
+      // Filtering and the per-value counts are done by the backend; every page is loaded
+      const selected = Object.fromEntries(Object.entries(filters).filter(([, value]) => value));
+      const postsRes = await postsAPI.browseAll(selected).catch(err => {
+        console.error('Error fetching posts:', err);
+        throw new Error(`Posts: ${err.response?.data?.detail || err.message || 'Network error'}`);
       });
       
-      const postsData = postsRes.data || [];
-      setPosts(postsData);
-      // Initialize ratings for posts (client-side only)
-      const initialRatings = {};
-      postsData.forEach(post => {
-        initialRatings[post.id] = 0;
-      });
-      setPostRatings(prev => ({ ...prev, ...initialRatings }));
-      setSolutions(solutionsRes.data || []);
-      setComments(commentsRes.data || []);
+      console.log('Posts fetched successfully:', postsRes.data?.posts?.length || 0);
+      
+      setPosts(postsRes.data?.posts || []);
+      setFacetCounts(postsRes.data?.facets || { post_category: {}, post_difficulty: {} });
     } catch (err) {
       const errorMessage = err.message || 'Failed to fetch data. Make sure the backend is running on http://localhost:8000';
       setError(errorMessage);
@@ -105,13 +140,32 @@ function Posts() {
     }
   };
 
+  // Loads one post with its solutions and their comments when it is expanded;
+  // after that, change events keep it current.
+  const fetchThread = async (postId) => {
+    try {
+      const res = await postsAPI.getThread(postId);
+      setThreads(prev => ({ ...prev, [postId]: res.data }));
+    } catch (err) {
+      setError('Failed to fetch solutions: ' + (err.response?.data?.detail || err.message));
+    }
+  };
+
   const handleCreatePost = async (e) => {
     e.preventDefault();
     try {
-      await postsAPI.create(postFormData);
+      try {
+        await postsAPI.create(postFormData);
+      } catch (err) {
+        const duplicates = err.response?.status === 409 && err.response.data.detail.duplicates;
+        if (!duplicates) throw err;
+        const titles = duplicates.map(d => `- ${d.post_title}`).join('\n');
+        if (!window.confirm(`Similar posts already exist:\n${titles}\n\nPost anyway?`)) return;
+        await postsAPI.create(postFormData, false);
+      }
       setShowPostModal(false);
       setPostFormData({ post_title: '', post_description: '', post_category: '', post_difficulty: '', user_id: 1 });
-      fetchAllData();
+      fetchPosts();
     } catch (err) {
       setError('Failed to create post: ' + (err.response?.data?.detail || err.message));
     }
@@ -123,7 +177,6 @@ function Posts() {
       await solutionsAPI.create(solutionFormData);
       setShowSolutionModal(null);
       setSolutionFormData({ solution_text: '', post_id: null, user_id: 1, solution_rating: 0 });
-      fetchAllData();
     } catch (err) {
       setError('Failed to create solution: ' + (err.response?.data?.detail || err.message));
     }
@@ -135,7 +188,6 @@ function Posts() {
       await commentsAPI.create(commentFormData);
       setShowCommentModal(null);
       setCommentFormData({ comment_text: '', post_id: null, user_id: 1, solution_id: null, comment_rating: 0 });
-      fetchAllData();
     } catch (err) {
       setError('Failed to create comment: ' + (err.response?.data?.detail || err.message));
     }
@@ -145,7 +197,7 @@ function Posts() {
     if (window.confirm('Are you sure you want to delete this post?')) {
       try {
         await postsAPI.delete(id);
-        fetchAllData();
+        fetchPosts();
       } catch (err) {
         setError('Failed to delete post: ' + (err.response?.data?.detail || err.message));
       }
@@ -156,7 +208,6 @@ function Posts() {
     if (window.confirm('Are you sure you want to delete this solution?')) {
       try {
         await solutionsAPI.delete(id);
-        fetchAllData();
       } catch (err) {
         setError('Failed to delete solution: ' + (err.response?.data?.detail || err.message));
       }
@@ -167,7 +218,6 @@ function Posts() {
     if (window.confirm('Are you sure you want to delete this comment?')) {
       try {
         await commentsAPI.delete(id);
-        fetchAllData();
       } catch (err) {
         setError('Failed to delete comment: ' + (err.response?.data?.detail || err.message));
       }
@@ -177,11 +227,8 @@ function Posts() {
   const handleLikePost = async (id) => {
     try {
       const response = await postsAPI.like(id);
-      // Update client-side rating state
-      setPostRatings(prev => ({
-        ...prev,
-        [id]: (prev[id] || 0) + 1
-      }));
+      // The server returns the new score, so only this post needs updating
+      setPosts(prev => prev.map(p => p.id === id ? { ...p, post_rating: response.data.post_rating } : p));
       console.log('Post liked:', response.data);
     } catch (err) {
       setError('Failed to like post: ' + (err.response?.data?.detail || err.message));
@@ -191,11 +238,8 @@ function Posts() {
   const handleDislikePost = async (id) => {
     try {
       const response = await postsAPI.dislike(id);
-      // Update client-side rating state
-      setPostRatings(prev => ({
-        ...prev,
-        [id]: Math.max(0, (prev[id] || 0) - 1)
-      }));
+      // The server returns the new score, so only this post needs updating
+      setPosts(prev => prev.map(p => p.id === id ? { ...p, post_rating: response.data.post_rating } : p));
       console.log('Post disliked:', response.data);
     } catch (err) {
       setError('Failed to dislike post: ' + (err.response?.data?.detail || err.message));
@@ -205,7 +249,6 @@ function Posts() {
   const handleLikeSolution = async (id) => {
     try {
       await solutionsAPI.like(id);
-      fetchAllData();
     } catch (err) {
       setError('Failed to like solution: ' + (err.response?.data?.detail || err.message));
     }
@@ -214,7 +257,6 @@ function Posts() {
   const handleDislikeSolution = async (id) => {
     try {
       await solutionsAPI.dislike(id);
-      fetchAllData();
     } catch (err) {
       setError('Failed to dislike solution: ' + (err.response?.data?.detail || err.message));
     }
@@ -223,7 +265,6 @@ function Posts() {
   const handleLikeComment = async (id) => {
     try {
       await commentsAPI.like(id);
-      fetchAllData();
     } catch (err) {
       setError('Failed to like comment: ' + (err.response?.data?.detail || err.message));
     }
@@ -232,7 +273,6 @@ function Posts() {
   const handleDislikeComment = async (id) => {
     try {
       await commentsAPI.dislike(id);
-      fetchAllData();
     } catch (err) {
       setError('Failed to dislike comment: ' + (err.response?.data?.detail || err.message));
     }
@@ -244,6 +284,7 @@ function Posts() {
       newExpanded.delete(postId);
     } else {
       newExpanded.add(postId);
+      fetchThread(postId);
     }
     setExpandedPosts(newExpanded);
   };
@@ -259,11 +300,11 @@ function Posts() {
   };
 
   const getSolutionsForPost = (postId) => {
-    return solutions.filter(s => s.post_id === postId);
+    return threads[postId]?.solutions || [];
   };
 
-  const getCommentsForSolution = (solutionId) => {
-    return comments.filter(c => c.solution_id === solutionId);
+  const getCommentsForSolution = (solution) => {
+    return solution.comments || [];
   };
 
   if (loading) {
@@ -298,10 +339,24 @@ function Posts() {
         </div>
       )}
 
-      <div style={{ marginBottom: '20px' }}>
+      <div style={{ marginBottom: '20px', display: 'flex', gap: '10px', flexWrap: 'wrap' }}>
         <button className="button" onClick={() => setShowPostModal(true)}>
           + Post a New Problem
         </button>
+        {[['post_category', 'All Categories'], ['post_difficulty', 'All Difficulties']].map(([facet, label]) => (
+          <select
+            key={facet}
+            className="select"
+            style={{ width: 'auto' }}
+            value={filters[facet]}
+            onChange={(e) => setFilters({ ...filters, [facet]: e.target.value })}
+          >
+            <option value="">{label}</option>
+            {Object.entries(facetCounts[facet] || {}).map(([value, count]) => (
+              <option key={value} value={value}>{value} ({count})</option>
+            ))}
+          </select>
+        ))}
       </div>
 
       <div style={{ display: 'flex', flexDirection: 'column', gap: '20px' }}>
@@ -324,7 +379,7 @@ function Posts() {
                     <span className={`badge badge-${post.post_difficulty === 'Easy' ? 'success' : post.post_difficulty === 'Medium' ? 'warning' : 'danger'}`}>
                       {post.post_difficulty}
                     </span>
-                    <span className="rating-value">⭐ {postRatings[post.id] || 0}</span>
+                    <span className="rating-value">⭐ {post.post_rating || 0}</span>
                   </div>
                   <div className="rating" style={{ marginBottom: '15px' }}>
                     <button className="rating-button" onClick={() => handleLikePost(post.id)}>
@@ -367,7 +422,7 @@ function Posts() {
                   ) : (
                     <div style={{ display: 'flex', flexDirection: 'column', gap: '15px' }}>
                       {postSolutions.map((solution) => {
-                        const solutionComments = getCommentsForSolution(solution.id);
+                        const solutionComments = getCommentsForSolution(solution);
                         const isSolutionExpanded = expandedSolutions.has(solution.id);
                         
                         return (
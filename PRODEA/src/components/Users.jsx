@@ -12,7 +12,6 @@ function Users() {
     username: '',
     email: '',
     password: '',
-    user_rating: 0,
   });
 
   useEffect(() => {
@@ -42,7 +41,7 @@ function Users() {
       }
       setShowModal(false);
       setEditingUser(null);
-      setFormData({ username: '', email: '', password: '', user_rating: 0 });
+      setFormData({ username: '', email: '', password: '' });
       fetchUsers();
     } catch (err) {
       setError('Failed to save user: ' + (err.response?.data?.detail || err.message));
@@ -55,7 +54,6 @@ function Users() {
       username: user.username,
       email: user.email,
       password: '',
-      user_rating: user.user_rating || 0,
     });
     setShowModal(true);
   };
@@ -84,7 +82,7 @@ function Users() {
       <div style={{ marginBottom: '20px' }}>
         <button className="button" onClick={() => {
           setEditingUser(null);
-          setFormData({ username: '', email: '', password: '', user_rating: 0 });
+          setFormData({ username: '', email: '', password: '' });
           setShowModal(true);
         }}>
           + Create New User
@@ -152,16 +150,6 @@ function Users() {
                   required={!editingUser}
                 />
               </div>
-              <div className="form-group">
-                <label className="label">User Rating</label>
-                <input
-                  className="input"
-                  type="number"
-                  value={formData.user_rating}
-                  onChange={(e) => setFormData({ ...formData, user_rating: parseInt(e.target.value) || 0 })}
-                  min="0"
-                />
-              </div>
               <div className="actions">
                 <button type="submit" className="button">
                   {editingUser ? 'Update' : 'Create'}
@@ -15,8 +15,13 @@ const api = axios.create({
 });
 
 // Add request interceptor for debugging
+// and to send the login token (likes and dislikes are recorded per user)
 api.interceptors.request.use(
   (config) => {
+    const token = localStorage.getItem('access_token');
+    if (token) {
+      config.headers.Authorization = `Bearer ${token}`;
+    }
     console.log(`Making ${config.method.toUpperCase()} request to: ${config.baseURL}${config.url}`);
     return config;
   },
@@ -44,9 +49,41 @@ api.interceptors.response.use(
   }
 );
 
+// List endpoints return one page and the cursor of the next in X-Next-Cursor;
+// follow it until the last page so callers still get every row in response.data
+const PAGE_SIZE = 1000;
+
+const getAllPages = async (url) => {
+  const rows = [];
+  let after = null;
+  let response;
+  do {
+    response = await api.get(url, { params: { limit: PAGE_SIZE, ...(after ? { after } : {}) } });
+    rows.push(...response.data);
+    after = response.headers['x-next-cursor'];
+  } while (after);
+  return { ...response, data: rows };
+};
+
+// Same for /posts/browse, whose pages are { total, facets, posts }: the posts of every
+// page are joined, total and facets (the same on every page) come from the first
+const browseAllPages = async (filters) => {
+  const posts = [];
+  let after = null;
+  let first = null;
+  let response;
+  do {
+    response = await api.get('/posts/browse', { params: { ...filters, limit: PAGE_SIZE, ...(after ? { after } : {}) } });
+    first = first || response.data;
+    posts.push(...response.data.posts);
+    after = response.headers['x-next-cursor'];
+  } while (after);
+  return { ...response, data: { ...first, posts } };
+};
+
 // Users API
 export const usersAPI = {
-  getAll: () => api.get('/users/get_users'),
+  getAll: () => getAllPages('/users/get_users'),
   getById: (id) => api.get(`/users/get_user_by_id?id=${id}`),
   create: (user) => api.post('/users/create_user', user),
   createMultiple: (users) => api.post('/users/create_multiple_users', users),
@@ -56,9 +93,17 @@ export const usersAPI = {
 
 // Posts API
 export const postsAPI = {
-  getAll: () => api.get('/posts/get_posts'),
+  getAll: () => getAllPages('/posts/get_posts'),
   getById: (id) => api.get(`/posts/get_post_by_id?id=${id}`),
-  create: (post) => api.post('/posts/create_multiple_posts', [post]),
+  getThread: (id) => api.get(`/posts/${id}/thread`),
+  search: (q, filters = {}) => api.get('/posts/search', { params: { q, ...filters } }),
+  // { total, facets: { post_category: {value: count}, post_difficulty: {...} }, posts }
+  browse: (filters = {}) => api.get('/posts/browse', { params: filters }),
+  browseAll: (filters = {}) => browseAllPages(filters),
+  // 409 with detail.duplicates when a near-identical post exists; checkDuplicates=false posts anyway
+  create: (post, checkDuplicates = true) =>
+    api.post('/posts/create_multiple_posts', [post], { params: { check_duplicates: checkDuplicates } }),
+  similar: (id, limit = 10) => api.get(`/posts/${id}/similar`, { params: { limit } }),
   createMultiple: (posts) => api.post('/posts/create_multiple_posts', posts),
   update: (id, post) => api.put(`/posts/update_post_by_id?id=${id}`, post),
   delete: (id) => api.delete(`/posts/delete_post_by_id?id=${id}`),
@@ -68,7 +113,7 @@ export const postsAPI = {
 
 // Comments API
 export const commentsAPI = {
-  getAll: () => api.get('/comments/get_comments'),
+  getAll: () => getAllPages('/comments/get_comments'),
   getById: (id) => api.get(`/comments/get_comment_by_id?id=${id}`),
   create: (comment) => api.post('/comments/create_multiple_comments', [comment]),
   createMultiple: (comments) => api.post('/comments/create_multiple_comments', comments),
@@ -80,7 +125,7 @@ export const commentsAPI = {
 
 // Solutions API
 export const solutionsAPI = {
-  getAll: () => api.get('/solutions/get_solutions'),
+  getAll: () => getAllPages('/solutions/get_solutions'),
   getById: (id) => api.get(`/solutions/get_solution_by_id?id=${id}`),
   create: (solution) => api.post('/solutions/create_multiple_solutions', [solution]),
   createMultiple: (solutions) => api.post('/solutions/create_multiple_solutions', solutions),
@@ -107,5 +152,59 @@ export const authAPI = {
   register: (userData) => api.post('/auth/register', userData),
 };
 
+// Change events (new solutions/comments, deletions, rating deltas) for a set of posts or
+// solutions. Uses a WebSocket and falls back to server-sent events when it cannot connect.
+// Returns a function that closes the subscription.
+export const eventsAPI = {
+  subscribe: ({ postIds = [], solutionIds = [] }, onEvent) => {
+    const query = new URLSearchParams();
+    postIds.forEach((id) => query.append('post_id', id));
+    solutionIds.forEach((id) => query.append('solution_id', id));
+    const base = new URL(API_BASE_URL, window.location.href);
+    let closed = false;
+    let source = null;
+
+    const handle = (data) => {
+      try {
+        onEvent(JSON.parse(data));
+      } catch (err) {
+        console.error('Bad event:', err);
+      }
+    };
+
+    const useEventSource = () => {
+      if (closed) return;
+      source = new EventSource(`${base.href.replace(/\/$/, '')}/events/stream?${query}`);
+      source.onmessage = (e) => handle(e.data);
+    };
+
+    let opened = false;
+    const wsUrl = `${base.href.replace(/^http/, 'ws').replace(/\/$/, '')}/events/ws?${query}`;
+    let socket = new WebSocket(wsUrl);
+    socket.onopen = () => { opened = true; };
+    socket.onmessage = (e) => handle(e.data);
+    socket.onclose = () => {
+      if (!opened) useEventSource();
+    };
+
+    return () => {
+      closed = true;
+      if (socket) socket.close();
+      if (source) source.close();
+    };
+  },
+};
+
+// Batch API: several operations in one request and one transaction, e.g.
+//   batchAPI.run([
+//     { resource: 'solutions', action: 'create', ref: 's', body: { solution_text, post_id, user_id } },
+//     { resource: 'comments', action: 'create', body: { comment_text, post_id, solution_id: '$s.id', user_id } },
+//   ])
+// resolves to { committed, results: [{ status, ref, body }] }. A posts create answers 409 for a
+// near-duplicate post unless the operation has check_duplicates: false.
+export const batchAPI = {
+  run: (operations, atomic = true) => api.post('/batch', { operations, atomic }),
+};
+
 export default api;
 
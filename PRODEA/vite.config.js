@@ -10,6 +10,7 @@ export default defineConfig({
         target: 'http://localhost:8000',
         changeOrigin: true,
         secure: false,
+        ws: true, // /api/events/ws
         rewrite: (path) => path, // Don't rewrite the path
       }
     }
@@ -0,0 +1,29 @@
+from pydantic import BaseModel
+from typing import Optional, List, Literal, Union, Any
+
+#One operation of POST /api/batch. `id` and values in `body` may be references like
+#"$s1.id" to a field of an earlier operation's result (by its `ref` or its position,
+#e.g. "$0.id"). like/dislike vote as the user of the request's bearer token.
+#check_duplicates applies to posts create only, like ?check_duplicates on
+#create_multiple_posts: a near-duplicate post fails with 409 unless it is false.
+class BatchOperationSchema(BaseModel):
+    resource : Literal["users", "posts", "solutions", "comments"]
+    action : Literal["create", "get", "update", "delete", "like", "dislike"]
+    id : Optional[Union[int, str]] = None
+    body : Optional[dict] = None
+    fields : Optional[str] = None
+    ref : Optional[str] = None
+    check_duplicates : bool = True
+
+class BatchSchema(BaseModel):
+    operations : List[BatchOperationSchema]
+    atomic : bool = True  # false: a failed operation is rolled back alone and the rest still commit
+
+class BatchResultSchema(BaseModel):
+    status : int
+    ref : Optional[str] = None
+    body : Any = None
+
+class BatchResponseSchema(BaseModel):
+    committed : bool
+    results : List[BatchResultSchema]
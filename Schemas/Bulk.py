@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from typing import List
+
+
+#Answer of the set-based bulk update/delete endpoints
+class BulkResultSchema(BaseModel):
+    count : int
+    ids : List[int]
+    missing : List[int] = []  # requested ids that matched no row
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List
 from datetime import datetime
 
 class CommentsSchema(BaseModel):
@@ -9,4 +9,30 @@ class CommentsSchema(BaseModel):
     solution_id : int
     comment_rating : Optional[int] = 0
     created_at : Optional[datetime] = None
-    updated_at : Optional[datetime] = None
\ No newline at end of file
+    updated_at : Optional[datetime] = None
+
+class CommentsResponseSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id : int
+    comment_text : str
+    post_id : int
+    user_id : int
+    solution_id : int
+    comment_rating : Optional[int] = 0
+    created_at : Optional[datetime] = None
+    updated_at : Optional[datetime] = None
+
+#Set-based bulk operations: rows matching every given filter
+class CommentsFilterSchema(BaseModel):
+    ids : Optional[List[int]] = None
+    solution_id : Optional[int] = None
+    post_id : Optional[int] = None
+    user_id : Optional[int] = None
+
+class CommentsPatchSchema(BaseModel):
+    comment_text : Optional[str] = None
+
+class CommentsBulkUpdateSchema(BaseModel):
+    where : CommentsFilterSchema
+    values : CommentsPatchSchema
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, ConfigDict
-from typing import Optional
+from typing import Optional, List, Dict
 from datetime import datetime
+from Schemas.Solutions import SolutionThreadSchema
 
 class PostsSchema(BaseModel):
     post_title : str
@@ -20,5 +21,47 @@ class PostsResponseSchema(BaseModel):
     post_category : str
     post_difficulty : str
     user_id : int
+    post_rating : Optional[int] = 0
     post_created_at : Optional[datetime] = None
-    post_updated_at : Optional[datetime] = None
\ No newline at end of file
+    post_updated_at : Optional[datetime] = None
+
+class PostThreadSchema(PostsResponseSchema):
+    solutions : List[SolutionThreadSchema] = []
+
+class PostSearchResultSchema(PostsResponseSchema):
+    rank : float
+
+class PostSimilarSchema(PostsResponseSchema):
+    similarity : float
+
+class PostFeedSchema(PostsResponseSchema):
+    score : float
+    solution_count : int = 0
+    comment_count : int = 0
+
+#Faceted browsing: a page of posts with the number of posts per category and difficulty
+class PostFacetsSchema(BaseModel):
+    post_category : Dict[str, int]
+    post_difficulty : Dict[str, int]
+
+class PostBrowseSchema(BaseModel):
+    total : int
+    facets : PostFacetsSchema
+    posts : List[PostsResponseSchema]
+
+#Set-based bulk operations: rows matching every given filter
+class PostsFilterSchema(BaseModel):
+    ids : Optional[List[int]] = None
+    user_id : Optional[int] = None
+    post_category : Optional[str] = None
+    post_difficulty : Optional[str] = None
+
+class PostsPatchSchema(BaseModel):
+    post_title : Optional[str] = None
+    post_description : Optional[str] = None
+    post_category : Optional[str] = None
+    post_difficulty : Optional[str] = None
+
+class PostsBulkUpdateSchema(BaseModel):
+    where : PostsFilterSchema
+    values : PostsPatchSchema
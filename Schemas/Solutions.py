@@ -1,9 +1,36 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List
+from datetime import datetime
+from Schemas.Comments import CommentsResponseSchema
 
 class SolutionsSchema(BaseModel):
     solution_text : str
     post_id : int
     user_id : int
     solution_rating : Optional[int] = None
-    
\ No newline at end of file
+
+class SolutionsResponseSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id : int
+    solution_text : str
+    post_id : int
+    user_id : int
+    solution_rating : Optional[int] = 0
+    created_at : Optional[datetime] = None
+
+class SolutionThreadSchema(SolutionsResponseSchema):
+    comments : List[CommentsResponseSchema] = []
+
+#Set-based bulk operations: rows matching every given filter
+class SolutionsFilterSchema(BaseModel):
+    ids : Optional[List[int]] = None
+    post_id : Optional[int] = None
+    user_id : Optional[int] = None
+
+class SolutionsPatchSchema(BaseModel):
+    solution_text : Optional[str] = None
+
+class SolutionsBulkUpdateSchema(BaseModel):
+    where : SolutionsFilterSchema
+    values : SolutionsPatchSchema
@@ -1,11 +1,14 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, ConfigDict
+from typing import Optional, List
+from datetime import datetime
 
 
 class UsersSchema(BaseModel):
     username : str
     email : str
     password : str
-    user_rating : int
+    #no user_rating: reputation is earned through votes, so every user starts at 0
+    #(a user_rating sent by an older client is ignored)
 
 
 class UserSignupSchema(BaseModel):
@@ -18,3 +21,35 @@ class UserLoginSchema(BaseModel):
     email : EmailStr
     password : str
 
+
+class UsersResponseSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id : int
+    username : str
+    email : str
+    user_rating : Optional[int] = 0
+    created_at : Optional[datetime] = None
+
+
+class CurrentUserSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id : int
+    username : str
+    email : str
+    user_rating : int
+
+
+class LeaderboardEntrySchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    rank : int
+    id : int
+    username : str
+    user_rating : int
+
+
+class LeaderboardSchema(BaseModel):
+    top : List[LeaderboardEntrySchema]
+    user : Optional[LeaderboardEntrySchema] = None
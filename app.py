@@ -1,38 +1,153 @@
-from fastapi import FastAPI , Depends, HTTPException, status
-from fastapi.middleware.cors import CORSMiddleware            
-from Database.db import Base, engine, get_db
-from Models.Users import UsersModel
-from Schemas.Users import UsersSchema, UserSignupSchema, UserLoginSchema
-from sqlalchemy.orm import Session
-from typing import List
-import bcrypt
-from Models.Solutions import SolutionsModel
-from Schemas.Solutions import SolutionsSchema
-from Models.Posts import PostsModel
-from Schemas.Posts import PostsSchema
-from Models.Comments import CommentsModel
-from Schemas.Comments import CommentsSchema
-from routers import auth, Users, Solutions, Posts, Comments
-
-
-app = FastAPI() 
-
-# Add CORS middleware to allow frontend requests
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000", "http://localhost:5173"],  # React dev server ports
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-Base.metadata.create_all(bind=engine)
-
-
-
-
-app.include_router(Users.router, prefix="/api/users", tags=["users"])
-app.include_router(Solutions.router, prefix="/api/solutions", tags=["solutions"])
-app.include_router(Posts.router, prefix="/api/posts", tags=["posts"])
-app.include_router(Comments.router, prefix="/api/comments", tags=["comments"])
-app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
\ No newline at end of file
+import threading
+from fastapi import FastAPI, status
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from contextlib import asynccontextmanager
+from serialization import FastJSONResponse
+
+#App factory
+#Importing this module builds nothing and connects to nothing: create_app() wires the
+#middleware and routers, and the lifespan hook starts the connection pool warm-up in
+#the background, so a worker boots even while the database is briefly unavailable.
+#The schema is created and migrated by `python -m Database.migrate upgrade` (see
+#start_backend.sh). Run with `uvicorn app:create_app --factory`; `app:app` still works
+#and builds the app on first access.
+
+
+def _preload_similar():
+    from Database import db, similar
+    similar.preload(db.SessionLocal)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from Database import db
+    from Database.health import readiness
+    from Database.ratings import vote_buffer
+    from Database.routing import replica_set
+    import events
+    import utils
+
+    readiness.start(db.engine)
+    # numpy/scipy and the similar-posts index load off the startup path
+    similar_preload = threading.Thread(target=_preload_similar, name="similar-index", daemon=True)
+    similar_preload.start()
+    yield
+    readiness.stop()
+    if not similar_preload.is_alive():
+        from Database import similar
+        similar.close()  # saves the index if this worker indexed new posts
+    # Write any buffered likes/dislikes before the worker exits
+    vote_buffer.close()
+    events.close()
+    utils.hashing_pool.shutdown()
+    if db.async_engine is not None:
+        await db.async_engine.dispose()
+    replica_set.close()
+    await replica_set.close_async()
+
+
+def create_app() -> FastAPI:
+    from Database import db
+    from Database.health import readiness
+    from Database.pool import pool_stats
+    from Database.routing import replica_set, ReadYourWritesMiddleware
+    from routers import auth, Users, Solutions, Posts, Comments
+    from routers import events as events_router
+    from routers import batch
+    from middleware.compression import CompressionMiddleware
+    from middleware import metrics, admission
+    import utils
+
+    app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
+
+    # Innermost, so refusals still get CORS headers: per-client rate limits per router and
+    # load shedding once too many /api requests are in flight
+    app.add_middleware(admission.AdmissionMiddleware, limits={
+        "/api/posts": [admission.VOTES, admission.WRITES],
+        "/api/solutions": [admission.VOTES, admission.WRITES],
+        "/api/comments": [admission.VOTES, admission.WRITES],
+        "/api/users": [admission.WRITES],
+        "/api/batch": [admission.WRITES],
+    })
+
+    # Add CORS middleware to allow frontend requests
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:3000", "http://localhost:5173"],  # React dev server ports
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor"],  # keyset pagination cursor for list endpoints
+    )
+
+    # brotli/gzip for large JSON bodies and NDJSON exports
+    app.add_middleware(CompressionMiddleware)
+
+    # Clients that just wrote read from the primary for a few seconds (no-op without replicas)
+    app.add_middleware(ReadYourWritesMiddleware)
+
+    # Outermost, so latency and response sizes cover every other middleware
+    if metrics.METRICS_ENABLED:
+        app.add_middleware(metrics.MetricsMiddleware)
+
+
+    # Shed password hashing load instead of letting it tie up every worker
+    @app.exception_handler(utils.HashingPoolBusy)
+    def hashing_pool_busy(request, exc):
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"detail": str(exc)},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+
+    # Liveness: the process is up and serving; never touches the database
+    @app.get("/healthz", include_in_schema=False)
+    def healthz():
+        return {"status": "ok"}
+
+    # Readiness: the connection pool is warm and the database answers
+    @app.get("/readyz", include_in_schema=False)
+    def readyz():
+        report = readiness.check(db.engine)
+        return JSONResponse(status_code=status.HTTP_200_OK if report["ready"] else status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content=report)
+
+    # Connection pool checkout wait and saturation, for sizing workers and pools
+    @app.get("/api/db/pool")
+    def db_pool():
+        return {
+            "sync": pool_stats(db.engine),
+            "async": pool_stats(db.async_engine) if db.async_engine is not None else None,
+            "replicas": [
+                {**replica, "sync": pool_stats(r.engine)} for replica, r in zip(replica_set.stats(), replica_set.replicas)
+            ],
+        }
+
+    # Prometheus text exposition of the request and SQL metrics
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+
+    app.include_router(Users.router, prefix="/api/users", tags=["users"])
+    app.include_router(Solutions.router, prefix="/api/solutions", tags=["solutions"])
+    app.include_router(Posts.router, prefix="/api/posts", tags=["posts"])
+    app.include_router(Comments.router, prefix="/api/comments", tags=["comments"])
+    app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
+    app.include_router(events_router.router, prefix="/api/events", tags=["events"])
+    app.include_router(batch.router, prefix="/api/batch", tags=["batch"])
+    return app
+
+
+_app = None
+
+def __getattr__(name):
+    #`uvicorn app:app` and `from app import app` build the app on first access
+    global _app
+    if name == "app":
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
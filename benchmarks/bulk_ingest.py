@@ -0,0 +1,52 @@
+import argparse
+import json
+import time
+from benchmarks.common import make_client, post_rows
+
+#Throughput of create_multiple_posts (one ORM object per row, full objects returned)
+#against bulk_create_posts (Core INSERT batches, per-chunk commits and summaries).
+#
+#    python -m benchmarks.bulk_ingest --rows 20000 --chunk-size 1000
+
+
+def timed(fn):
+    start = time.perf_counter()
+    response = fn()
+    elapsed = time.perf_counter() - start
+    response.raise_for_status()
+    return elapsed, len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    client = make_client()
+    rows = post_rows(args.rows)
+    ndjson = "\n".join(json.dumps(r) for r in rows)
+
+    runs = {
+        "create_multiple_posts": lambda: client.post("/api/posts/create_multiple_posts", json=rows),
+        "bulk_create_posts (json)": lambda: client.post(
+            f"/api/posts/bulk_create_posts?chunk_size={args.chunk_size}", json=rows),
+        "bulk_create_posts (ndjson)": lambda: client.post(
+            f"/api/posts/bulk_create_posts?chunk_size={args.chunk_size}", content=ndjson,
+            headers={"content-type": "application/x-ndjson"}),
+    }
+
+    results = {}
+    for name, run in runs.items():
+        elapsed, response_bytes = timed(run)
+        results[name] = {
+            "rows": args.rows,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(args.rows / elapsed),
+            "response_bytes": response_bytes,
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+#Shared setup for the benchmark scripts: an in-process app over a throwaway SQLite file.
+#Set DATABASE_URL to benchmark against a local Postgres instead.
+
+
+def make_app(database_url : str = None):
+    """Point the app at a fresh (migrated) database and return the ASGI app.
+
+    Must run before anything imports `Database.db`, since the engine is built on import.
+    """
+    if database_url is None:
+        database_url = os.getenv("DATABASE_URL") or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("RATE_LIMIT_ENABLED", "false")  # every simulated user shares one client address
+
+    from Database.migrate import upgrade
+    from app import create_app
+
+    upgrade(database_url=database_url)
+    return create_app()
+
+
+def make_client(database_url : str = None):
+    """make_app wrapped in a TestClient."""
+    from fastapi.testclient import TestClient
+    return TestClient(make_app(database_url))
+
+
+def post_rows(n : int, user_id : int = 1):
+    return [
+        {
+            "post_title": f"Benchmark post {i}",
+            "post_description": f"Description for benchmark post {i} " * 4,
+            "post_category": ("Tech", "Business", "Science")[i % 3],
+            "post_difficulty": ("Easy", "Medium", "Hard")[i % 3],
+            "user_id": user_id,
+        }
+        for i in range(n)
+    ]
@@ -0,0 +1,106 @@
+import os
+import json
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+#Insert and read cost of the schema before (0002) and after (0003) the index plan
+#migration. Each revision gets its own fresh SQLite file unless --database-url
+#points both runs at a scratch Postgres database (it is emptied between runs).
+#
+#    python -m benchmarks.indexes --posts 2000 --solutions-per-post 5 --comments-per-solution 4
+
+
+def fresh_database(url, revision):
+    from alembic import command
+    from Database.migrate import alembic_config, upgrade
+    if url is None:
+        url = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "indexes.db")
+    else:
+        command.downgrade(alembic_config(url), "base")
+    upgrade(revision, database_url=url)
+    return url
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(url, args):
+    from sqlalchemy import create_engine, insert, select
+    from Models.Users import UsersModel
+    from Models.Posts import PostsModel
+    from Models.Solutions import SolutionsModel
+    from Models.Comments import CommentsModel
+
+    engine = create_engine(url)
+    text = "lorem ipsum dolor sit amet " * 20
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    results = {}
+
+    with engine.begin() as connection:
+        connection.execute(insert(UsersModel), [
+            {"username": f"user{i}", "email": f"user{i}@example.com", "password": "$2b$12$" + "x" * 53,
+             "user_rating": 0, "created_at": base} for i in range(args.users)])
+
+    posts = [{"post_title": f"Post {i}", "post_description": text, "post_category": "Tech",
+              "post_difficulty": "Easy", "user_id": i % args.users + 1,
+              "post_created_at": base + timedelta(seconds=i), "post_updated_at": base} for i in range(args.posts)]
+    solutions = [{"solution_text": text, "solution_rating": 0, "post_id": i % args.posts + 1,
+                  "user_id": i % args.users + 1, "created_at": base + timedelta(seconds=i)}
+                 for i in range(args.posts * args.solutions_per_post)]
+    comments = [{"comment_text": text, "comment_rating": 0, "post_id": (i // args.comments_per_solution) % args.posts + 1,
+                 "solution_id": i % len(solutions) + 1, "user_id": i % args.users + 1,
+                 "created_at": base + timedelta(seconds=i), "updated_at": base}
+                for i in range(len(solutions) * args.comments_per_solution)]
+
+    for name, model, rows in (("posts", PostsModel, posts), ("solutions", SolutionsModel, solutions),
+                              ("comments", CommentsModel, comments)):
+        def load():
+            with engine.begin() as connection:
+                for start in range(0, len(rows), 1000):
+                    connection.execute(insert(model), rows[start:start + 1000])
+        elapsed = timed(load)
+        results[f"insert {name}"] = {"rows": len(rows), "rows_per_second": round(len(rows) / elapsed)}
+
+    rng = random.Random(0)
+    queries = {
+        #what the thread endpoint's selectinload issues per level
+        "solutions of a post": lambda c: c.execute(select(SolutionsModel).where(
+            SolutionsModel.post_id == rng.randint(1, args.posts)).order_by(SolutionsModel.created_at)).all(),
+        "comments of a solution": lambda c: c.execute(select(CommentsModel).where(
+            CommentsModel.solution_id == rng.randint(1, len(solutions))).order_by(CommentsModel.created_at)).all(),
+        "posts by user": lambda c: c.execute(select(PostsModel.id).where(
+            PostsModel.user_id == rng.randint(1, args.users))).all(),
+    }
+    with engine.connect() as connection:
+        for name, query in queries.items():
+            elapsed = timed(lambda: [query(connection) for _ in range(args.queries)])
+            results[f"query {name}"] = {"queries": args.queries, "avg_ms": round(elapsed / args.queries * 1000, 3)}
+    engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--solutions-per-post", type=int, default=5)
+    parser.add_argument("--comments-per-solution", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+    report = {}
+    for label, revision in (("before (0002)", "0002_ratings_votes_search"), ("after (0003)", "head")):
+        report[label] = run(fresh_database(args.database_url, revision), args)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import os
+import re
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from contextlib import AsyncExitStack
+from benchmarks.workloads import WORKLOADS, Context
+
+#Load test: seed a dataset, drive one of the request mixes in benchmarks/workloads.py
+#with N concurrent clients, and report p50/p95/p99 latency, throughput and SQL
+#statements per request (from /metrics) as JSON. By default everything runs
+#in-process over a fresh SQLite file; DATABASE_URL selects a scratch (empty)
+#Postgres database instead, and --base-url drives an already running server.
+#
+#    python -m benchmarks.run --workload browse --requests 5000 --concurrency 16 --out browse.json
+#    python -m benchmarks.run --workload like_storm --posts 200 --users 2000
+
+
+def percentile(sorted_values, p : float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors : int, seconds : float = None) -> dict:
+    values = sorted(latencies)
+    summary = {
+        "requests": len(values),
+        "errors": errors,
+        "mean_ms": round(sum(values) / len(values) * 1000, 3) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "max_ms": round(values[-1] * 1000, 3) if values else 0.0,
+    }
+    if seconds:
+        summary["throughput_rps"] = round(len(values) / seconds, 1)
+    return summary
+
+
+_METRIC_LINE = re.compile(r'^prodea_db_queries_per_request_(sum|count)\{method="(\w+)",route="([^"]*)"\} (\S+)$')
+
+async def query_totals(client) -> dict:
+    """(method route) -> [statements, requests] as reported by /metrics."""
+    response = await client.get("/metrics")
+    totals = {}
+    if response.status_code != 200:
+        return totals
+    for line in response.text.splitlines():
+        match = _METRIC_LINE.match(line)
+        if match:
+            kind, method, route, value = match.groups()
+            totals.setdefault(f"{method} {route}", [0.0, 0.0])[0 if kind == "sum" else 1] = float(value)
+    return totals
+
+
+def queries_per_request(before : dict, after : dict) -> dict:
+    result = {}
+    for route, (statements, requests) in sorted(after.items()):
+        prev_statements, prev_requests = before.get(route, (0.0, 0.0))
+        if requests > prev_requests:
+            result[route] = round((statements - prev_statements) / (requests - prev_requests), 2)
+    return result
+
+
+async def drive(client, ops, ctx, total : int, concurrency : int):
+    samples = {op.name: ([], [0]) for op in ops}
+    weights = [op.weight for op in ops]
+    issued = 0
+
+    async def worker():
+        nonlocal issued
+        while issued < total:
+            issued += 1
+            op = ctx.rng.choices(ops, weights)[0]
+            method, url, kwargs = op.build(ctx)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                ok = response.status_code in op.ok
+            except Exception:
+                response, ok = None, False
+            latencies, errors = samples[op.name]
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors[0] += 1
+            elif op.after is not None:
+                op.after(ctx, response)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return samples, time.perf_counter() - start
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+async def run(args):
+    import httpx
+    counts = {"users": args.users, "posts": args.posts, "solutions": args.posts * args.solutions_per_post}
+    stack = AsyncExitStack()
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        from benchmarks.common import make_app
+        from benchmarks.seed import seed
+        app = make_app()
+        if not args.no_seed:
+            counts = seed(users=args.users, posts=args.posts, solutions_per_post=args.solutions_per_post,
+                          comments_per_solution=args.comments_per_solution, seed=args.seed)
+        #ASGITransport skips lifespan events; run them so engines and pools shut down cleanly
+        await stack.enter_async_context(app.router.lifespan_context(app))
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    ops = WORKLOADS[args.workload]
+    ctx = Context(random.Random(args.seed), counts)
+    async with stack, client:
+        if args.warmup:
+            await drive(client, ops, ctx, args.warmup, args.concurrency)
+        before = await query_totals(client)
+        samples, seconds = await drive(client, ops, ctx, args.requests, args.concurrency)
+        after = await query_totals(client)
+
+    all_latencies = [t for latencies, _ in samples.values() for t in latencies]
+    all_errors = sum(errors[0] for _, errors in samples.values())
+    return {
+        "revision": git_revision(),
+        "workload": args.workload,
+        "target": args.base_url or os.environ.get("DATABASE_URL"),
+        "config": {"requests": args.requests, "concurrency": args.concurrency, "warmup": args.warmup, **counts},
+        "overall": summarize(all_latencies, all_errors, seconds),
+        "operations": {name: summarize(latencies, errors[0]) for name, (latencies, errors) in samples.items() if latencies},
+        "queries_per_request": queries_per_request(before, after),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive a request mix against the API and report latency percentiles")
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="mixed")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=100)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--posts", type=int, default=2000)
+    parser.add_argument("--solutions-per-post", type=int, default=3)
+    parser.add_argument("--comments-per-solution", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-seed", action="store_true", help="use the data already in DATABASE_URL")
+    parser.add_argument("--base-url", help="benchmark a running server instead of an in-process app")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+    if not args.base_url:
+        #keep the login workload about the app, not about bcrypt's cost factor
+        os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+    report = asyncio.run(run(args))
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
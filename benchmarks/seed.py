@@ -0,0 +1,105 @@
+import os
+import json
+import random
+import argparse
+from datetime import datetime, timedelta, timezone
+
+#Synthetic dataset through the existing models: users, posts, solutions per post and
+#comments per solution, with deterministic content for a given --seed. Rows go in as
+#Core INSERT batches on the models' tables, so seeding 100k rows takes seconds and the
+#search triggers/indexes see the same writes the API would make.
+#
+#    DATABASE_URL=postgresql://... python -m benchmarks.seed --users 500 --posts 20000
+
+SEED_PASSWORD = "benchmark-password"
+
+CATEGORIES = ("Tech", "Business", "Science", "Health", "Education")
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+WORDS = ("python", "database", "cache", "latency", "index", "startup", "market", "energy", "sensor",
+         "health", "learning", "network", "pricing", "climate", "robot", "search", "mobile", "payments")
+BASE_TIME = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def email(i : int) -> str:
+    return f"user{i}@example.com"
+
+
+def _sentence(rng, words : int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def user_rows(n : int, password_hash : str):
+    return [{"username": f"user{i}", "email": email(i), "password": password_hash, "user_rating": 0,
+             "created_at": BASE_TIME + timedelta(seconds=i)} for i in range(n)]
+
+
+def post_rows(rng, n : int, users : int):
+    return [{"post_title": _sentence(rng, 5).capitalize(), "post_description": _sentence(rng, 40),
+             "post_category": rng.choice(CATEGORIES), "post_difficulty": rng.choice(DIFFICULTIES),
+             "post_rating": 0, "user_id": rng.randint(1, users),
+             "post_created_at": BASE_TIME + timedelta(seconds=i), "post_updated_at": BASE_TIME + timedelta(seconds=i)}
+            for i in range(n)]
+
+
+def solution_rows(rng, posts : int, per_post : int, users : int):
+    return [{"solution_text": _sentence(rng, 30), "solution_rating": 0, "post_id": post_id,
+             "user_id": rng.randint(1, users), "created_at": BASE_TIME + timedelta(seconds=post_id, milliseconds=k)}
+            for post_id in range(1, posts + 1) for k in range(per_post)]
+
+
+def comment_rows(rng, solutions : int, per_post : int, per_solution : int, users : int):
+    return [{"comment_text": _sentence(rng, 15), "comment_rating": 0, "solution_id": solution_id,
+             "post_id": (solution_id - 1) // per_post + 1, "user_id": rng.randint(1, users),
+             "created_at": BASE_TIME + timedelta(seconds=solution_id, milliseconds=k),
+             "updated_at": BASE_TIME + timedelta(seconds=solution_id, milliseconds=k)}
+            for solution_id in range(1, solutions + 1) for k in range(per_solution)]
+
+
+def insert_rows(engine, model, rows, chunk_size : int = 1000):
+    from sqlalchemy import insert
+    with engine.begin() as connection:
+        for start in range(0, len(rows), chunk_size):
+            connection.execute(insert(model), rows[start:start + chunk_size])
+
+
+def seed(engine=None, users : int = 100, posts : int = 1000, solutions_per_post : int = 3,
+         comments_per_solution : int = 2, seed : int = 0) -> dict:
+    """Fill an empty, migrated database; returns the row counts. Ids start at 1."""
+    from Database.db import engine as default_engine
+    from Models.Users import UsersModel
+    from Models.Posts import PostsModel
+    from Models.Solutions import SolutionsModel
+    from Models.Comments import CommentsModel
+    import utils
+
+    engine = engine or default_engine
+    rng = random.Random(seed)
+    #one hash for everybody: the login workload needs real hashes, not one bcrypt per user
+    insert_rows(engine, UsersModel, user_rows(users, utils.pwd_context.hash(SEED_PASSWORD)))
+    insert_rows(engine, PostsModel, post_rows(rng, posts, users))
+    solutions = solution_rows(rng, posts, solutions_per_post, users)
+    insert_rows(engine, SolutionsModel, solutions)
+    comments = comment_rows(rng, len(solutions), solutions_per_post, comments_per_solution, users)
+    insert_rows(engine, CommentsModel, comments)
+    return {"users": users, "posts": posts, "solutions": len(solutions), "comments": len(comments)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed a migrated database with synthetic data")
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--posts", type=int, default=1000)
+    parser.add_argument("--solutions-per-post", type=int, default=3)
+    parser.add_argument("--comments-per-solution", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+
+    from Database.migrate import upgrade
+    upgrade()
+    counts = seed(users=args.users, posts=args.posts, solutions_per_post=args.solutions_per_post,
+                  comments_per_solution=args.comments_per_solution, seed=args.seed)
+    print(json.dumps(counts))
+
+
+if __name__ == "__main__":
+    main()
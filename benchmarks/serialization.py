@@ -0,0 +1,57 @@
+import argparse
+import json
+import time
+from fastapi.encoders import jsonable_encoder
+from benchmarks.common import make_client, post_rows
+
+#Per-row cost of turning ORM rows into a JSON body: the old jsonable_encoder + json
+#path against the schema-driven render_json, plus the wire size of a list page
+#with and without compression.
+#
+#    python -m benchmarks.serialization --rows 5000 --repeat 5
+
+
+def per_row(fn, rows, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(rows)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return round(best / len(rows) * 1e6, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    client = make_client()
+    client.post("/api/posts/bulk_create_posts", json=post_rows(args.rows)).raise_for_status()
+
+    from Database.db import SessionLocal
+    from Models.Posts import PostsModel
+    from Schemas.Posts import PostsResponseSchema
+    from serialization import render_json
+
+    with SessionLocal() as db:
+        rows = db.query(PostsModel).all()
+        runs = {
+            "jsonable_encoder + json": lambda r: json.dumps(jsonable_encoder(r)).encode(),
+            "render_json (schema)": lambda r: render_json(r, PostsResponseSchema),
+        }
+        results = {name: {"us_per_row": per_row(fn, rows, args.repeat)} for name, fn in runs.items()}
+
+    for encoding in ("identity", "gzip", "br"):
+        response = client.get("/api/posts/get_posts?limit=1000", headers={"Accept-Encoding": encoding})
+        response.raise_for_status()
+        results[f"get_posts wire bytes ({encoding})"] = {
+            "content_encoding": response.headers.get("content-encoding"),
+            "bytes": int(response.headers.get("content-length") or len(response.content)),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from benchmarks.run import summarize, git_revision
+
+#Cold-start profile: time `import app`, create_app() and the lifespan startup in fresh
+#interpreters, and list the slowest imports from `python -X importtime`, as JSON so
+#boot time can be compared across commits like the load-test reports.
+#
+#    python -m benchmarks.startup --runs 10 --out startup.json
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PHASES = """
+import time, json, asyncio
+t0 = time.perf_counter()
+import app
+t1 = time.perf_counter()
+application = app.create_app()
+t2 = time.perf_counter()
+async def lifespan():
+    async with application.router.lifespan_context(application):
+        return time.perf_counter()
+t3 = asyncio.run(lifespan())
+print(json.dumps({"import": t1 - t0, "create_app": t2 - t1, "lifespan_startup": t3 - t2, "total": t3 - t0}))
+"""
+
+
+def _env(database_url : str = None):
+    env = dict(os.environ)
+    env.pop("SECRET_KEY", None)  # importing and building the app must not need it
+    env["DATABASE_URL"] = database_url or env.get("DATABASE_URL") or "sqlite:///" + os.path.join(tempfile.gettempdir(), "startup_bench.db")
+    return env
+
+
+def phases(runs : int, database_url : str = None) -> dict:
+    samples = {}
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _PHASES], capture_output=True, text=True, check=True,
+                                cwd=ROOT, env=_env(database_url)).stdout
+        for phase, seconds in json.loads(output.strip().splitlines()[-1]).items():
+            samples.setdefault(phase, []).append(seconds)
+    return {phase: summarize(values, 0) for phase, values in samples.items()}
+
+
+def slowest_imports(top : int, database_url : str = None) -> list:
+    """Packages by total self import time of `import app; app.create_app()` (from -X importtime)."""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app; app.create_app()"],
+                            capture_output=True, text=True, check=True, cwd=ROOT, env=_env(database_url)).stderr
+    totals = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            package = name.strip().split(".")[0]
+            totals[package] = totals.get(package, 0) + int(self_us)
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": name, "self_ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile worker cold start (import, app build, lifespan)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="how many of the slowest imports to list")
+    parser.add_argument("--out", help="also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "phases": phases(args.runs),
+        "slowest_imports": slowest_imports(args.top),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+import json
+from benchmarks.seed import SEED_PASSWORD, WORDS, CATEGORIES, email
+
+#Request mixes for benchmarks.run. Each workload is a list of weighted operations; an
+#operation builds one request from the shared context (dataset sizes, rng, state kept
+#from earlier responses) and lists the statuses that count as success.
+
+
+class Op:
+    def __init__(self, name : str, weight : int, build, ok=(200,), after=None):
+        self.name = name
+        self.weight = weight
+        self.build = build  # ctx -> (method, url, httpx request kwargs)
+        self.ok = ok
+        self.after = after  # (ctx, response) -> None, e.g. to keep a cursor or token
+
+
+class Context:
+    def __init__(self, rng, counts : dict, hot_posts : int = 20):
+        self.rng = rng
+        self.users = counts["users"]
+        self.posts = counts["posts"]
+        self.solutions = counts["solutions"]
+        self.hot_posts = min(hot_posts, self.posts)
+        self.cursor = None
+        self.tokens = []
+        self.voter_tokens = {}
+
+    def post_id(self):
+        return self.rng.randint(1, self.posts)
+
+    def hot_post_id(self):
+        return self.rng.randint(1, self.hot_posts)
+
+    def user_id(self):
+        return self.rng.randint(1, self.users)
+
+    def voter(self):
+        """Authorization header of a random seeded user; votes need a bearer token. The token is
+        signed here rather than logged in for, so with --base-url export the server's SECRET_KEY."""
+        user_id = self.user_id()
+        token = self.voter_tokens.get(user_id)
+        if token is None:
+            import oauth
+            token = self.voter_tokens[user_id] = oauth.create_access_token({"user_id": user_id})
+        return {"Authorization": "Bearer " + token}
+
+
+def _keep_cursor(ctx, response):
+    ctx.cursor = response.headers.get("x-next-cursor")
+
+def _list_posts(ctx):
+    #half the readers keep paging, the rest start over from the first page
+    after = ctx.cursor if ctx.cursor and ctx.rng.random() < 0.5 else None
+    return "GET", "/api/posts/get_posts", {"params": {"limit": 20, **({"after": after} if after else {})}}
+
+def _keep_token(ctx, response):
+    if len(ctx.tokens) < 100 and response.status_code == 200:
+        token = response.json().get("access_token")
+        if token:
+            ctx.tokens.append(token)
+
+def _login(ctx):
+    return "POST", "/api/auth/login", {"data": {"username": email(ctx.user_id() - 1), "password": SEED_PASSWORD}}
+
+def _me(ctx):
+    if not ctx.tokens:
+        return _login(ctx)
+    return "GET", "/api/auth/me", {"headers": {"Authorization": "Bearer " + ctx.rng.choice(ctx.tokens)}}
+
+def _bulk_import(ctx, rows : int = 500):
+    body = "\n".join(json.dumps({
+        "post_title": "Imported " + " ".join(ctx.rng.choice(WORDS) for _ in range(4)),
+        "post_description": " ".join(ctx.rng.choice(WORDS) for _ in range(30)),
+        "post_category": ctx.rng.choice(CATEGORIES), "post_difficulty": "Medium", "user_id": ctx.user_id(),
+    }) for _ in range(rows))
+    return "POST", "/api/posts/bulk_create_posts", {"content": body, "headers": {"content-type": "application/x-ndjson"}}
+
+
+BROWSE = [
+    Op("list posts", 40, _list_posts, after=_keep_cursor),
+    Op("post by id", 25, lambda ctx: ("GET", "/api/posts/get_post_by_id", {"params": {"id": ctx.post_id()}})),
+    Op("post thread", 15, lambda ctx: ("GET", f"/api/posts/{ctx.post_id()}/thread", {})),
+    Op("search posts", 10, lambda ctx: ("GET", "/api/posts/search", {"params": {"q": ctx.rng.choice(WORDS)}})),
+    Op("list solutions", 10, lambda ctx: ("GET", "/api/solutions/get_solutions", {"params": {"limit": 20}})),
+]
+
+#409 is a repeat vote by the same user, which the API rejects by design
+LIKE_STORM = [
+    Op("like post", 60, lambda ctx: ("GET", f"/api/posts/like_post/{ctx.hot_post_id()}", {"headers": ctx.voter()}),
+       ok=(200, 409)),
+    Op("dislike post", 20, lambda ctx: ("GET", f"/api/posts/dislike_post/{ctx.hot_post_id()}", {"headers": ctx.voter()}),
+       ok=(200, 409)),
+    Op("like solution", 10, lambda ctx: ("GET", f"/api/solutions/like_solution/{ctx.rng.randint(1, ctx.solutions)}",
+                                         {"headers": ctx.voter()}), ok=(200, 204, 409)),
+    Op("hot post by id", 10, lambda ctx: ("GET", "/api/posts/get_post_by_id", {"params": {"id": ctx.hot_post_id()}})),
+]
+
+BULK_IMPORT = [
+    Op("bulk import 500 posts", 1, _bulk_import),
+]
+
+LOGIN_SPIKE = [
+    Op("login", 70, _login, after=_keep_token),
+    Op("me", 30, _me, after=_keep_token),
+]
+
+MIXED = (
+    [Op(op.name, op.weight * 7, op.build, op.ok, op.after) for op in BROWSE]
+    + [Op(op.name, op.weight * 2, op.build, op.ok, op.after) for op in LIKE_STORM]
+    + [Op(op.name, op.weight // 10, op.build, op.ok, op.after) for op in LOGIN_SPIKE]
+    + [Op(op.name, op.weight, op.build, op.ok, op.after) for op in BULK_IMPORT]
+)
+
+WORKLOADS = {
+    "browse": BROWSE,
+    "like_storm": LIKE_STORM,
+    "bulk_import": BULK_IMPORT,
+    "login_spike": LOGIN_SPIKE,
+    "mixed": MIXED,
+}
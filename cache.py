@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from fastapi import Response
+from serialization import render_json
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class LRUCache:
+    """Thread-safe LRU cache whose entries also expire.
+
+    `ttl` is the default lifetime in seconds; `set` can pass an absolute `expires_at`
+    instead (e.g. a JWT's exp), and the earlier of the two wins.
+    """
+
+    def __init__(self, maxsize : int = 1024, ttl : float = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        now = time.time()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, expires_at : float = None):
+        if self.maxsize <= 0:
+            return
+        if self.ttl is not None:
+            ttl_expiry = time.time() + self.ttl
+            expires_at = ttl_expiry if expires_at is None else min(expires_at, ttl_expiry)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+#Response cache
+#Every resource (posts, solutions, comments, users) has a version counter that the
+#write handlers bump. A cached GET is keyed by its URL plus the versions of the
+#resources it reads, so a write makes older entries unreachable instead of having
+#to find and delete them, and the ETag can be computed before touching the DB.
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "60"))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL")
+
+
+class MemoryBackend:
+    """In-process stand-in for a shared cache backend (same interface as RedisBackend)."""
+
+    def __init__(self):
+        self._values = LRUCache(maxsize=100000)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._counters:
+                return self._counters[key]
+        return self._values.get(key)
+
+    def set(self, key, value, ttl : float = None):
+        self._values.set(key, value, expires_at=time.time() + ttl if ttl else None)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisBackend:
+    """Shared backend for multi-worker deployments; needs the `redis` package."""
+
+    def __init__(self, url : str):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        value = self._client.get(key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key, value, ttl : float = None):
+        self._client.set(key, value, ex=int(ttl) if ttl else None)
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+
+class ResponseCache:
+    def __init__(self, enabled : bool = True, ttl : float = 60, maxsize : int = 1024, shared=None):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        #counters only live in this process without a shared backend, so tag them with
+        #a per-process epoch; otherwise a restart would reuse version 0 and old ETags
+        self.epoch = "shared" if shared is not None else uuid.uuid4().hex[:8]
+        self.versions_backend = shared if shared is not None else MemoryBackend()
+        self.on_bump = []  # callbacks run with the bumped resources, e.g. read-your-writes tracking
+
+    def versions(self, resources):
+        return tuple(int(self.versions_backend.get("version:" + r) or 0) for r in resources)
+
+    def bump(self, *resources):
+        for resource in resources:
+            self.versions_backend.incr("version:" + resource)
+            self.versions_backend.set("bumped:" + resource, time.time())
+        for callback in self.on_bump:
+            callback(resources)
+
+    def bumped_within(self, resources, seconds : float):
+        """Whether any of the resources was written in the last `seconds`."""
+        since = time.time() - seconds
+        return any(float(self.versions_backend.get("bumped:" + r) or 0) > since for r in resources)
+
+    def get(self, key):
+        entry = self.local.get(key)
+        if entry is None and self.shared is not None:
+            raw = self.shared.get("response:" + key)
+            if raw is not None:
+                entry = json.loads(raw)
+                self.local.set(key, entry)
+        return entry
+
+    def set(self, key, entry):
+        self.local.set(key, entry)
+        if self.shared is not None:
+            self.shared.set("response:" + key, json.dumps(entry), ttl=self.ttl)
+
+
+response_cache = ResponseCache(
+    enabled=RESPONSE_CACHE_ENABLED,
+    ttl=RESPONSE_CACHE_TTL,
+    maxsize=RESPONSE_CACHE_SIZE,
+    shared=RedisBackend(CACHE_REDIS_URL) if CACHE_REDIS_URL else None,
+)
+
+
+def _etag_matches(request, etag):
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    #weak comparison: the compression middleware sends W/"..." for compressed bodies
+    return header.strip() == "*" or etag in [t.strip().removeprefix("W/") for t in header.split(",")]
+
+
+def _cache_key(request, resources):
+    versions = response_cache.versions(resources)
+    query = "&".join(sorted(request.url.query.split("&"))) if request.url.query else ""
+    key = "%s?%s|%s|%s" % (request.url.path, query, response_cache.epoch, ",".join(map(str, versions)))
+    return key, '"%s"' % hashlib.sha1(key.encode()).hexdigest()
+
+
+def _cached(entry, etag):
+    return Response(
+        content=entry["body"],
+        media_type="application/json",
+        headers={**entry["headers"], "ETag": etag, "Cache-Control": "no-cache"},
+    )
+
+
+def _not_modified(etag):
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+
+
+def _storable(request, resources):
+    #the key carries the versions after the last write, but a replica inside its lag
+    #window may still return the rows from before it; such a body is sent, not cached
+    window = getattr(request.state, "replica_lag_window", None)
+    return not window or not response_cache.bumped_within(resources, window)
+
+
+def cached_response(request, resources, loader, schema=None):
+    """Serve a GET from the response cache, answering 304 when the client's ETag is current.
+
+    `loader` runs only on a miss and returns the data to serialize, or (data, headers);
+    `schema` is the response schema the data is rendered with.
+    """
+    if not response_cache.enabled or getattr(request.state, "bypass_cache", False):
+        return _render(loader(), schema)[0]
+
+    key, etag = _cache_key(request, resources)
+    #the ETag only depends on the versions, so a revalidation never reaches the DB
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    entry = response_cache.get(key)
+    if entry is None:
+        response, headers = _render(loader(), schema)
+        if not _storable(request, resources):
+            return response
+        entry = {"body": response.body.decode(), "headers": headers}
+        response_cache.set(key, entry)
+    return _cached(entry, etag)
+
+
+async def cached_response_async(request, resources, loader, schema=None):
+    """cached_response for async handlers; `loader` is a coroutine function."""
+    if not response_cache.enabled or getattr(request.state, "bypass_cache", False):
+        return _render(await loader(), schema)[0]
+
+    key, etag = _cache_key(request, resources)
+    if _etag_matches(request, etag):
+        return _not_modified(etag)
+
+    entry = response_cache.get(key)
+    if entry is None:
+        response, headers = _render(await loader(), schema)
+        if not _storable(request, resources):
+            return response
+        entry = {"body": response.body.decode(), "headers": headers}
+        response_cache.set(key, entry)
+    return _cached(entry, etag)
+
+
+def _render(result, schema):
+    data, headers = result if isinstance(result, tuple) else (result, {})
+    response = Response(content=render_json(data, schema), media_type="application/json", headers=headers)
+    return response, headers
@@ -0,0 +1,281 @@
+import os
+import json
+import asyncio
+import logging
+import threading
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from Database.ratings import rating_listeners
+from Models.Posts import PostsModel
+from Models.Solutions import SolutionsModel
+from Models.Comments import CommentsModel
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+#Change events
+#Write handlers queue small events ("solution.created", "comment.created", "rating", ...)
+#on their session; they are published only once that transaction commits. Events go to
+#topics ("post:1", "solution:7") that WebSocket/SSE clients subscribe to, so an open tab
+#patches what it shows instead of refetching whole tables. Rating events are coalesced:
+#every EVENTS_COALESCE_INTERVAL seconds each rated row gets one event with the summed delta.
+#With EVENTS_REDIS_URL set, events travel through Redis pub/sub and reach the
+#subscribers of every worker; otherwise they stay in this process.
+
+EVENTS_REDIS_URL = os.getenv("EVENTS_REDIS_URL")
+EVENTS_COALESCE_INTERVAL = float(os.getenv("EVENTS_COALESCE_INTERVAL", "0.5"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "256"))
+EVENTS_CHANNEL = "prodea:events"
+
+
+class Subscription:
+    """One connection's mailbox; filled from any thread, drained by its event loop."""
+
+    def __init__(self, topics, maxsize : int = EVENTS_QUEUE_SIZE):
+        self.topics = set(topics)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def _put(self, message):
+        if self.queue.full():
+            #a client that stopped reading loses its oldest events, not the newest
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    def deliver(self, message):
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    async def get(self, timeout : float = None):
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventBus:
+    """Subscribers of this process, by topic."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics):
+        subscription = Subscription(topics)
+        with self._lock:
+            for topic in subscription.topics:
+                self._subscribers.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._subscribers.get(topic)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._subscribers[topic]
+
+    def deliver(self, topic : str, message : str):
+        with self._lock:
+            subscribers = list(self._subscribers.get(topic, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(s) for s in self._subscribers.values())
+
+
+class MemoryBroker:
+    """Single-process broker: publishing is local delivery (same interface as RedisBroker)."""
+
+    def __init__(self, bus : EventBus):
+        self.bus = bus
+
+    def publish(self, topic : str, message : str):
+        self.bus.deliver(topic, message)
+
+    def close(self):
+        pass
+
+
+class RedisBroker:
+    """Cross-worker broker over Redis pub/sub; needs the `redis` package."""
+
+    def __init__(self, bus : EventBus, url : str, channel : str = EVENTS_CHANNEL):
+        import redis
+        self.bus = bus
+        self.channel = channel
+        self._client = redis.Redis.from_url(url)
+        self._pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{channel: self._on_message})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def publish(self, topic : str, message : str):
+        self._client.publish(self.channel, json.dumps([topic, message]))
+
+    def _on_message(self, item):
+        topic, message = json.loads(item["data"])
+        self.bus.deliver(topic, message)
+
+    def close(self):
+        self._thread.stop()
+        self._pubsub.close()
+
+
+class RatingCoalescer:
+    """Folds rating deltas per (topic, kind, id) and publishes one event per row per interval."""
+
+    def __init__(self, publish, interval : float = EVENTS_COALESCE_INTERVAL):
+        self.publish = publish
+        self.interval = interval
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, topic : str, kind : str, id : int, delta : int):
+        with self._lock:
+            key = (topic, kind, id)
+            self._pending[key] = self._pending.get(key, 0) + delta
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="rating-events", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for (topic, kind, id), delta in pending.items():
+            if delta:
+                self.publish(topic, {"type": "rating", "kind": kind, "id": id, "delta": delta})
+        return len(pending)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Failed to publish rating events")
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+
+def publish(topic : str, payload : dict):
+    broker.publish(topic, json.dumps(payload, default=str))
+
+
+bus = EventBus()
+broker = RedisBroker(bus, EVENTS_REDIS_URL) if EVENTS_REDIS_URL else MemoryBroker(bus)
+ratings = RatingCoalescer(publish)
+
+
+def close():
+    ratings.close()
+    broker.close()
+
+
+def post_topic(id : int):
+    return "post:%d" % id
+
+def solution_topic(id : int):
+    return "solution:%d" % id
+
+def _comment_topics(solution_id, post_id):
+    return [topic(id) for topic, id in ((solution_topic, solution_id), (post_topic, post_id)) if id is not None]
+
+
+#Events ride on the session until its transaction commits; a rollback drops them
+
+def queue(db, topics, payload : dict):
+    db.info.setdefault("pending_events", []).append((tuple(topics), payload))
+
+def queue_rating(db, topics, kind : str, id : int, delta : int):
+    db.info.setdefault("pending_ratings", []).append((tuple(topics), kind, id, delta))
+
+
+def _publish_pending(pending, pending_ratings):
+    try:
+        for topics, payload in pending:
+            for topic in topics:
+                publish(topic, payload)
+        for topics, kind, id, delta in pending_ratings:
+            for topic in topics:
+                ratings.add(topic, kind, id, delta)
+    except Exception:
+        #the write is committed either way; a lost event only means a client refetches later
+        logger.exception("Failed to publish change events")
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    pending = session.info.pop("pending_events", ())
+    pending_ratings = session.info.pop("pending_ratings", ())
+    held = session.info.get("held_events")
+    if held is not None:
+        #a batch operation committed into its savepoint; publish once the whole batch commits
+        held[0].extend(pending)
+        held[1].extend(pending_ratings)
+        return
+    _publish_pending(pending, pending_ratings)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _after_transaction_end(session, transaction):
+    #runs after after_commit, so anything left here was rolled back or closed uncommitted
+    if transaction.nested or transaction.parent is not None:
+        return
+    session.info.pop("pending_events", None)
+    session.info.pop("pending_ratings", None)
+
+
+#Batches (routers/batch.py) commit each operation into a savepoint of one outer transaction
+
+def hold(db):
+    """Keep the events of the session's commits until release(); dropped if never released."""
+    db.info["held_events"] = ([], [])
+
+def release(db):
+    """Publish the held events; call after the outer transaction commits."""
+    pending, pending_ratings = db.info.pop("held_events", ([], []))
+    _publish_pending(pending, pending_ratings)
+
+
+def solutions_created(db, rows, schema):
+    for row in rows:
+        data = schema.model_validate(row).model_dump(mode="json")
+        queue(db, [post_topic(data["post_id"])], {"type": "solution.created", "solution": data})
+
+def comments_created(db, rows, schema):
+    for row in rows:
+        data = schema.model_validate(row).model_dump(mode="json")
+        queue(db, _comment_topics(data["solution_id"], data["post_id"]), {"type": "comment.created", "comment": data})
+
+def solution_deleted(db, row):
+    queue(db, [post_topic(row.post_id), solution_topic(row.id)], {"type": "solution.deleted", "id": row.id, "post_id": row.post_id})
+
+def comment_deleted(db, row):
+    queue(db, _comment_topics(row.solution_id, row.post_id),
+          {"type": "comment.deleted", "id": row.id, "solution_id": row.solution_id})
+
+def post_deleted(db, id : int):
+    queue(db, [post_topic(id)], {"type": "post.deleted", "id": id})
+
+
+def _on_rating_changed(db, model, deltas : dict, parents : dict):
+    if model is PostsModel:
+        for id, delta in deltas.items():
+            queue_rating(db, [post_topic(id)], "post", id, delta)
+    elif model is SolutionsModel:
+        for id, delta in deltas.items():
+            if id in parents:
+                queue_rating(db, [post_topic(parents[id]["post_id"]), solution_topic(id)], "solution", id, delta)
+    elif model is CommentsModel:
+        for id, delta in deltas.items():
+            if id in parents:
+                queue_rating(db, _comment_topics(parents[id]["solution_id"], parents[id]["post_id"]), "comment", id, delta)
+
+rating_listeners.append(_on_rating_changed)
@@ -0,0 +1,249 @@
+import os
+import re
+import json
+import math
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers
+from dotenv import load_dotenv
+from middleware import metrics
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+#Admission control
+#Two checks run before a request reaches the routers:
+#  * rate limits: token buckets per client and per router rule. A rule spends one token
+#    per matching request and refills at count/period, so "30/minute" allows a burst of
+#    30 and then one every two seconds; an empty bucket answers 429 with Retry-After.
+#    create_app() assigns the rules per router prefix (votes on the like/dislike GETs,
+#    writes on POST/PUT/DELETE). Buckets live in this process unless RATE_LIMIT_REDIS_URL
+#    points every worker at one shared store; a store that fails lets requests through.
+#  * load shedding: once ADMISSION_MAX_IN_FLIGHT /api requests are being served by this
+#    worker, further ones get 503 with Retry-After at once instead of queueing on the
+#    connection pool. Event streams are long-lived and do not count.
+#A route whose one request stands for several operations (POST /api/batch) charges the
+#rest itself with spend(), against the same buckets the single routes use.
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+RATE_LIMIT_VOTES = os.getenv("RATE_LIMIT_VOTES", "30/minute")
+RATE_LIMIT_WRITES = os.getenv("RATE_LIMIT_WRITES", "120/minute")
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_TRUST_FORWARDED = os.getenv("RATE_LIMIT_TRUST_FORWARDED", "false").lower() in ("1", "true", "yes")
+#a few requests per pooled connection may wait on the pool; past that they only add latency
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", str(
+    4 * (int(os.getenv("DB_POOL_SIZE", "5")) + int(os.getenv("DB_MAX_OVERFLOW", "10"))))))  # 0 = no limit
+
+ADMITTED_PREFIX = "/api/"
+EXEMPT_PREFIXES = ("/api/events/",)
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+rejections = metrics.registry.register(metrics.Counter(
+    "prodea_admission_rejections_total", "Requests refused by rate limits (429) or load shedding (503).", ("reason",)))
+
+
+class RateLimit:
+    """`limit` is "count/period" (period: second, minute, hour, day or seconds); only requests
+    whose method is in `methods` and whose path below the router prefix matches `pattern` count."""
+
+    def __init__(self, name : str, limit : str, methods=None, pattern : str = None):
+        count, _, period = limit.partition("/")
+        seconds = PERIODS.get(period.strip().rstrip("s"))
+        if seconds is None:
+            seconds = float(period or 1)
+        self.name = name
+        self.limit = limit
+        self.burst = float(count)
+        self.rate = self.burst / seconds  # tokens per second
+        self.methods = tuple(methods) if methods else None
+        self.pattern = re.compile(pattern) if pattern else None
+
+    def matches(self, method : str, path : str) -> bool:
+        if self.methods is not None and method not in self.methods:
+            return False
+        return self.pattern is None or self.pattern.search(path) is not None
+
+
+#The like/dislike routes are GETs that write, so they are limited by path rather than method
+VOTES = RateLimit("votes", RATE_LIMIT_VOTES, pattern=r"^/(like|dislike)_\w+/")
+WRITES = RateLimit("writes", RATE_LIMIT_WRITES, methods=("POST", "PUT", "PATCH", "DELETE"))
+
+
+class MemoryStore:
+    """Token buckets in this process."""
+
+    def __init__(self, max_buckets : int = 100000):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.max_buckets = max_buckets
+
+    async def take(self, key : str, rate : float, burst : float, cost : float = 1):
+        """Spend `cost` tokens; returns (allowed, seconds until they would be available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now, rate, burst)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+    def _prune(self, now, rate, burst):
+        #a bucket that has refilled is the same as no bucket
+        full = [key for key, (tokens, updated) in self._buckets.items() if tokens + (now - updated) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+
+
+_TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local allowed, wait = 0, (cost - tokens) / rate
+if tokens >= cost then
+    tokens, allowed, wait = tokens - cost, 1, 0
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return {allowed, tostring(wait)}
+"""
+
+
+class RedisStore:
+    """Token buckets shared by every worker, updated atomically by a Lua script; needs the `redis` package."""
+
+    def __init__(self, url : str, prefix : str = "prodea:ratelimit:"):
+        import redis.asyncio
+        self._client = redis.asyncio.Redis.from_url(url)
+        self._take = self._client.register_script(_TAKE_SCRIPT)
+        self.prefix = prefix
+
+    async def take(self, key : str, rate : float, burst : float, cost : float = 1):
+        import redis
+        try:
+            allowed, wait = await self._take(keys=[self.prefix + key], args=[rate, burst, cost])
+        except (redis.RedisError, OSError) as e:
+            logger.warning("Rate limit store unavailable, letting the request through: %s", e)
+            return True, 0.0
+        return bool(allowed), float(wait)
+
+
+def default_store():
+    return RedisStore(RATE_LIMIT_REDIS_URL) if RATE_LIMIT_REDIS_URL else MemoryStore()
+
+
+def client_key(scope) -> str:
+    if RATE_LIMIT_TRUST_FORWARDED:
+        #only behind a proxy that sets the header itself; clients can send anything
+        forwarded = Headers(scope=scope).get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+#(middleware, client) of the request being served, for spend()
+_current = ContextVar("admission", default=None)
+
+
+class AdmissionMiddleware:
+    def __init__(self, app, limits : dict = None, store=None, max_in_flight : int = ADMISSION_MAX_IN_FLIGHT,
+                 enabled : bool = RATE_LIMIT_ENABLED):
+        """`limits` maps a router prefix ("/api/posts") to the RateLimits of its routes."""
+        self.app = app
+        self.limits = sorted((limits or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.store = store if store is not None else default_store()
+        self.max_in_flight = max_in_flight
+        self.enabled = enabled
+        self.in_flight = 0  # one event loop per worker, so a plain counter is enough
+
+    def _rules(self, method : str, path : str):
+        for prefix, rules in self.limits:
+            if path.startswith(prefix + "/") or path == prefix:
+                rest = path[len(prefix):]
+                return [(prefix, rule) for rule in rules if rule.matches(method, rest)]
+        return []
+
+    def _rule(self, prefix : str, name : str):
+        for rule_prefix, rules in self.limits:
+            if rule_prefix == prefix:
+                return next((rule for rule in rules if rule.name == name), None)
+        return None
+
+    async def _take(self, prefix : str, rule, client : str, cost : float = 1):
+        return await self.store.take("%s:%s:%s" % (prefix, rule.name, client), rule.rate, rule.burst, cost)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith(ADMITTED_PREFIX) or path.startswith(EXEMPT_PREFIXES):
+            await self.app(scope, receive, send)
+            return
+
+        client = None
+        if self.enabled:
+            client = client_key(scope)
+            for prefix, rule in self._rules(scope["method"], path):
+                allowed, wait = await self._take(prefix, rule, client)
+                if not allowed:
+                    rejections.inc("rate_limit:%s" % rule.name)
+                    await _refuse(send, 429, "Rate limit exceeded (%s %s)" % (rule.name, rule.limit), wait)
+                    return
+
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            rejections.inc("overload")
+            await _refuse(send, 503, "Server busy, retry shortly", 1)
+            return
+        self.in_flight += 1
+        token = _current.set((self, client) if client is not None else None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current.reset(token)
+            self.in_flight -= 1
+
+
+async def spend(prefix : str, name : str, cost : float = 1):
+    """Charge `cost` more tokens of rule `name` on router `prefix` to the current client.
+
+    Raises a 429 HTTPException when the bucket cannot cover it; does nothing outside the
+    middleware, with rate limits disabled, or if `prefix` has no such rule.
+    """
+    current = _current.get()
+    if current is None or cost <= 0:
+        return
+    middleware, client = current
+    rule = middleware._rule(prefix, name)
+    if rule is None:
+        return
+    allowed, wait = await middleware._take(prefix, rule, client, cost)
+    if not allowed:
+        rejections.inc("rate_limit:%s" % rule.name)
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                            detail="Rate limit exceeded (%s %s)" % (rule.name, rule.limit),
+                            headers={"Retry-After": str(max(1, math.ceil(wait)))})
+
+
+async def _refuse(send, status : int, detail : str, retry_after : float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
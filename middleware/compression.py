@@ -0,0 +1,165 @@
+import os
+import gzip
+import zlib
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; without it responses fall back to gzip
+    brotli = None
+
+
+#Response compression
+#Bodies of at least `minimum_size` bytes are compressed with the coding the client
+#weights highest in Accept-Encoding: brotli (when the package is installed, and on a
+#tie) or gzip; a coding with q=0 is never used. Streaming responses (the NDJSON
+#exports) are compressed chunk by chunk so they never get buffered whole.
+#Server-sent events are left alone: a compressor holds back each event until it has
+#enough bytes. A compressed body is no longer byte-identical to the one its strong
+#ETag was computed for, so the ETag is sent as weak (W/"...") instead.
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+UNCOMPRESSED_TYPES = ("text/event-stream",)
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_LEVEL = int(os.getenv("COMPRESSION_BROTLI_LEVEL", "4"))
+
+
+def accepted_encodings(header : str):
+    """{coding: q} from an Accept-Encoding header; a q that does not parse counts as 0."""
+    weights = {}
+    for token in header.split(","):
+        coding, _, params = token.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+    return weights
+
+
+class _Gzip:
+    encoding = "gzip"
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data):
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush(zlib.Z_FINISH)
+
+    @staticmethod
+    def whole(data, level):
+        return gzip.compress(data, compresslevel=level)
+
+
+class _Brotli:
+    encoding = "br"
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+    @staticmethod
+    def whole(data, level):
+        return brotli.compress(data, quality=level)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size : int = COMPRESSION_MINIMUM_SIZE,
+                 gzip_level : int = COMPRESSION_GZIP_LEVEL, brotli_level : int = COMPRESSION_BROTLI_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_level = brotli_level
+
+    def _pick(self, accept_encoding):
+        weights = accepted_encodings(accept_encoding)
+        offered = [(_Brotli, self.brotli_level)] if brotli is not None else []
+        offered.append((_Gzip, self.gzip_level))
+        best, best_q = (None, None), 0
+        for codec, level in offered:  # in order of preference, so a tie keeps brotli
+            q = weights.get(codec.encoding, weights.get("*", 0))
+            if q > best_q:
+                best, best_q = (codec, level), q
+        return best
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codec, level = self._pick(Headers(scope=scope).get("accept-encoding", ""))
+        if codec is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        stream = None
+
+        async def send_compressed(message):
+            nonlocal start, stream
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] == "http.response.body" and stream is not None:
+                body = message.get("body", b"")
+                more_body = message.get("more_body", False)
+                chunk = stream.compress(body) if body else b""
+                if not more_body:
+                    chunk += stream.finish()
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            headers = MutableHeaders(raw=start["headers"])
+            content_type = headers.get("content-type", "")
+            compressible = (
+                "content-encoding" not in headers
+                and content_type.startswith(COMPRESSIBLE_TYPES)
+                and not content_type.startswith(UNCOMPRESSED_TYPES)
+                and (more_body or len(body) >= self.minimum_size)
+            )
+            initial, start = start, None
+            if not compressible:
+                await send(initial)
+                await send(message)
+                return
+
+            headers["Content-Encoding"] = codec.encoding
+            headers.add_vary_header("Accept-Encoding")
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["ETag"] = "W/" + etag
+            if more_body:
+                #streaming: drop Content-Length and compress as chunks arrive
+                del headers["content-length"]
+                stream = codec(level)
+                await send(initial)
+                await send({"type": "http.response.body", "body": stream.compress(body), "more_body": True})
+            else:
+                compressed = codec.whole(body, level)
+                headers["Content-Length"] = str(len(compressed))
+                await send(initial)
+                await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
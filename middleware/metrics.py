@@ -0,0 +1,252 @@
+import os
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+#Request metrics
+#MetricsMiddleware times every request and records its status and response size per
+#route template (/api/posts/get_post_by_id, not the raw URL). SQLAlchemy cursor events
+#count the statements and DB time of the request in flight, flag a request that runs
+#the same statement N_PLUS_ONE_THRESHOLD times or more, and - with SLOW_REQUEST_MS
+#set - log the statements of any request slower than that. Metrics live in this
+#process; with several workers each one serves its own /metrics.
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", "10"))
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "0"))  # 0 = no slow-request log
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+DB_TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (k, _escape(v)) for k, v in pairs)
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name : str, help : str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def header(self):
+        return ["# HELP %s %s" % (self.name, self.help), "# TYPE %s %s" % (self.name, self.kind)]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + ["%s%s %s" % (self.name, _format_labels(self.labels, k), _format_value(v)) for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name : str, help : str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * len(self.buckets), 0, 0.0]
+            counts = entry[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            entry[1] += 1
+            entry[2] += value
+
+    def render(self):
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._values.items())
+        lines = self.header()
+        for labels, (counts, count, total) in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append("%s_bucket%s %d" % (self.name, _format_labels(self.labels, labels, [("le", _format_value(float(bound)))]), bucket_count))
+            lines.append("%s_bucket%s %d" % (self.name, _format_labels(self.labels, labels, [("le", "+Inf")]), count))
+            lines.append("%s_sum%s %s" % (self.name, _format_labels(self.labels, labels), _format_value(total)))
+            lines.append("%s_count%s %d" % (self.name, _format_labels(self.labels, labels), count))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    "prodea_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")))
+request_duration = registry.register(Histogram(
+    "prodea_http_request_duration_seconds", "Request latency in seconds.", ("method", "route"), LATENCY_BUCKETS))
+response_size = registry.register(Histogram(
+    "prodea_http_response_size_bytes", "Response body size in bytes (after compression).", ("method", "route"), SIZE_BUCKETS))
+requests_in_flight = registry.register(Gauge(
+    "prodea_http_requests_in_flight", "Requests currently being handled.", ("method",)))
+db_queries = registry.register(Histogram(
+    "prodea_db_queries_per_request", "SQL statements executed per request.", ("method", "route"), QUERY_COUNT_BUCKETS))
+db_time = registry.register(Histogram(
+    "prodea_db_time_seconds_per_request", "Time spent in SQL statements per request.", ("method", "route"), DB_TIME_BUCKETS))
+n_plus_one = registry.register(Counter(
+    "prodea_db_n_plus_one_requests_total",
+    "Requests that repeated one SQL statement at least N_PLUS_ONE_THRESHOLD times.", ("method", "route")))
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_time", "statements", "repeats")
+
+    def __init__(self, keep_statements : bool):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = [] if keep_statements else None
+        self.repeats = {}
+
+
+_request_stats = ContextVar("request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is not None:
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats.get()
+    if stats is None:
+        return
+    starts = conn.info.get("query_start")
+    elapsed = time.perf_counter() - starts.pop() if starts else 0.0
+    stats.queries += 1
+    stats.db_time += elapsed
+    stats.repeats[statement] = stats.repeats.get(statement, 0) + 1
+    if stats.statements is not None:
+        stats.statements.append((elapsed, statement))
+
+
+def _route_template(scope):
+    """Full path template of the matched route, e.g. /api/posts/like_post/{id}."""
+    route = scope.get("route")
+    if route is None:
+        return "unmatched"
+    template = getattr(route, "path_format", None) or route.path
+    #depending on the FastAPI version the route may not carry its router's prefix,
+    #so take the prefix from the concrete path
+    try:
+        concrete = template.format(**scope.get("path_params", {}))
+    except (KeyError, IndexError):
+        return template
+    path = scope["path"]
+    return path[:len(path) - len(concrete)] + template if path.endswith(concrete) else template
+
+
+class MetricsMiddleware:
+    def __init__(self, app, n_plus_one_threshold : int = N_PLUS_ONE_THRESHOLD, slow_request_ms : float = SLOW_REQUEST_MS,
+                 skip_paths=("/metrics",)):
+        self.app = app
+        self.n_plus_one_threshold = n_plus_one_threshold
+        self.slow_request_ms = slow_request_ms
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        stats = RequestStats(keep_statements=self.slow_request_ms > 0)
+        token = _request_stats.set(stats)
+        status = 500
+        size = 0
+
+        async def send_measured(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        requests_in_flight.inc(method)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_measured)
+        finally:
+            elapsed = time.perf_counter() - start
+            requests_in_flight.dec(method)
+            _request_stats.reset(token)
+            self._record(scope, method, status, size, elapsed, stats)
+
+    def _record(self, scope, method, status, size, elapsed, stats):
+        route = _route_template(scope)
+        requests_total.inc(method, route, str(status))
+        request_duration.observe(elapsed, method, route)
+        response_size.observe(size, method, route)
+        db_queries.observe(stats.queries, method, route)
+        db_time.observe(stats.db_time, method, route)
+
+        repeated = max(stats.repeats.values(), default=0)
+        if repeated >= self.n_plus_one_threshold:
+            n_plus_one.inc(method, route)
+            statement = max(stats.repeats, key=stats.repeats.get)
+            logger.warning("Possible N+1 on %s %s: statement ran %d times: %s", method, route, repeated, statement)
+
+        if self.slow_request_ms and elapsed * 1000 >= self.slow_request_ms:
+            logger.warning(
+                "Slow request %s %s: %.1fms, %d queries, %.1fms in DB\n%s",
+                method, scope["path"], elapsed * 1000, stats.queries, stats.db_time * 1000,
+                "\n".join("  %.2fms %s" % (t * 1000, " ".join(s.split())) for t, s in stats.statements),
+            )
@@ -0,0 +1,46 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine
+from Database.db import Base, SQLALCHEMY_DATABASE_URL, engine_options
+import Models.Users, Models.Posts, Models.Solutions, Models.Comments, Models.Votes, Models.PostScores, Models.PostFacets  # register the tables on Base
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+#Full-text search objects are created by raw DDL (Database/search.py), not mapped on the models
+SEARCH_OBJECTS = ("POSTS_FTS", "post_search", "ix_posts_post_search")
+
+def include_object(object, name, type_, reflected, compare_to):
+    return not (reflected and compare_to is None and name and name.startswith(SEARCH_OBJECTS))
+
+
+def database_url():
+    return config.get_main_option("sqlalchemy.url") or SQLALCHEMY_DATABASE_URL
+
+
+def run_migrations_offline():
+    context.configure(url=database_url(), target_metadata=target_metadata, include_object=include_object, literal_binds=True,
+                      dialect_opts={"paramstyle": "named"})
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    url = database_url()
+    connectable = create_engine(url, **engine_options(url))
+    with connectable.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata, include_object=include_object,
+                          render_as_batch=connection.dialect.name == "sqlite")
+        with context.begin_transaction():
+            context.run_migrations()
+    connectable.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
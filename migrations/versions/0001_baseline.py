@@ -0,0 +1,81 @@
+"""baseline: the schema the app used to create with Base.metadata.create_all
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18
+
+Databases created before migrations existed already have these tables;
+`python -m Database.migrate upgrade` stamps them at this revision instead of
+running it.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "USERS",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("username", sa.String),
+        sa.Column("email", sa.String),
+        sa.Column("password", sa.String),
+        sa.Column("user_rating", sa.Integer),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+    op.create_index("ix_USERS_id", "USERS", ["id"])
+    op.create_index("ix_USERS_username", "USERS", ["username"])
+    op.create_index("ix_USERS_email", "USERS", ["email"], unique=True)
+    op.create_index("ix_USERS_password", "USERS", ["password"])
+
+    op.create_table(
+        "POSTS",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("post_title", sa.String),
+        sa.Column("post_description", sa.String),
+        sa.Column("post_category", sa.String),
+        sa.Column("post_difficulty", sa.String),
+        sa.Column("post_created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("post_updated_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("USERS.id")),
+    )
+    for column in ("id", "post_title", "post_description", "post_category", "post_difficulty"):
+        op.create_index("ix_POSTS_%s" % column, "POSTS", [column])
+
+    op.create_table(
+        "SOLUTIONS",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("solution_text", sa.String),
+        sa.Column("solution_rating", sa.Integer),
+        sa.Column("post_id", sa.Integer, sa.ForeignKey("POSTS.id")),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("USERS.id")),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+    op.create_index("ix_SOLUTIONS_id", "SOLUTIONS", ["id"])
+    op.create_index("ix_SOLUTIONS_solution_text", "SOLUTIONS", ["solution_text"])
+
+    op.create_table(
+        "COMMENTS",
+        sa.Column("id", sa.Integer, primary_key=True),
+        sa.Column("comment_text", sa.String),
+        sa.Column("comment_rating", sa.Integer),
+        sa.Column("post_id", sa.Integer, sa.ForeignKey("POSTS.id")),
+        sa.Column("user_id", sa.Integer, sa.ForeignKey("USERS.id")),
+        sa.Column("solution_id", sa.Integer, sa.ForeignKey("SOLUTIONS.id")),
+        sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.TIMESTAMP(timezone=True), nullable=False),
+    )
+    op.create_index("ix_COMMENTS_id", "COMMENTS", ["id"])
+    op.create_index("ix_COMMENTS_comment_text", "COMMENTS", ["comment_text"])
+
+
+def downgrade():
+    op.drop_table("COMMENTS")
+    op.drop_table("SOLUTIONS")
+    op.drop_table("POSTS")
+    op.drop_table("USERS")
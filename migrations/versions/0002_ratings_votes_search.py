@@ -0,0 +1,68 @@
+"""post ratings, VOTES, keyset pagination indexes and full-text search
+
+Revision ID: 0002_ratings_votes_search
+Revises: 0001_baseline
+Create Date: 2026-10-18
+
+Catches up with what create_all added before migrations existed. Each step
+checks the live schema first, because a database created by an intermediate
+version of the app may already have some of these.
+"""
+from alembic import op
+import sqlalchemy as sa
+from Database.search import install_search_index
+
+
+revision = "0002_ratings_votes_search"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+KEYSET_INDEXES = [
+    ("ix_users_created_at_id", "USERS", ["created_at", "id"]),
+    ("ix_posts_post_created_at_id", "POSTS", ["post_created_at", "id"]),
+    ("ix_solutions_created_at_id", "SOLUTIONS", ["created_at", "id"]),
+    ("ix_comments_created_at_id", "COMMENTS", ["created_at", "id"]),
+]
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+
+    if "post_rating" not in {c["name"] for c in inspector.get_columns("POSTS")}:
+        op.add_column("POSTS", sa.Column("post_rating", sa.Integer, server_default=sa.text("0"), nullable=False))
+
+    if not inspector.has_table("VOTES"):
+        op.create_table(
+            "VOTES",
+            sa.Column("id", sa.Integer, primary_key=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("USERS.id"), nullable=False),
+            sa.Column("target_type", sa.String(16), nullable=False),
+            sa.Column("target_id", sa.Integer, nullable=False),
+            sa.Column("value", sa.SmallInteger, nullable=False),
+            sa.Column("created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+            sa.UniqueConstraint("user_id", "target_type", "target_id", name="uq_votes_user_target"),
+        )
+
+    for name, table, columns in KEYSET_INDEXES:
+        if name not in {i["name"] for i in inspector.get_indexes(table)}:
+            op.create_index(name, table, columns)
+
+    #the DDL is IF NOT EXISTS throughout, so it is safe to re-apply
+    install_search_index(op.get_bind())
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute('DROP INDEX IF EXISTS ix_posts_post_search')
+        op.execute('ALTER TABLE "POSTS" DROP COLUMN IF EXISTS post_search')
+    elif bind.dialect.name == "sqlite":
+        for trigger in ("posts_fts_insert", "posts_fts_delete", "posts_fts_update"):
+            op.execute("DROP TRIGGER IF EXISTS %s" % trigger)
+        op.execute('DROP TABLE IF EXISTS "POSTS_FTS"')
+    for name, table, columns in KEYSET_INDEXES:
+        op.drop_index(name, table_name=table)
+    op.drop_table("VOTES")
+    with op.batch_alter_table("POSTS") as batch:
+        batch.drop_column("post_rating")
@@ -0,0 +1,66 @@
+"""index plan: drop indexes nothing reads, index the foreign keys we filter on
+
+Revision ID: 0003_index_plan
+Revises: 0002_ratings_votes_search
+Create Date: 2026-10-18
+
+Dropped (every insert and update paid for them, no query uses them):
+  * password, comment_text, solution_text, post_description, post_title:
+    long free text that is never compared with =; title/description
+    lookups go through the full-text index
+  * ix_<TABLE>_id: duplicates of the primary key index
+Added:
+  * SOLUTIONS (post_id, created_at) and COMMENTS (solution_id, created_at):
+    the thread endpoint loads children per parent in created_at order
+  * user_id on POSTS/SOLUTIONS/COMMENTS and post_id on COMMENTS: foreign
+    keys that are filtered and joined on, and that a parent delete must scan
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003_index_plan"
+down_revision = "0002_ratings_votes_search"
+branch_labels = None
+depends_on = None
+
+DROPPED = [
+    ("ix_USERS_password", "USERS", ["password"]),
+    ("ix_COMMENTS_comment_text", "COMMENTS", ["comment_text"]),
+    ("ix_SOLUTIONS_solution_text", "SOLUTIONS", ["solution_text"]),
+    ("ix_POSTS_post_description", "POSTS", ["post_description"]),
+    ("ix_POSTS_post_title", "POSTS", ["post_title"]),
+    ("ix_USERS_id", "USERS", ["id"]),
+    ("ix_POSTS_id", "POSTS", ["id"]),
+    ("ix_SOLUTIONS_id", "SOLUTIONS", ["id"]),
+    ("ix_COMMENTS_id", "COMMENTS", ["id"]),
+]
+
+ADDED = [
+    ("ix_solutions_post_id_created_at", "SOLUTIONS", ["post_id", "created_at"]),
+    ("ix_comments_solution_id_created_at", "COMMENTS", ["solution_id", "created_at"]),
+    ("ix_comments_post_id", "COMMENTS", ["post_id"]),
+    ("ix_posts_user_id", "POSTS", ["user_id"]),
+    ("ix_solutions_user_id", "SOLUTIONS", ["user_id"]),
+    ("ix_comments_user_id", "COMMENTS", ["user_id"]),
+]
+
+
+def _index_names(table):
+    return {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade():
+    for name, table, columns in DROPPED:
+        if name in _index_names(table):
+            op.drop_index(name, table_name=table)
+    for name, table, columns in ADDED:
+        if name not in _index_names(table):
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    for name, table, columns in ADDED:
+        op.drop_index(name, table_name=table)
+    for name, table, columns in DROPPED:
+        op.create_index(name, table, columns)
@@ -0,0 +1,39 @@
+"""post scores: precomputed trending-feed scores, one row per post
+
+Revision ID: 0004_post_scores
+Revises: 0003_index_plan
+Create Date: 2026-10-18
+
+POST_SCORES holds each post's solution/comment counts, summed ratings and
+its hot score (see Database/feed.py); the feed walks ix_post_scores_score_post_id.
+Existing posts are backfilled with Database.feed.rebuild_scores.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004_post_scores"
+down_revision = "0003_index_plan"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "POST_SCORES",
+        sa.Column("post_id", sa.Integer(), sa.ForeignKey("POSTS.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("solution_count", sa.Integer(), nullable=False),
+        sa.Column("comment_count", sa.Integer(), nullable=False),
+        sa.Column("rating_sum", sa.Integer(), nullable=False),
+        sa.Column("post_created_at", sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column("score", sa.Float(), nullable=False),
+    )
+    op.create_index("ix_post_scores_score_post_id", "POST_SCORES", ["score", "post_id"])
+
+    from Database.feed import rebuild_scores
+    rebuild_scores(op.get_bind())
+
+
+def downgrade():
+    op.drop_index("ix_post_scores_score_post_id", table_name="POST_SCORES")
+    op.drop_table("POST_SCORES")
@@ -0,0 +1,29 @@
+"""user reputation: leaderboard index and backfill of USERS.user_rating
+
+Revision ID: 0005_user_reputation
+Revises: 0004_post_scores
+Create Date: 2026-10-18
+
+user_rating becomes the sum of the user's solution and comment ratings, kept
+current by Database/reputation.py; existing users are backfilled with
+rebuild_reputation. ix_users_user_rating_id serves the top-N walk and the
+rank-of-user count.
+"""
+from alembic import op
+
+
+revision = "0005_user_reputation"
+down_revision = "0004_post_scores"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_users_user_rating_id", "USERS", ["user_rating", "id"])
+
+    from Database.reputation import rebuild_reputation
+    rebuild_reputation(op.get_bind())
+
+
+def downgrade():
+    op.drop_index("ix_users_user_rating_id", table_name="USERS")
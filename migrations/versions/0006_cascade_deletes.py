@@ -0,0 +1,56 @@
+"""cascade deletes: children of posts and solutions go with their parent
+
+Revision ID: 0006_cascade_deletes
+Revises: 0005_user_reputation
+Create Date: 2026-10-18
+
+SOLUTIONS.post_id, COMMENTS.post_id and COMMENTS.solution_id become
+ON DELETE CASCADE foreign keys, so deleting a post (or a solution) removes
+its solutions and comments in the same statement instead of orphaning them.
+SQLite names none of these constraints, so they are found through a naming
+convention and the tables are rebuilt in batch mode.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006_cascade_deletes"
+down_revision = "0005_user_reputation"
+branch_labels = None
+depends_on = None
+
+CASCADES = [
+    ("SOLUTIONS", "post_id", "POSTS"),
+    ("COMMENTS", "post_id", "POSTS"),
+    ("COMMENTS", "solution_id", "SOLUTIONS"),
+]
+
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+
+def _name(table, column, referred):
+    return NAMING_CONVENTION["fk"] % {"table_name": table, "column_0_name": column, "referred_table_name": referred}
+
+
+def _existing_name(table, column, referred):
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if fk["constrained_columns"] == [column] and fk["referred_table"] == referred:
+            return fk["name"] or _name(table, column, referred)
+    return None
+
+
+def _replace(ondelete):
+    for table, column, referred in CASCADES:
+        existing = _existing_name(table, column, referred)
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch:
+            if existing is not None:
+                batch.drop_constraint(existing, type_="foreignkey")
+            batch.create_foreign_key(_name(table, column, referred), referred, [column], ["id"], ondelete=ondelete)
+
+
+def upgrade():
+    _replace("CASCADE")
+
+
+def downgrade():
+    _replace(None)
@@ -0,0 +1,27 @@
+"""index POSTS.post_updated_at for the similar-posts catch-up
+
+Revision ID: 0007_posts_updated_at_index
+Revises: 0006_cascade_deletes
+Create Date: 2026-10-18
+
+Each worker's similar-posts index re-reads the posts created or edited since
+its last sync (post_updated_at past a watermark); without this index every
+sync scans POSTS.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007_posts_updated_at_index"
+down_revision = "0006_cascade_deletes"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if "ix_posts_post_updated_at" not in {i["name"] for i in sa.inspect(op.get_bind()).get_indexes("POSTS")}:
+        op.create_index("ix_posts_post_updated_at", "POSTS", ["post_updated_at"])
+
+
+def downgrade():
+    op.drop_index("ix_posts_post_updated_at", table_name="POSTS")
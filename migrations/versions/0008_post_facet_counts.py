@@ -0,0 +1,34 @@
+"""post facet counts: posts per (category, difficulty) for /api/posts/browse
+
+Revision ID: 0008_post_facet_counts
+Revises: 0007_posts_updated_at_index
+Create Date: 2026-10-18
+
+POST_FACET_COUNTS holds one counter per category/difficulty pair in use (see
+Database/facets.py), so facet counts never group the posts table. Existing
+posts are counted with Database.facets.rebuild_counts.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008_post_facet_counts"
+down_revision = "0007_posts_updated_at_index"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "POST_FACET_COUNTS",
+        sa.Column("post_category", sa.String(), primary_key=True),
+        sa.Column("post_difficulty", sa.String(), primary_key=True),
+        sa.Column("post_count", sa.Integer(), nullable=False),
+    )
+
+    from Database.facets import rebuild_counts
+    rebuild_counts(op.get_bind())
+
+
+def downgrade():
+    op.drop_table("POST_FACET_COUNTS")
@@ -0,0 +1,44 @@
+"""votes go with their user: VOTES.user_id becomes ON DELETE CASCADE
+
+Revision ID: 0009_votes_user_cascade
+Revises: 0008_post_facet_counts
+Create Date: 2026-10-18
+
+delete_user_by_id takes the user's votes back out of the scores first
+(Database/cascade.py delete_votes_by); the cascade keeps any other delete of
+a user from failing on the foreign key. Same batch rebuild as 0006.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009_votes_user_cascade"
+down_revision = "0008_post_facet_counts"
+branch_labels = None
+depends_on = None
+
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+NAME = NAMING_CONVENTION["fk"] % {"table_name": "VOTES", "column_0_name": "user_id", "referred_table_name": "USERS"}
+
+
+def _existing_name():
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys("VOTES"):
+        if fk["constrained_columns"] == ["user_id"] and fk["referred_table"] == "USERS":
+            return fk["name"] or NAME
+    return None
+
+
+def _replace(ondelete):
+    existing = _existing_name()
+    with op.batch_alter_table("VOTES", naming_convention=NAMING_CONVENTION) as batch:
+        if existing is not None:
+            batch.drop_constraint(existing, type_="foreignkey")
+        batch.create_foreign_key(NAME, "USERS", ["user_id"], ["id"], ondelete=ondelete)
+
+
+def upgrade():
+    _replace("CASCADE")
+
+
+def downgrade():
+    _replace(None)
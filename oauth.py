@@ -1,21 +1,96 @@
 import os
-from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from fastapi import Depends, HTTPException, status
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.orm import Session
+from Database.db import get_db
+from Models.Users import UsersModel
+from Schemas.Users import CurrentUserSchema
+from cache import LRUCache
 
 # Load environment variables from .env file
 load_dotenv()
 
-SECRET_KEY = os.getenv("SECRET_KEY")
-if not SECRET_KEY:
-    raise ValueError("SECRET_KEY environment variable is not set")
+#Read on first use, not on import, so tooling can import the app without a key
+def secret_key() -> str:
+    key = os.getenv("SECRET_KEY")
+    if not key:
+        raise ValueError("SECRET_KEY environment variable is not set")
+    return key
 
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Verified claims keyed by the raw token; an entry never outlives the token's exp
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# User rows keyed by user_id; 0 turns the user cache off
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+token_cache = LRUCache(maxsize=TOKEN_CACHE_SIZE)
+user_cache = LRUCache(maxsize=USER_CACHE_SIZE if USER_CACHE_TTL > 0 else 0, ttl=USER_CACHE_TTL)
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+#Same scheme for routes where only some operations need a user; a missing header gives None
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+credentials_exception = HTTPException(
+    status_code=status.HTTP_401_UNAUTHORIZED,
+    detail="Could not validate credentials",
+    headers={"WWW-Authenticate": "Bearer"},
+)
+
+#python-jose pulls in the cryptography backends (~75ms), so it is imported on first use
+
 def create_access_token(data: dict):
+    from jose import jwt
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = jwt.encode(to_encode, secret_key(), algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def verify_access_token(token: str):
+    """Return the token's claims, checking the signature only on a cache miss."""
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
+    from jose import JWTError, jwt
+    try:
+        claims = jwt.decode(token, secret_key(), algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception
+    if claims.get("user_id") is None:
+        raise credentials_exception
+    token_cache.set(token, claims, expires_at=claims.get("exp"))
+    return claims
+
+
+def get_current_user(token: str = Depends(oauth2_scheme), database: Session = Depends(get_db)):
+    claims = verify_access_token(token)
+    user_id = claims["user_id"]
+
+    current_user = user_cache.get(user_id)
+    if current_user is not None:
+        return current_user
+
+    user = database.query(UsersModel).filter(UsersModel.id == user_id).first()
+    if not user:
+        raise credentials_exception
+    current_user = CurrentUserSchema.model_validate(user)
+    user_cache.set(user_id, current_user)
+    return current_user
+
+
+def get_optional_user(token: str = Depends(optional_oauth2_scheme), database: Session = Depends(get_db)):
+    """The current user when a bearer token is sent, None otherwise; a bad token is still a 401."""
+    if token is None:
+        return None
+    return get_current_user(token, database)
+
+
+def invalidate_user(user_id: int):
+    """Drop a cached user row after it is updated or deleted."""
+    user_cache.delete(user_id)
@@ -1,80 +1,149 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from Database.db import get_db
+from Database.routing import get_read_db, get_async_read_db, read_session_factory
+from cache import cached_response, cached_response_async, response_cache
+from Database.ratings import vote, DuplicateVote, rating_changed
+from Database import feed, reputation, cascade
+import events
+from Database.bulk import bulk_ingest, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+from Database.pagination import keyset_page, stream_ndjson, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from Database.projection import project
 from Models.Comments import CommentsModel
-from Schemas.Comments import CommentsSchema
-from typing import List
-from fastapi import APIRouter, Depends, status, HTTPException
+from Models.Votes import COMMENT
+from Schemas.Comments import CommentsSchema, CommentsResponseSchema
+from Schemas.Comments import CommentsFilterSchema, CommentsBulkUpdateSchema
+from Schemas.Bulk import BulkResultSchema
+from Schemas.Users import CurrentUserSchema
+import oauth
+from sqlalchemy import func
+from typing import List, Optional
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request
 
 router = APIRouter()
 
 @router.get("/get_comments")
-def get_comments(database : Session = Depends(get_db)):
-    data = database.query(CommentsModel).all()
-    return data 
+def get_comments(request : Request,
+                 limit : int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                 after : Optional[str] = None,
+                 stream : bool = False,
+                 fields : Optional[str] = None,
+                 database : Session = Depends(get_read_db)):
+    projection = project(fields, CommentsModel, CommentsResponseSchema, extra_columns=(CommentsModel.created_at,))
+    if stream:
+        return stream_ndjson(CommentsModel, CommentsModel.created_at, CommentsModel.id, projection.schema, after,
+                             session_factory=read_session_factory(request)[0], options=projection.options)
+    def load():
+        query = database.query(CommentsModel).options(*projection.options)
+        data, next_cursor = keyset_page(query, CommentsModel.created_at, CommentsModel.id, limit, after)
+        return data, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+    return cached_response(request, ("comments",), load, projection.schema) 
 
 @router.get("/get_comment_by_id")
-def get_comment_by_id(id : int , database : Session = Depends(get_db)):
-    data = database.query(CommentsModel).filter(CommentsModel.id == id).first()
-    return data 
+async def get_comment_by_id(id : int , request : Request , fields : Optional[str] = None ,
+                            database : AsyncSession = Depends(get_async_read_db)):
+    projection = project(fields, CommentsModel, CommentsResponseSchema)
+    return await cached_response_async(request, ("comments",), lambda: database.get(CommentsModel, id, options=projection.options),
+                                       projection.schema)
 
-@router.post("/create_multiple_comments")
+@router.post("/create_multiple_comments", response_model=List[CommentsResponseSchema])
 def create_multiple_comments(comments : List[CommentsSchema] , database : Session = Depends(get_db)):
     data = [CommentsModel(**c.dict())for c in comments]
     database.add_all(data)
+    database.flush()
+    feed.record_comments(database, data)
+    reputation.record_authored(database, CommentsModel, data)
+    events.comments_created(database, data, CommentsResponseSchema)
+    result = [CommentsResponseSchema.model_validate(c) for c in data]  # before commit expires the rows
     database.commit()
-    return data
+    response_cache.bump("comments")
+    return result
+
+def _record_bulk(db, ids, rows):
+    feed.record_comments(db, rows)
+    reputation.record_authored(db, CommentsModel, rows)
+    events.comments_created(db, [{**row, "id": id} for id, row in zip(ids, rows)], CommentsResponseSchema)
 
-@router.delete("/delete_comment_by_id")
+#Bulk ingest: JSON array or NDJSON body, committed per chunk, answered with per-chunk summaries
+@router.post("/bulk_create_comments")
+async def bulk_create_comments(request : Request,
+                                chunk_size : int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE),
+                                database : Session = Depends(get_db)):
+    return await bulk_ingest(request, database, CommentsModel, CommentsSchema, chunk_size,
+                             after_insert=_record_bulk)
+
+@router.delete("/delete_comment_by_id", response_model=CommentsResponseSchema)
 def delete_comment_by_id(id : int , database : Session = Depends(get_db)):
     data = database.query(CommentsModel).filter(CommentsModel.id == id).first()
-    database.delete(data)
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
+    result = CommentsResponseSchema.model_validate(data)
+    cascade.delete_comments(database, CommentsModel.id == id)
     database.commit()
-    return data 
+    response_cache.bump("comments")
+    return result
+
+#Set-based bulk delete: one DELETE ... RETURNING for every comment matching the filters
+@router.post("/bulk_delete_comments", response_model=BulkResultSchema)
+def bulk_delete_comments(where : CommentsFilterSchema , database : Session = Depends(get_db)):
+    ids = [row.id for row in cascade.delete_comments(database, cascade.where_clause(CommentsModel, where.model_dump()))]
+    database.commit()
+    response_cache.bump("comments")
+    return BulkResultSchema(count=len(ids), ids=ids, missing=sorted(set(where.ids or ()) - set(ids)))
+
+#Set-based bulk update: one UPDATE ... RETURNING; only the fields given in values change
+@router.post("/bulk_update_comments", response_model=BulkResultSchema)
+def bulk_update_comments(body : CommentsBulkUpdateSchema , database : Session = Depends(get_db)):
+    values = body.values.model_dump(exclude_none=True)
+    if not values:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to update")
+    ids = cascade.update_rows(database, CommentsModel, cascade.where_clause(CommentsModel, body.where.model_dump()),
+                              {**values, "updated_at": func.now()})
+    database.commit()
+    response_cache.bump("comments")
+    return BulkResultSchema(count=len(ids), ids=ids, missing=sorted(set(body.where.ids or ()) - set(ids)))
 
-@router.put("/update_comment_by_id")
+@router.put("/update_comment_by_id", response_model=CommentsResponseSchema)
 def update_comment_by_id(id : int , comment : CommentsSchema , database : Session = Depends(get_db)):
     data = database.query(CommentsModel).filter(CommentsModel.id == id).first()
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Comment not found")
     data.comment_text = comment.comment_text
+    rating_changed(database, CommentsModel, {id: (comment.comment_rating or 0) - (data.comment_rating or 0)}, {id: data})
     data.comment_rating = comment.comment_rating
+    data.updated_at = func.now()
     database.commit()
+    response_cache.bump("comments")
     return data 
 
 #Rating for comments
-def disliking_comment(db: Session, id: int):
-    comment = db.query(CommentsModel).filter(CommentsModel.id == id).first()
-    if not comment:
+#Each vote is one UPDATE ... RETURNING, so concurrent likes never lose an increment.
+#Votes need a bearer token; the voter is recorded in VOTES, one vote per user per comment.
+def rate_comment(db: Session, id: int, value: int, user_id: int):
+    try:
+        found, rating = vote(db, COMMENT, CommentsModel, CommentsModel.comment_rating, id, value, user_id)
+    except DuplicateVote:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Vote already recorded")
+    if not found:
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
-    else:
-        comment.comment_rating -=1
-        if comment.comment_rating<0:
-            comment.comment_rating=0
-        db.commit()
-        db.refresh(comment)
-    
-def liking_comment(db: Session, id: int):
-        comment = db.query(CommentsModel).filter(CommentsModel.id == id).first()
-        if not comment:
-            raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
-        else:
-            comment.comment_rating +=1
-            db.commit()
-            db.refresh(comment)
+    response_cache.bump("comments")
+    return rating
+
+def disliking_comment(db: Session, id: int, user_id: int):
+    return rate_comment(db, id, -1, user_id)
+
+def liking_comment(db: Session, id: int, user_id: int):
+    return rate_comment(db, id, 1, user_id)
 
 @router.get("/dislike_comment/{id}")
-def dislike_comment(id : int , database : Session = Depends(get_db)):
-    comment = database.query(CommentsModel).filter(CommentsModel.id == id).first()
-    if not comment:
-        raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
-    else:
-        disliking_comment(database, id)
-        return {"message": "Comment disliked successfully"}
+def dislike_comment(id : int , database : Session = Depends(get_db) ,
+                    current_user : CurrentUserSchema = Depends(oauth.get_current_user)):
+    rating = disliking_comment(database, id, current_user.id)
+    return {"message": "Comment disliked successfully", "comment_rating": rating}
 
 @router.get("/like_comment/{id}")
-def like_comment(id : int , database : Session = Depends(get_db)):
-    comment = database.query(CommentsModel).filter(CommentsModel.id == id).first()
-    if not comment:
-        raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
-    else:
-        liking_comment(database, id)
-        return {"message": "Comment liked successfully"}
\ No newline at end of file
+def like_comment(id : int , database : Session = Depends(get_db) ,
+                 current_user : CurrentUserSchema = Depends(oauth.get_current_user)):
+    rating = liking_comment(database, id, current_user.id)
+    return {"message": "Comment liked successfully", "comment_rating": rating}
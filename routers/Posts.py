@@ -1,110 +1,290 @@
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from Database.db import get_db
+from Database.routing import get_read_db, get_async_read_db, read_session_factory
+from cache import cached_response, cached_response_async, response_cache
+from Database.ratings import vote, DuplicateVote
+from Database import feed, cascade, facets
+from Database.bulk import bulk_ingest, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+from Database.pagination import keyset_page, stream_ndjson, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from Database.projection import project
 from Models.Posts import PostsModel
+from Models.Votes import POST
 from Schemas.Posts import PostsSchema
-from typing import List
-from fastapi import APIRouter, Depends, status, HTTPException
-from Schemas.Posts import PostsResponseSchema
+from typing import List, Optional
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request
+from Schemas.Posts import PostsResponseSchema, PostThreadSchema, PostSearchResultSchema, PostFeedSchema, PostSimilarSchema
+from Schemas.Posts import PostsFilterSchema, PostsBulkUpdateSchema, PostBrowseSchema
+from Schemas.Bulk import BulkResultSchema
+from Schemas.Users import CurrentUserSchema
+import oauth
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError, InterfaceError
+from Database.search import search_posts
+from Models.Solutions import SolutionsModel
+from sqlalchemy.orm import selectinload
 
 
 router = APIRouter()
 
 @router.get("/get_posts")
-def get_posts(database: Session = Depends(get_db)):
+def get_posts(request : Request,
+              limit : int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+              after : Optional[str] = None,
+              stream : bool = False,
+              fields : Optional[str] = None,
+              database: Session = Depends(get_read_db)):
+    projection = project(fields, PostsModel, PostsResponseSchema, extra_columns=(PostsModel.post_created_at,))
+    if stream:
+        return stream_ndjson(PostsModel, PostsModel.post_created_at, PostsModel.id, projection.schema, after,
+                             session_factory=read_session_factory(request)[0], options=projection.options)
+    def load():
+        query = database.query(PostsModel).options(*projection.options)
+        data, next_cursor = keyset_page(query, PostsModel.post_created_at, PostsModel.id, limit, after)
+        return data, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
     try:
-        data = database.query(PostsModel).all()
-        return data
+        return cached_response(request, ("posts",), load, projection.schema)
+    except (HTTPException, OperationalError, InterfaceError):
+        #connection errors must reach get_read_db, which takes a dead replica out of rotation
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Error fetching posts: {str(e)}")
 
+#Trending feed: hottest first by the precomputed POST_SCORES score, keyset paginated
+@router.get("/feed", response_model=List[PostFeedSchema])
+def get_feed(request : Request,
+             limit : int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+             after : Optional[str] = None,
+             database : Session = Depends(get_read_db)):
+    def load():
+        rows, next_cursor = feed.feed_page(database, limit, after)
+        data = [PostFeedSchema(**PostsResponseSchema.model_validate(post).model_dump(), score=score,
+                               solution_count=solutions, comment_count=comments)
+                for post, score, solutions, comments in rows]
+        return data, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+    return cached_response(request, ("posts", "solutions", "comments"), load, PostFeedSchema)
+
+#Faceted browsing: filter by any categories and difficulties (repeat a parameter to select
+#several), keyset paginated, with per-value counts from POST_FACET_COUNTS
+@router.get("/browse", response_model=PostBrowseSchema)
+def browse(request : Request,
+           post_category : Optional[List[str]] = Query(None),
+           post_difficulty : Optional[List[str]] = Query(None),
+           limit : int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+           after : Optional[str] = None,
+           database : Session = Depends(get_read_db)):
+    post_category, post_difficulty = facets.selected(post_category), facets.selected(post_difficulty)
+    def load():
+        query = database.query(PostsModel)
+        if post_category:
+            query = query.filter(PostsModel.post_category.in_(post_category))
+        if post_difficulty:
+            query = query.filter(PostsModel.post_difficulty.in_(post_difficulty))
+        data, next_cursor = keyset_page(query, PostsModel.post_created_at, PostsModel.id, limit, after)
+        total, counts = facets.facet_counts(database, post_category, post_difficulty)
+        result = PostBrowseSchema(total=total, facets=counts, posts=[PostsResponseSchema.model_validate(p) for p in data])
+        return result, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+    return cached_response(request, ("posts",), load, PostBrowseSchema)
+
 @router.get("/get_post_by_id")
-def get_post_by_id(id : int , database : Session = Depends(get_db)):
-    data = database.query(PostsModel).filter(PostsModel.id == id).first()
-    return data 
+async def get_post_by_id(id : int , request : Request , fields : Optional[str] = None ,
+                         database : AsyncSession = Depends(get_async_read_db)):
+    projection = project(fields, PostsModel, PostsResponseSchema)
+    return await cached_response_async(request, ("posts",), lambda: database.get(PostsModel, id, options=projection.options),
+                                       projection.schema)
+
+#Full-text search, ranked best match first
+@router.get("/search", response_model=List[PostSearchResultSchema])
+def search(request : Request,
+           q : str = Query(..., min_length=1),
+           post_category : Optional[str] = None,
+           post_difficulty : Optional[str] = None,
+           limit : int = Query(20, ge=1, le=100),
+           database : Session = Depends(get_read_db)):
+    def load():
+        try:
+            rows = search_posts(database, q, post_category, post_difficulty, limit)
+        except NotImplementedError as e:
+            raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail=str(e))
+        return [PostSearchResultSchema(**PostsResponseSchema.model_validate(post).model_dump(), rank=rank) for post, rank in rows]
+    return cached_response(request, ("posts",), load, PostSearchResultSchema)
 
-@router.post("/create_multiple_posts")
-def create_multiple_posts(posts : List[PostsSchema] , database : Session = Depends(get_db)):
+#Post thread: the post, its solutions and their comments in three bounded queries
+@router.get("/{id}/thread", response_model=PostThreadSchema)
+def get_post_thread(id : int , request : Request , database : Session = Depends(get_read_db)):
+    def load():
+        data = (
+            database.query(PostsModel)
+            .options(selectinload(PostsModel.solutions).selectinload(SolutionsModel.comments))
+            .filter(PostsModel.id == id)
+            .first()
+        )
+        if not data:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        return data
+    return cached_response(request, ("posts", "solutions", "comments"), load, PostThreadSchema)
+
+#Similar posts: cosine top-k over the TF-IDF of titles and descriptions (Database/similar.py)
+@router.get("/{id}/similar", response_model=List[PostSimilarSchema])
+def get_similar_posts(id : int , request : Request ,
+                      limit : int = Query(10, ge=1, le=50),
+                      database : Session = Depends(get_read_db)):
+    from Database import similar
+    def load():
+        post = database.get(PostsModel, id)
+        if not post:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+        return [
+            PostSimilarSchema.model_validate({**PostsResponseSchema.model_validate(row).model_dump(), "similarity": score})
+            for row, score in similar.similar_posts(database, post, limit)
+        ]
+    return cached_response(request, ("posts",), load, PostSimilarSchema)
+
+#New posts that nearly repeat an existing one, or one earlier in the same list, are
+#answered with 409 and the matches; send check_duplicates=false to post them anyway
+@router.post("/create_multiple_posts", response_model=List[PostsResponseSchema])
+def create_multiple_posts(posts : List[PostsSchema] , database : Session = Depends(get_db) ,
+                          check_duplicates : bool = True):
+    from Database import similar
+    if check_duplicates:
+        found, repeats = similar.find_duplicates(database, [(p.post_title, p.post_description) for p in posts])
+        duplicates = [
+            {"index": index, "post_id": row.id, "post_title": row.post_title, "similarity": score}
+            for index, matches in enumerate(found) for row, score in matches
+        ] + [
+            #a post repeating an earlier one of the same request: same_request_index points at it
+            {"index": index, "post_id": None, "post_title": posts[earlier].post_title, "similarity": score,
+             "same_request_index": earlier}
+            for index, matches in enumerate(repeats) for earlier, score in matches
+        ]
+        if duplicates:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT,
+                                detail={"message": "Similar posts already exist", "duplicates": duplicates})
     data = [PostsModel(**p.dict())for p in posts]
     database.add_all(data)
+    database.flush()
+    feed.add_posts(database, [p.id for p in data])
+    facets.record_posts(database, data)
+    result = [PostsResponseSchema.model_validate(p) for p in data]  # before commit expires the rows
     database.commit()
-    return data
+    response_cache.bump("posts")
+    similar.posts_changed()
+    return result
 
-@router.delete("/delete_post_by_id")
+#Bulk ingest: JSON array or NDJSON body, committed per chunk, answered with per-chunk summaries
+@router.post("/bulk_create_posts")
+async def bulk_create_posts(request : Request,
+                             chunk_size : int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE),
+                             database : Session = Depends(get_db)):
+    return await bulk_ingest(request, database, PostsModel, PostsSchema, chunk_size,
+                             after_insert=_after_bulk_insert)
+
+def _after_bulk_insert(db, ids, rows):
+    from Database import similar
+    feed.add_posts(db, ids)
+    facets.record_posts(db, rows)
+    similar.posts_changed()
+
+#Deleting a post takes its solutions and comments with it (ON DELETE CASCADE)
+@router.delete("/delete_post_by_id", response_model=PostsResponseSchema)
 def delete_post_by_id(id : int , database : Session = Depends(get_db)):
     data = database.query(PostsModel).filter(PostsModel.id == id).first()
-    database.delete(data)
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    result = PostsResponseSchema.model_validate(data)
+    cascade.delete_posts(database, PostsModel.id == id)
     database.commit()
-    return data 
+    response_cache.bump("posts", "solutions", "comments")
+    _posts_deleted([id])
+    return result
 
-@router.put("/update_post_by_id")
+def _posts_deleted(ids):
+    from Database import similar
+    similar.posts_deleted(ids)
+
+#Set-based bulk delete: one DELETE ... RETURNING for every post matching the filters
+@router.post("/bulk_delete_posts", response_model=BulkResultSchema)
+def bulk_delete_posts(where : PostsFilterSchema , database : Session = Depends(get_db)):
+    ids = [row.id for row in cascade.delete_posts(database, cascade.where_clause(PostsModel, where.model_dump()))]
+    database.commit()
+    response_cache.bump("posts", "solutions", "comments")
+    _posts_deleted(ids)
+    return BulkResultSchema(count=len(ids), ids=ids, missing=sorted(set(where.ids or ()) - set(ids)))
+
+#Set-based bulk update: one UPDATE ... RETURNING; only the fields given in values change
+@router.post("/bulk_update_posts", response_model=BulkResultSchema)
+def bulk_update_posts(body : PostsBulkUpdateSchema , database : Session = Depends(get_db)):
+    values = body.values.model_dump(exclude_none=True)
+    if not values:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to update")
+    where = cascade.where_clause(PostsModel, body.where.model_dump())
+    before = facets.lock_pairs(database, where, values)
+    ids = cascade.update_rows(database, PostsModel, where, {**values, "post_updated_at": func.now()})
+    facets.move_posts(database, before, values)
+    database.commit()
+    response_cache.bump("posts")
+    if "post_title" in values or "post_description" in values:
+        _posts_changed()
+    return BulkResultSchema(count=len(ids), ids=ids, missing=sorted(set(body.where.ids or ()) - set(ids)))
+
+@router.put("/update_post_by_id", response_model=PostsResponseSchema)
 def update_post_by_id(id : int , post : PostsSchema , database : Session = Depends(get_db)):
-    data = database.query(PostsModel).filter(PostsModel.id == id).first()
+    data = database.query(PostsModel).filter(PostsModel.id == id).with_for_update().first()
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
+    facets.move_posts(database, [data], {"post_category": post.post_category, "post_difficulty": post.post_difficulty})
     data.post_title = post.post_title
     data.post_description = post.post_description
     data.post_category = post.post_category
     data.post_difficulty = post.post_difficulty
+    data.post_updated_at = func.now()
     database.commit()
+    response_cache.bump("posts")
+    _posts_changed()
     return data 
 
+def _posts_changed():
+    from Database import similar
+    similar.posts_changed()
+
 #Rating for posts
-# Note: Since post_rating column doesn't exist in the database,
-# we'll use a workaround by storing ratings in a separate table or
-# just return success without updating (frontend can handle client-side rating)
-def disliking_post(db: Session, id: int):
-    # Check if post exists by querying only columns that exist
-    post = db.query(
-        PostsModel.id,
-        PostsModel.post_title
-    ).filter(PostsModel.id == id).first()
-    
-    if not post:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-    # Since post_rating column doesn't exist, we can't update it in the database
-    # The frontend will handle the rating display client-side
-    # In a production app, you'd want to add the column or use a separate ratings table
-
-def liking_post(db: Session, id: int):
-    # Check if post exists by querying only columns that exist
-    post = db.query(
-        PostsModel.id,
-        PostsModel.post_title
-    ).filter(PostsModel.id == id).first()
-    
-    if not post:
+#post_rating is a denormalized counter, so reading a score never has to COUNT the VOTES table
+#Votes need a bearer token; the voter is recorded in VOTES, one vote per user per post.
+def rate_post(db: Session, id: int, value: int, user_id: int):
+    try:
+        found, rating = vote(db, POST, PostsModel, PostsModel.post_rating, id, value, user_id)
+    except DuplicateVote:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Vote already recorded")
+    if not found:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-    # Since post_rating column doesn't exist, we can't update it in the database
-    # The frontend will handle the rating display client-side
-    # In a production app, you'd want to add the column or use a separate ratings table
+    response_cache.bump("posts")
+    return rating
+
+def disliking_post(db: Session, id: int, user_id: int):
+    return rate_post(db, id, -1, user_id)
+
+def liking_post(db: Session, id: int, user_id: int):
+    return rate_post(db, id, 1, user_id)
 
 @router.get("/dislike_post/{id}")
-def dislike_post(id : int , database : Session = Depends(get_db)):
+def dislike_post(id : int , database : Session = Depends(get_db) ,
+                 current_user : CurrentUserSchema = Depends(oauth.get_current_user)):
     try:
-        # Verify post exists
-        post = database.query(PostsModel.id).filter(PostsModel.id == id).first()
-        if not post:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-        
-        # Call the disliking function (it will verify post exists)
-        disliking_post(database, id)
-        return {"message": "Post disliked successfully", "post_id": id, "note": "Rating stored client-side (post_rating column not in database)"}
+        rating = disliking_post(database, id, current_user.id)
+        return {"message": "Post disliked successfully", "post_id": id, "post_rating": rating}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error disliking post: {str(e)}")
 
 @router.get("/like_post/{id}")
-def like_post(id : int , database : Session = Depends(get_db)):
+def like_post(id : int , database : Session = Depends(get_db) ,
+              current_user : CurrentUserSchema = Depends(oauth.get_current_user)):
     try:
-        # Verify post exists
-        post = database.query(PostsModel.id).filter(PostsModel.id == id).first()
-        if not post:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Post not found")
-        
-        # Call the liking function (it will verify post exists)
-        liking_post(database, id)
-        return {"message": "Post liked successfully", "post_id": id, "note": "Rating stored client-side (post_rating column not in database)"}
+        rating = liking_post(database, id, current_user.id)
+        return {"message": "Post liked successfully", "post_id": id, "post_rating": rating}
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error liking post: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error liking post: {str(e)}")
@@ -1,79 +1,146 @@
 from fastapi import APIRouter, Depends, status
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from Database.db import get_db
+from Database.routing import get_read_db, get_async_read_db, read_session_factory
+from cache import cached_response, cached_response_async, response_cache
+from Database.ratings import vote, DuplicateVote, rating_changed
+from Database import feed, reputation, cascade
+import events
+from Database.bulk import bulk_ingest, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+from Database.pagination import keyset_page, stream_ndjson, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from Database.projection import project
 from Models.Solutions import SolutionsModel
-from Schemas.Solutions import SolutionsSchema
-from typing import List
-from fastapi import APIRouter, Depends, status, HTTPException
+from Models.Votes import SOLUTION
+from Schemas.Solutions import SolutionsSchema, SolutionsResponseSchema
+from Schemas.Solutions import SolutionsFilterSchema, SolutionsBulkUpdateSchema
+from Schemas.Bulk import BulkResultSchema
+from Schemas.Users import CurrentUserSchema
+import oauth
+from typing import List, Optional
+from fastapi import APIRouter, Depends, status, HTTPException, Query, Request
 router = APIRouter()
 
 @router.get("/get_solutions")
-def get_solutions(database : Session = Depends(get_db)):
-    data = database.query(SolutionsModel).all()
-    return data 
+def get_solutions(request : Request,
+                  limit : int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                  after : Optional[str] = None,
+                  stream : bool = False,
+                  fields : Optional[str] = None,
+                  database : Session = Depends(get_read_db)):
+    projection = project(fields, SolutionsModel, SolutionsResponseSchema, extra_columns=(SolutionsModel.created_at,))
+    if stream:
+        return stream_ndjson(SolutionsModel, SolutionsModel.created_at, SolutionsModel.id, projection.schema, after,
+                             session_factory=read_session_factory(request)[0], options=projection.options)
+    def load():
+        query = database.query(SolutionsModel).options(*projection.options)
+        data, next_cursor = keyset_page(query, SolutionsModel.created_at, SolutionsModel.id, limit, after)
+        return data, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+    return cached_response(request, ("solutions",), load, projection.schema) 
 
 @router.get("/get_solution_by_id")
-def get_solution_by_id(id : int , database : Session = Depends(get_db)):
-    data = database.query(SolutionsModel).filter(SolutionsModel.id == id).first()
-    return data
+async def get_solution_by_id(id : int , request : Request , fields : Optional[str] = None ,
+                             database : AsyncSession = Depends(get_async_read_db)):
+    projection = project(fields, SolutionsModel, SolutionsResponseSchema)
+    return await cached_response_async(request, ("solutions",), lambda: database.get(SolutionsModel, id, options=projection.options),
+                                       projection.schema)
 
-@router.post("/create_multiple_solutions")
+@router.post("/create_multiple_solutions", response_model=List[SolutionsResponseSchema])
 def create_multiple_solutions(solutions : List[SolutionsSchema] , database : Session = Depends(get_db)):
     data = [SolutionsModel(**s.dict())for s in solutions]
     database.add_all(data)
+    database.flush()
+    feed.record_solutions(database, data)
+    reputation.record_authored(database, SolutionsModel, data)
+    events.solutions_created(database, data, SolutionsResponseSchema)
+    result = [SolutionsResponseSchema.model_validate(s) for s in data]  # before commit expires the rows
     database.commit()
-    return data
+    response_cache.bump("solutions")
+    return result
+
+def _record_bulk(db, ids, rows):
+    feed.record_solutions(db, rows)
+    reputation.record_authored(db, SolutionsModel, rows)
+    events.solutions_created(db, [{**row, "id": id} for id, row in zip(ids, rows)], SolutionsResponseSchema)
+
+#Bulk ingest: JSON array or NDJSON body, committed per chunk, answered with per-chunk summaries
+@router.post("/bulk_create_solutions")
+async def bulk_create_solutions(request : Request,
+                                 chunk_size : int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE),
+                                 database : Session = Depends(get_db)):
+    return await bulk_ingest(request, database, SolutionsModel, SolutionsSchema, chunk_size,
+                             after_insert=_record_bulk)
 
-@router.delete("/delete_solution_by_id")
+@router.delete("/delete_solution_by_id", response_model=SolutionsResponseSchema)
 def delete_solution_by_id(id : int , database : Session = Depends(get_db)):
     data = database.query(SolutionsModel).filter(SolutionsModel.id == id).first()
-    database.delete(data)
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Solution not found")
+    result = SolutionsResponseSchema.model_validate(data)
+    cascade.delete_solutions(database, SolutionsModel.id == id)
     database.commit()
-    return data 
+    response_cache.bump("solutions", "comments")
+    return result
+
+#Set-based bulk delete: one DELETE ... RETURNING for every solution matching the filters
+@router.post("/bulk_delete_solutions", response_model=BulkResultSchema)
+def bulk_delete_solutions(where : SolutionsFilterSchema , database : Session = Depends(get_db)):
+    ids = [row.id for row in cascade.delete_solutions(database, cascade.where_clause(SolutionsModel, where.model_dump()))]
+    database.commit()
+    response_cache.bump("solutions", "comments")
+    return BulkResultSchema(count=len(ids), ids=ids, missing=sorted(set(where.ids or ()) - set(ids)))
 
-@router.put("/update_solution_by_id")
+#Set-based bulk update: one UPDATE ... RETURNING; only the fields given in values change
+@router.post("/bulk_update_solutions", response_model=BulkResultSchema)
+def bulk_update_solutions(body : SolutionsBulkUpdateSchema , database : Session = Depends(get_db)):
+    values = body.values.model_dump(exclude_none=True)
+    if not values:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Nothing to update")
+    ids = cascade.update_rows(database, SolutionsModel, cascade.where_clause(SolutionsModel, body.where.model_dump()),
+                              values)
+    database.commit()
+    response_cache.bump("solutions")
+    return BulkResultSchema(count=len(ids), ids=ids, missing=sorted(set(body.where.ids or ()) - set(ids)))
+
+@router.put("/update_solution_by_id", response_model=SolutionsResponseSchema)
 def update_solution_by_id(id : int , solution : SolutionsSchema , database : Session = Depends(get_db)):
     data = database.query(SolutionsModel).filter(SolutionsModel.id == id).first()
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Solution not found")
     data.solution_text = solution.solution_text
+    rating_changed(database, SolutionsModel, {id: (solution.solution_rating or 0) - (data.solution_rating or 0)}, {id: data})
     data.solution_rating = solution.solution_rating
     database.commit()
+    response_cache.bump("solutions")
     return data 
 
 #Rating for solutions
-def disliking_solution(db: Session, id: int):
-    solution = db.query(SolutionsModel).filter(SolutionsModel.id == id).first()
-    if not solution:
+#Each vote is one UPDATE ... RETURNING, so concurrent likes never lose an increment.
+#Votes need a bearer token; the voter is recorded in VOTES, one vote per user per solution.
+def rate_solution(db: Session, id: int, value: int, user_id: int):
+    try:
+        found, rating = vote(db, SOLUTION, SolutionsModel, SolutionsModel.solution_rating, id, value, user_id)
+    except DuplicateVote:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Vote already recorded")
+    if not found:
         raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
-    else:
-        solution.solution_rating -=1
-        if solution.solution_rating<0:
-            solution.solution_rating=0
-        db.commit()
-        db.refresh(solution)
+    response_cache.bump("solutions")
+    return rating
 
-def liking_solution(db: Session, id: int):
-    solution = db.query(SolutionsModel).filter(SolutionsModel.id == id).first()
-    if not solution:
-        raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
-    else:
-        solution.solution_rating +=1
-        db.commit()
-        db.refresh(solution)
+def disliking_solution(db: Session, id: int, user_id: int):
+    return rate_solution(db, id, -1, user_id)
+
+def liking_solution(db: Session, id: int, user_id: int):
+    return rate_solution(db, id, 1, user_id)
 
 @router.get("/dislike_solution/{id}")
-def dislike_solution(id : int , database : Session = Depends(get_db)):
-    solution = database.query(SolutionsModel).filter(SolutionsModel.id == id).first()
-    if not solution:
-        raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
-    else:
-        disliking_solution(database, id)
-        return {"message": "Solution disliked successfully"}
+def dislike_solution(id : int , database : Session = Depends(get_db) ,
+                     current_user : CurrentUserSchema = Depends(oauth.get_current_user)):
+    rating = disliking_solution(database, id, current_user.id)
+    return {"message": "Solution disliked successfully", "solution_rating": rating}
 
 @router.get("/like_solution/{id}")
-def like_solution(id : int , database : Session = Depends(get_db)):
-    solution = database.query(SolutionsModel).filter(SolutionsModel.id == id).first()
-    if not solution:
-        raise HTTPException(status_code=status.HTTP_204_NO_CONTENT)
-    else:
-        liking_solution(database, id)
-        return {"message": "Solution liked successfully"}
\ No newline at end of file
+def like_solution(id : int , database : Session = Depends(get_db) ,
+                  current_user : CurrentUserSchema = Depends(oauth.get_current_user)):
+    rating = liking_solution(database, id, current_user.id)
+    return {"message": "Solution liked successfully", "solution_rating": rating}
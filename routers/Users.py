@@ -1,10 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from Database.db import get_db
+from Database.routing import get_read_db, get_async_read_db, read_session_factory
+from cache import cached_response, cached_response_async, response_cache
+from Database.bulk import bulk_ingest, DEFAULT_CHUNK_SIZE, MAX_CHUNK_SIZE
+from Database.pagination import keyset_page, stream_ndjson, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from Database.projection import project
 from Models.Users import UsersModel
-from Schemas.Users import UsersSchema
+from Schemas.Users import UsersSchema, UsersResponseSchema, LeaderboardEntrySchema, LeaderboardSchema
+from Database import reputation, cascade
 import utils
-from typing import List
+import oauth
+from typing import List, Optional
 
 router = APIRouter()
 
@@ -20,21 +28,58 @@ def read_root():
 def read_root():
     return {"message": "Hello Welcome to the PRODEA Project!"}
 
+#user_rating moves with every vote on a solution or comment, and those writes bump only
+#their own resource, so every read that returns user_rating is versioned on them too
+REPUTATION_RESOURCES = ("users", "solutions", "comments")
+
 #2. Get All Users
 @router.get("/get_users")
-def get_users(database : Session = Depends(get_db)):
-    data = database.query(UsersModel).all()
-    return data
+def get_users(request : Request,
+              limit : int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+              after : Optional[str] = None,
+              stream : bool = False,
+              fields : Optional[str] = None,
+              database : Session = Depends(get_read_db)):
+    projection = project(fields, UsersModel, UsersResponseSchema, extra_columns=(UsersModel.created_at,))
+    if stream:
+        return stream_ndjson(UsersModel, UsersModel.created_at, UsersModel.id, projection.schema, after,
+                             session_factory=read_session_factory(request)[0], options=projection.options)
+    def load():
+        query = database.query(UsersModel).options(*projection.options)
+        data, next_cursor = keyset_page(query, UsersModel.created_at, UsersModel.id, limit, after)
+        return data, ({"X-Next-Cursor": next_cursor} if next_cursor else {})
+    return cached_response(request, REPUTATION_RESOURCES, load, projection.schema)
+
+#Leaderboard: top users by reputation, plus the rank of one user when user_id is given
+@router.get("/leaderboard", response_model=LeaderboardSchema)
+def get_leaderboard(request : Request,
+                    limit : int = Query(10, ge=1, le=100),
+                    user_id : Optional[int] = None,
+                    database : Session = Depends(get_read_db)):
+    def entry(rank, user):
+        return LeaderboardEntrySchema(rank=rank, id=user.id, username=user.username, user_rating=user.user_rating or 0)
+    def load():
+        top = [entry(rank, user) for rank, user in reputation.top_users(database, limit)]
+        user = None
+        if user_id is not None:
+            found = reputation.rank_of(database, user_id)
+            if found is None:
+                raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+            user = entry(*found)
+        return LeaderboardSchema(top=top, user=user)
+    return cached_response(request, REPUTATION_RESOURCES, load, LeaderboardSchema)
 
 #3. Get User by ID
 @router.get("/get_user_by_id")
-def get_user_by_id(id : int , database : Session = Depends(get_db)):
-    data = database.query(UsersModel).filter(UsersModel.id == id).first()
-    return data
+async def get_user_by_id(id : int , request : Request , fields : Optional[str] = None ,
+                         database : AsyncSession = Depends(get_async_read_db)):
+    projection = project(fields, UsersModel, UsersResponseSchema)
+    return await cached_response_async(request, REPUTATION_RESOURCES, lambda: database.get(UsersModel, id, options=projection.options),
+                                       projection.schema)
 
 
 #Create Single User
-@router.post("/create_user")
+@router.post("/create_user", response_model=UsersResponseSchema)
 def create_user(user : UsersSchema , database : Session = Depends(get_db)):
 
 
@@ -47,38 +92,65 @@ def create_user(user : UsersSchema , database : Session = Depends(get_db)):
     database.add(data)
     database.commit()
     database.refresh(data)
+    response_cache.bump("users")
     return data 
 
 #4. Create Multiple Users
-@router.post("/create_multiple_users")
+@router.post("/create_multiple_users", response_model=List[UsersResponseSchema])
 def create_multiple_users(users : List[UsersSchema] , database : Session = Depends(get_db)):
-    hashed_passwords = [utils.hash(u.password) for u in users]
+    hashed_passwords = utils.hash_many([u.password for u in users])
     users_with_hashed = [UsersSchema(username=u.username,
      email=u.email, 
-     password=hashed_password , 
-     user_rating=u.user_rating) 
+     password=hashed_password) 
      for u, hashed_password in zip(users, hashed_passwords)]
     data = [UsersModel(**u.dict()) for u in users_with_hashed]
     database.add_all(data)
+    database.flush()
+    result = [UsersResponseSchema.model_validate(u) for u in data]  # before commit expires the rows
     database.commit()
-    return data 
+    response_cache.bump("users")
+    return result
+
+#Bulk ingest: JSON array or NDJSON body, committed per chunk, answered with per-chunk summaries
+def hash_passwords(rows):
+    hashed_passwords = utils.hash_many([row["password"] for row in rows])
+    for row, hashed_password in zip(rows, hashed_passwords):
+        row["password"] = hashed_password
+    return rows
+
+@router.post("/bulk_create_users")
+async def bulk_create_users(request : Request,
+                            chunk_size : int = Query(DEFAULT_CHUNK_SIZE, ge=1, le=MAX_CHUNK_SIZE),
+                            database : Session = Depends(get_db)):
+    return await bulk_ingest(request, database, UsersModel, UsersSchema, chunk_size, prepare=hash_passwords)
 
 #5. Delete User by ID
-@router.delete("/delete_user_by_id")
+@router.delete("/delete_user_by_id", response_model=UsersResponseSchema)
 def delete_user_by_id(id : int , database : Session = Depends(get_db)):
     data = database.query(UsersModel).filter(UsersModel.id == id).first()
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    result = UsersResponseSchema.model_validate(data)
+    #their votes go with them, and so does what the votes did to the scores
+    voted = cascade.delete_votes_by(database, id)
     database.delete(data)
     database.commit()
-    return data 
+    oauth.invalidate_user(id)
+    response_cache.bump("users", *voted)
+    return result
 
 
 #6. Update User by ID
-@router.put("/update_user_by_id")
+@router.put("/update_user_by_id", response_model=UsersResponseSchema)
 def update_user_by_id(id : int , user : UsersSchema , database : Session = Depends(get_db)):
     data = database.query(UsersModel).filter(UsersModel.id == id).first()
+    if not data:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
     data.username = user.username
     data.email = user.email
-    data.password = user.password
+    data.password = utils.hash(user.password)
     database.commit()
+    oauth.invalidate_user(id)
+    response_cache.bump("users")
     database.refresh(data)
     return data 
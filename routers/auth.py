@@ -3,10 +3,10 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from Database.db import get_db
 from Models.Users import UsersModel
-from Schemas.Users import UserLoginSchema
 import utils
 import oauth
-from Schemas.Users import UserSignupSchema
+from cache import response_cache
+from Schemas.Users import UserSignupSchema, CurrentUserSchema
 
 
 router = APIRouter(
@@ -23,9 +23,16 @@ def login(user_credentials : OAuth2PasswordRequestForm = Depends(), database : S
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
     # verify if the password is correct
-    if not utils.verify(user_credentials.password , user.password):
+    valid, new_hash = utils.verify_and_update(user_credentials.password , user.password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
+    # rehash transparently when the stored hash was made with a different bcrypt cost
+    if new_hash:
+        user.password = new_hash
+        database.commit()
+        response_cache.bump("users")
+
     # Return access token
     access_token = oauth.create_access_token(data={"user_id": user.id})
     return {
@@ -64,6 +71,7 @@ def register(user_credentials : UserSignupSchema, database : Session = Depends(g
     database.add(new_user)
     database.commit()
     database.refresh(new_user)
+    response_cache.bump("users")
     
     return {
         "message": "User registered successfully",
@@ -71,3 +79,7 @@ def register(user_credentials : UserSignupSchema, database : Session = Depends(g
         "username": new_user.username,
         "email": new_user.email
     }
+
+@router.get("/me", response_model=CurrentUserSchema)
+def me(current_user : CurrentUserSchema = Depends(oauth.get_current_user)):
+    return current_user
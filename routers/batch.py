@@ -0,0 +1,224 @@
+import os
+import re
+import logging
+from typing import Optional
+from contextvars import ContextVar
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.concurrency import run_in_threadpool
+from pydantic import ValidationError
+from dotenv import load_dotenv
+from Database import db
+from Database.projection import project
+from cache import response_cache
+from Models.Users import UsersModel
+from Models.Posts import PostsModel
+from Models.Solutions import SolutionsModel
+from Models.Comments import CommentsModel
+from Schemas.Users import UsersSchema, UsersResponseSchema
+from Schemas.Posts import PostsSchema, PostsResponseSchema
+from Schemas.Solutions import SolutionsSchema, SolutionsResponseSchema
+from Schemas.Comments import CommentsSchema, CommentsResponseSchema
+from Schemas.Batch import BatchSchema, BatchResultSchema, BatchResponseSchema
+from Schemas.Users import CurrentUserSchema
+from routers import Users, Posts, Solutions, Comments
+from middleware import admission
+import events
+import oauth
+import utils
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+#Batched operations
+#POST /api/batch runs an ordered list of operations through the same handlers as the
+#single routes, on one connection and in one transaction: each operation commits into
+#a SAVEPOINT and the batch commits once at the end. With atomic (the default) the first
+#failure rolls everything back and the remaining operations are skipped; otherwise only
+#the failed operation is rolled back. Events and cache bumps take effect after the
+#outer commit. Votes from the optional vote buffer are written behind, outside the batch.
+#like/dislike operations vote as the user of the batch's bearer token, like the single routes.
+
+BATCH_MAX_OPERATIONS = int(os.getenv("BATCH_MAX_OPERATIONS", "50"))
+
+SKIPPED = status.HTTP_424_FAILED_DEPENDENCY
+
+_REFERENCE = re.compile(r"^\$(\w+)\.(\w+)$")
+
+
+class Resource:
+    def __init__(self, model, schema, response_schema, create, update, delete, like=None, dislike=None):
+        self.model = model
+        self.schema = schema
+        self.response_schema = response_schema
+        self.handlers = {"create": create, "update": update, "delete": delete, "like": like, "dislike": dislike}
+
+
+RESOURCES = {
+    "users": Resource(UsersModel, UsersSchema, UsersResponseSchema,
+                      create=lambda database, op, body: Users.create_user(body, database),
+                      update=lambda database, op, body: Users.update_user_by_id(op.id, body, database),
+                      delete=lambda database, op, body: Users.delete_user_by_id(op.id, database)),
+    "posts": Resource(PostsModel, PostsSchema, PostsResponseSchema,
+                      create=lambda database, op, body: Posts.create_multiple_posts([body], database, op.check_duplicates)[0],
+                      update=lambda database, op, body: Posts.update_post_by_id(op.id, body, database),
+                      delete=lambda database, op, body: Posts.delete_post_by_id(op.id, database),
+                      like=lambda database, op, user: Posts.like_post(op.id, database, user),
+                      dislike=lambda database, op, user: Posts.dislike_post(op.id, database, user)),
+    "solutions": Resource(SolutionsModel, SolutionsSchema, SolutionsResponseSchema,
+                          create=lambda database, op, body: Solutions.create_multiple_solutions([body], database)[0],
+                          update=lambda database, op, body: Solutions.update_solution_by_id(op.id, body, database),
+                          delete=lambda database, op, body: Solutions.delete_solution_by_id(op.id, database),
+                          like=lambda database, op, user: Solutions.like_solution(op.id, database, user),
+                          dislike=lambda database, op, user: Solutions.dislike_solution(op.id, database, user)),
+    "comments": Resource(CommentsModel, CommentsSchema, CommentsResponseSchema,
+                         create=lambda database, op, body: Comments.create_multiple_comments([body], database)[0],
+                         update=lambda database, op, body: Comments.update_comment_by_id(op.id, body, database),
+                         delete=lambda database, op, body: Comments.delete_comment_by_id(op.id, database),
+                         like=lambda database, op, user: Comments.like_comment(op.id, database, user),
+                         dislike=lambda database, op, user: Comments.dislike_comment(op.id, database, user)),
+}
+
+
+def _resolve(value, results : dict):
+    """Replace "$ref.field" strings (also inside lists and dicts) with that field of an earlier result."""
+    if isinstance(value, str):
+        match = _REFERENCE.match(value)
+        if match is None:
+            return value
+        ref, field = match.groups()
+        result = results.get(ref)
+        if result is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                                detail="%s refers to no earlier successful operation" % value)
+        if not isinstance(result, dict) or field not in result:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="%s: the result has no %r" % (value, field))
+        return result[field]
+    if isinstance(value, list):
+        return [_resolve(item, results) for item in value]
+    if isinstance(value, dict):
+        return {key: _resolve(item, results) for key, item in value.items()}
+    return value
+
+
+def _run(database, op, results : dict, user):
+    resource = RESOURCES[op.resource]
+    op = op.model_copy(update={"id": _resolve(op.id, results)})
+    if op.action != "create" and not isinstance(op.id, int):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="%s needs an integer id" % op.action)
+    if op.action == "get":
+        projection = project(op.fields, resource.model, resource.response_schema)
+        data = database.get(resource.model, op.id, options=projection.options)
+        if data is None:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not found")
+        return projection.schema.model_validate(data)
+    handler = resource.handlers[op.action]
+    if handler is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="%s cannot be %sd" % (op.resource, op.action))
+    if op.action in ("like", "dislike"):
+        if user is None:
+            raise oauth.credentials_exception
+        return handler(database, op, user)
+    body = None
+    if op.action in ("create", "update"):
+        body = resource.schema.model_validate(_resolve(op.body or {}, results))
+    result = handler(database, op, body)
+    if isinstance(result, resource.model):
+        result = resource.response_schema.model_validate(result)
+    return result
+
+
+def _failure(e : Exception):
+    if isinstance(e, HTTPException):
+        return e.status_code, {"detail": e.detail}
+    if isinstance(e, ValidationError):
+        return 422, {"detail": e.errors(include_url=False)}
+    if isinstance(e, utils.HashingPoolBusy):
+        #the same 503 the app answers for a single route; retry_after is in the body here
+        return status.HTTP_503_SERVICE_UNAVAILABLE, {"detail": str(e), "retry_after": e.retry_after}
+    logger.exception("Batch operation failed")
+    return status.HTTP_500_INTERNAL_SERVER_ERROR, {"detail": "Operation failed: %s" % e}
+
+
+#Cache versions the handlers bump mid-batch are bumped again after the outer commit, so a
+#read racing the batch cannot cache the pre-commit rows under the new version
+_bumps = ContextVar("batch_bumps", default=None)
+
+def _note_bump(resources):
+    bumps = _bumps.get()
+    if bumps is not None:
+        bumps.update(resources)
+
+response_cache.on_bump.append(_note_bump)
+
+
+async def _admit(batch : BatchSchema):
+    """Charge rate limits per operation: the middleware spent one batch write token, the
+    rest are spent here, and each like/dislike takes a vote token from its router's bucket."""
+    await admission.spend("/api/batch", admission.WRITES.name, len(batch.operations) - 1)
+    votes = {}
+    for op in batch.operations:
+        if op.action in ("like", "dislike"):
+            votes[op.resource] = votes.get(op.resource, 0) + 1
+    for resource, count in sorted(votes.items()):
+        await admission.spend("/api/%s" % resource, admission.VOTES.name, count)
+
+
+@router.post("", response_model=BatchResponseSchema)
+async def run_batch(batch : BatchSchema , current_user : Optional[CurrentUserSchema] = Depends(oauth.get_optional_user)):
+    if not 1 <= len(batch.operations) <= BATCH_MAX_OPERATIONS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Send between 1 and %d operations" % BATCH_MAX_OPERATIONS)
+    await _admit(batch)
+    #the operations are blocking handlers, so the batch runs on the threadpool like they would
+    return await run_in_threadpool(_run_batch, batch, current_user)
+
+
+def _run_batch(batch : BatchSchema, current_user):
+    connection = db.engine.connect()
+    transaction = connection.begin()
+    if connection.dialect.name == "sqlite":
+        #pysqlite only opens its transaction at the first write, so a SAVEPOINT taken before
+        #it would be released as a commit of its own; begin the real transaction up front
+        connection.exec_driver_sql("BEGIN")
+    database = db.SessionLocal(bind=connection, join_transaction_mode="create_savepoint")
+    events.hold(database)
+    bumps = set()
+    token = _bumps.set(bumps)
+    results, by_ref, failed = [], {}, False
+    try:
+        for index, op in enumerate(batch.operations):
+            if failed and batch.atomic:
+                results.append(BatchResultSchema(status=SKIPPED, ref=op.ref, body={"detail": "An earlier operation failed"}))
+                continue
+            try:
+                result = jsonable_encoder(_run(database, op, by_ref, current_user))
+            except Exception as e:
+                database.rollback()  # back to this operation's savepoint
+                code, body = _failure(e)
+                results.append(BatchResultSchema(status=code, ref=op.ref, body=body))
+                failed = True
+                continue
+            by_ref[str(index)] = result
+            if op.ref:
+                by_ref[op.ref] = result
+            results.append(BatchResultSchema(status=status.HTTP_200_OK, ref=op.ref, body=result))
+        committed = not (failed and batch.atomic)
+        database.close()
+        if committed:
+            transaction.commit()
+        else:
+            transaction.rollback()
+    finally:
+        _bumps.reset(token)
+        database.close()
+        connection.close()
+    if committed:
+        events.release(database)
+        if bumps:
+            response_cache.bump(*sorted(bumps))
+    return BatchResponseSchema(committed=committed, results=results)
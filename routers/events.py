@@ -0,0 +1,78 @@
+import asyncio
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import List
+import events
+
+router = APIRouter()
+
+MAX_TOPICS = 50
+HEARTBEAT_SECONDS = 15
+
+
+def _topics(post_id, solution_id):
+    topics = [events.post_topic(id) for id in post_id] + [events.solution_topic(id) for id in solution_id]
+    if not topics or len(topics) > MAX_TOPICS:
+        raise ValueError("Subscribe to between 1 and %d posts/solutions" % MAX_TOPICS)
+    return topics
+
+
+#Subscribe to change events of posts and solutions, e.g. /api/events/ws?post_id=1&solution_id=7
+#Each message is one JSON event: solution.created, comment.created, *.deleted or rating
+@router.websocket("/ws")
+async def events_websocket(websocket : WebSocket,
+                           post_id : List[int] = Query([]),
+                           solution_id : List[int] = Query([])):
+    try:
+        topics = _topics(post_id, solution_id)
+    except ValueError as e:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason=str(e))
+        return
+    await websocket.accept()
+    subscription = events.bus.subscribe(topics)
+
+    async def watch_disconnect():
+        while True:
+            if (await websocket.receive())["type"] == "websocket.disconnect":
+                return
+
+    disconnected = asyncio.ensure_future(watch_disconnect())
+    try:
+        while not disconnected.done():
+            getter = asyncio.ensure_future(subscription.get())
+            done, _ = await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                break
+            await websocket.send_text(getter.result())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+        events.bus.unsubscribe(subscription)
+
+
+#Server-sent events fallback for clients without WebSocket support; same query and events
+@router.get("/stream")
+async def events_stream(post_id : List[int] = Query([]), solution_id : List[int] = Query([])):
+    try:
+        topics = _topics(post_id, solution_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    subscription = events.bus.subscribe(topics)
+
+    async def body():
+        try:
+            yield ": subscribed\n\n"
+            while True:
+                try:
+                    message = await subscription.get(timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"  # comment line; keeps proxies from closing an idle stream
+                    continue
+                yield "data: %s\n\n" % message
+        finally:
+            events.bus.unsubscribe(subscription)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
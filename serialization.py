@@ -0,0 +1,47 @@
+from typing import List, Optional
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional, ujson is in requirements.txt
+    orjson = None
+import ujson
+
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return ujson.dumps(content, ensure_ascii=False).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson when installed, ujson otherwise."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+#One TypeAdapter per (schema, list or single); building them is the expensive part
+_adapters = {}
+
+def _adapter(schema, many : bool):
+    key = (schema, many)
+    adapter = _adapters.get(key)
+    if adapter is None:
+        adapter = _adapters[key] = TypeAdapter(List[schema] if many else Optional[schema])
+    return adapter
+
+
+def render_json(data, schema=None) -> bytes:
+    """Serialize ORM rows (or anything jsonable) to JSON bytes.
+
+    With a response schema the rows are read with from_attributes and dumped by
+    pydantic-core in one pass, skipping jsonable_encoder's per-object reflection and
+    any column the schema leaves out (e.g. the users' password hash).
+    """
+    if schema is not None:
+        adapter = _adapter(schema, isinstance(data, (list, tuple)))
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+    return dumps(jsonable_encoder(data))
@@ -17,10 +17,15 @@ if ! command -v uvicorn &> /dev/null; then
     exit 1
 fi
 
+# Apply schema migrations before the server starts
+echo "Applying database migrations..."
+python -m Database.migrate upgrade || exit 1
+
 # Start the FastAPI server
 echo "Starting FastAPI backend server on http://localhost:8000"
 echo "Press Ctrl+C to stop the server"
 echo ""
 
-uvicorn app:app --reload --host 0.0.0.0 --port 8000
+# The app is built by the factory; /healthz answers at once, /readyz once the DB pool is warm
+uvicorn app:create_app --factory --reload --host 0.0.0.0 --port 8000
 
@@ -1,13 +1,115 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 from passlib.context import CryptContext
+from dotenv import load_dotenv
 
+load_dotenv()
 
 #Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+#BCRYPT_ROUNDS is the cost for new hashes; hashes at any other cost are flagged
+#by verify_and_update so they get rehashed on the next successful login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
 
-def hash(password:str):
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+
+#Hashing pool
+#bcrypt is deliberately slow, so it runs on a dedicated bounded pool instead of
+#inline on the request threadpool. HASH_POOL_KIND is "thread" (bcrypt releases the
+#GIL) or "process". Once HASH_QUEUE_DEPTH passwords are waiting or running, new
+#work is refused with HashingPoolBusy, which the app turns into a 503.
+HASH_POOL_KIND = os.getenv("HASH_POOL_KIND", "thread")
+HASH_POOL_SIZE = int(os.getenv("HASH_POOL_SIZE", str(os.cpu_count() or 2)))
+HASH_QUEUE_DEPTH = int(os.getenv("HASH_QUEUE_DEPTH", "256"))
+HASH_RETRY_AFTER = int(os.getenv("HASH_RETRY_AFTER", "1"))
+
+
+class HashingPoolBusy(Exception):
+    def __init__(self, retry_after : int = HASH_RETRY_AFTER):
+        super().__init__("Password hashing queue is full")
+        self.retry_after = retry_after
+
+
+class HashingPool:
+    def __init__(self, kind : str = HASH_POOL_KIND, size : int = HASH_POOL_SIZE, queue_depth : int = HASH_QUEUE_DEPTH):
+        self.kind = kind
+        self.size = size
+        self.queue_depth = queue_depth
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _get_executor(self):
+        #built on first use so importing utils stays cheap
+        with self._lock:
+            if self._executor is None:
+                executor_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+                self._executor = executor_class(max_workers=self.size)
+            return self._executor
+
+    def _admit(self, count : int):
+        #a batch is admitted whole as long as the queue is not already full
+        with self._lock:
+            if self.pending >= self.queue_depth:
+                raise HashingPoolBusy()
+            self.pending += count
+
+    def _release(self, count : int):
+        with self._lock:
+            self.pending -= count
+
+    def map(self, fn, *iterables):
+        items = list(zip(*iterables))
+        if not items:
+            return []
+        self._admit(len(items))
+        try:
+            executor = self._get_executor()
+            return list(executor.map(fn, *zip(*items)))
+        finally:
+            self._release(len(items))
+
+    def run(self, fn, *args):
+        return self.map(fn, *([a] for a in args))[0]
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+hashing_pool = HashingPool()
+
+
+def _hash(password):
     return pwd_context.hash(password)
-    
+
+def _verify(plain_password, hashed_password):
+    return pwd_context.verify(plain_password, hashed_password)
+
+def _verify_and_update(plain_password, hashed_password):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def hash(password:str):
+    return hashing_pool.run(_hash, password)
+
+def hash_many(passwords):
+    """Hash a batch of passwords in parallel on the hashing pool."""
+    return hashing_pool.map(_hash, passwords)
 
 
 def verify(plain_password , hashed_password):
-    return pwd_context.verify(plain_password , hashed_password)
\ No newline at end of file
+    return hashing_pool.run(_verify, plain_password, hashed_password)
+
+def verify_and_update(plain_password, hashed_password):
+    """Returns (valid, new_hash); new_hash is set when the stored hash uses a different cost."""
+    return hashing_pool.run(_verify_and_update, plain_password, hashed_password)